@@ -65,6 +65,7 @@ remote_app = agent_engines.create(
     ],
     extra_packages=[
         "./rag",
+        "./rag_workers",
     ],
 )
 
@@ -22,14 +22,74 @@ from vertexai.generative_models import GenerativeModel, Part  # For visual proce
 from openinference.instrumentation import using_session
 from google.genai import types 
 from google.genai import Client
+from google.genai import errors as genai_errors
 from dotenv import load_dotenv
+from .parallel_review import (
+    chunk_sections,
+    map_sections,
+    map_sections_incremental,
+    policy_query_for,
+    reduce_findings,
+    section_review_prompt,
+)
+from .precheck_rules import run_precheck
 from .prompts import return_instructions_root
+from .shared_libraries.retrieval_cache import cache_from_env, make_cache_key
+from .shared_libraries.semantic_cache import semantic_cache_from_env
+from .shared_libraries.local_index import LocalVectorIndex
+from .shared_libraries.bm25 import BM25_FILE, BM25Index, reciprocal_rank_fusion
+from .shared_libraries.context_assembly import ContextAssembler
+from .shared_libraries.async_retrieval import (
+    merge_batched_contexts,
+    retrieve_many,
+    run_with_timeout,
+)
+from .shared_libraries.rerank import Reranker
+from .shared_libraries.image_cache import image_cache_from_env, sha256_hex
+from .shared_libraries.image_processing import ImageNormalizer, guess_image_mime
+from .shared_libraries.model_calls import LoopSemaphore, call_with_retry
+from .shared_libraries.vision_classifier import (
+    VERDICTS as VISION_VERDICTS,
+    VisionClassifier,
+)
+from .shared_libraries.figure_pipeline import run_figure_pipeline
+from .shared_libraries.extraction_manifest import (
+    classifier_version,
+    manifest_store_from_env,
+    sha256_of_source,
+)
+from .shared_libraries.blob_store import BlobStore
+from .shared_libraries.pdf_text import sanitize_text_for_pdf
+from .shared_libraries.figure_placement import place_figures
+from .shared_libraries.manuscript_sections import (
+    SectionStore,
+    format_outline,
+    segment_pdf,
+    select_sections,
+)
+from .shared_libraries.workspace import (
+    WorkspaceManager,
+    safe_name,
+    workspace_id_from_context,
+)
+from .shared_libraries.pdf_images import (
+    filter_config_from_env,
+    format_filter_report,
+    iter_candidate_images,
+    new_filter_report,
+    pdf_pool_context,
+)
 import re
-import re
-import fitz
+import asyncio
+import json
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from fpdf import FPDF
 
- # PyMuPDF
+# Setup logging sederhana agar kita bisa lihat error di terminal
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
 
 load_dotenv()
 genai_client = Client()
@@ -40,54 +100,290 @@ vertexai.init(
     location="us-central1" # Ubah ke us-central1
 )
 
-def search_icmje_policy(query: str) -> str:
+RAG_TOP_K = int(os.environ.get("RAG_TOP_K", "5"))
+RAG_DISTANCE_THRESHOLD = float(os.environ.get("RAG_DISTANCE_THRESHOLD", "0.6"))
+# "vertex" (RAG Engine) atau "local" (index vektor lokal dari PDF ICMJE)
+RETRIEVAL_BACKEND = os.environ.get("ICMJE_RETRIEVAL_BACKEND", "vertex").lower()
+LOCAL_INDEX_DIR = os.environ.get(
+    "ICMJE_LOCAL_INDEX_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "local_index")
+)
+BM25_INDEX_PATH = os.environ.get("ICMJE_BM25_INDEX") or os.path.join(LOCAL_INDEX_DIR, BM25_FILE)
+
+
+def _resolve_retrieval_mode(mode: str) -> str:
     """
-    Search the RAG corpus for specific ICMJE Recommendations, 
-    ethics requirements, and manuscript reporting standards.
+    Hybrid fuses BM25 and vector rankings by chunk text, which only lines up
+    when both rank the same local chunks; otherwise fall back to vector.
     """
+    if mode != "hybrid":
+        return mode
+    if RETRIEVAL_BACKEND != "local":
+        logger.warning(
+            "ICMJE_RETRIEVAL_MODE=hybrid needs ICMJE_RETRIEVAL_BACKEND=local (RAG Engine chunks never "
+            "match the local BM25 chunks); using vector retrieval"
+        )
+        return "vector"
+    if not os.path.exists(BM25_INDEX_PATH):
+        logger.warning(f"BM25 index {BM25_INDEX_PATH} not found; using vector retrieval")
+        return "vector"
+    return mode
+
+
+# "vector" (default) atau "hybrid" (BM25 + vektor lokal, digabung dengan reciprocal-rank fusion)
+RETRIEVAL_MODE = _resolve_retrieval_mode(os.environ.get("ICMJE_RETRIEVAL_MODE", "vector").lower())
+# Rerank lokal: ambil RAG_RERANK_CANDIDATES kandidat, lalu rerank ke RAG_TOP_K ("none" = nonaktif)
+RERANKER_NAME = os.environ.get("RAG_RERANKER", "lexical")
+RERANK_CANDIDATES = int(os.environ.get("RAG_RERANK_CANDIDATES", "25"))
+reranker = Reranker(
+    RERANKER_NAME, vector_weight=float(os.environ.get("RAG_RERANK_VECTOR_WEIGHT", "0.3"))
+) if RERANKER_NAME != "none" else None
+
+# Cache hasil retrieval agar pertanyaan ICMJE yang berulang tidak ke RAG Engine lagi
+retrieval_cache = cache_from_env()
+# Cache semantik (opsional, RAG_SEMANTIC_CACHE=true) untuk parafrase pertanyaan yang sama
+semantic_cache = semantic_cache_from_env()
+if semantic_cache is not None:
+    # Invalidasi corpus (juga dari prepare_corpus_and_data.py lewat SQLite) ikut mengosongkan cache semantik
+    retrieval_cache.add_invalidation_listener(semantic_cache.invalidate_corpus)
+
+
+def _corpus_cache_scope(corpus: str) -> str:
+    # RAG_CORPUS_VERSION dinaikkan setiap kali corpus di-update -> cache lama otomatis miss
+    version = os.environ.get("RAG_CORPUS_VERSION")
+    return f"{corpus}@{version}" if version else corpus
+
+
+def _query_rag_engine(query: str, corpus: str, top_k: int, threshold: float) -> list:
     # Configure retrieval
     rag_retrieval_config = rag.RagRetrievalConfig(
-        filter=rag.Filter(vector_distance_threshold=0.6),
-        top_k=5,
+        filter=rag.Filter(vector_distance_threshold=threshold),
+        top_k=top_k,
     )
-    
+
     # Query your corpus
     response = rag.retrieval_query(
         rag_resources=[
-            rag.RagResource(rag_corpus=os.environ.get("RAG_CORPUS"))
+            rag.RagResource(rag_corpus=corpus)
         ],
         text=query,
         retrieval_config=rag_retrieval_config,
     )
-    
-    # Process results
-    context = ""
-    for context_chunk in response.contexts:
-        context += f"\n[ICMJE SOURCE: {context_chunk.source_uri}]\n{context_chunk.text}\n"
-    
+
+    return [
+        {
+            "source_uri": context_chunk.source_uri,
+            "text": context_chunk.text,
+            "distance": getattr(context_chunk, "distance", None),
+        }
+        for context_chunk in response.contexts
+    ]
+
+
+_local_index = None
+_local_index_lock = threading.Lock()
+
+
+def get_local_index() -> LocalVectorIndex:
+    """Loads the memory-mapped local index once per process."""
+    global _local_index
+    if _local_index is None:
+        with _local_index_lock:
+            if _local_index is None:
+                _local_index = LocalVectorIndex(
+                    LOCAL_INDEX_DIR,
+                    nprobe=int(os.environ.get("ICMJE_LOCAL_INDEX_NPROBE", "4")),
+                )
+    return _local_index
+
+
+_bm25_index = None
+
+
+def get_bm25_index() -> BM25Index:
+    """Loads the precomputed BM25 index once per process."""
+    global _bm25_index
+    if _bm25_index is None:
+        with _local_index_lock:
+            if _bm25_index is None:
+                _bm25_index = BM25Index.load(BM25_INDEX_PATH)
+    return _bm25_index
+
+
+def _vector_search(query: str, corpus: str, top_k: int, threshold: float) -> list:
+    if RETRIEVAL_BACKEND == "local":
+        return get_local_index().search(query, top_k, threshold)
+    return _query_rag_engine(query, corpus, top_k, threshold)
+
+
+def _hybrid_search(query: str, corpus: str, top_k: int, threshold: float) -> list:
+    # Ambil kandidat lebih banyak dari masing-masing ranker lalu fusi ke top_k
+    candidates = top_k * int(os.environ.get("ICMJE_HYBRID_CANDIDATE_FACTOR", "3"))
+    vector_hits = _vector_search(query, corpus, candidates, threshold)
+    lexical_hits = [chunk for chunk, _ in get_bm25_index().search(query, candidates)]
+    return reciprocal_rank_fusion(
+        [vector_hits, lexical_hits],
+        top_k=top_k,
+        k=int(os.environ.get("ICMJE_RRF_K", "60")),
+    )
+
+
+def retrieve_icmje_chunks(query: str, top_k: int = RAG_TOP_K,
+                          threshold: float = RAG_DISTANCE_THRESHOLD) -> list:
+    """
+    Returns the raw retrieved chunks as dicts with source_uri, text and distance,
+    served from the retrieval cache when possible.
+    """
+    corpus = os.environ.get("RAG_CORPUS") if RETRIEVAL_BACKEND != "local" else LOCAL_INDEX_DIR
+    scope = f"{_corpus_cache_scope(corpus)}#{RETRIEVAL_MODE}#{RERANKER_NAME}"
+    key = make_cache_key(query, scope, top_k, threshold)
+    cached = retrieval_cache.get(key)
+    if cached is not None:
+        logger.info(f"Retrieval cache hit: {retrieval_cache.stats()}")
+        return cached
+
+    semantic_scope = f"{scope}|{top_k}|{threshold}"
+    if semantic_cache is not None:
+        match = semantic_cache.lookup(query, semantic_scope)
+        if match is not None:
+            chunks, similarity, matched_query, created = match
+            logger.info(
+                f"Semantic cache hit ({similarity:.3f}) for '{query}' via '{matched_query}': "
+                f"{semantic_cache.stats()}"
+            )
+            # Umur asli dipertahankan: salinan di cache exact tidak memperpanjang TTL
+            retrieval_cache.set(key, corpus, chunks, created=created)
+            return chunks
+
+    fetch_k = max(top_k, RERANK_CANDIDATES) if reranker is not None else top_k
+    if RETRIEVAL_MODE == "hybrid":
+        chunks = _hybrid_search(query, corpus, fetch_k, threshold)
+    else:
+        chunks = _vector_search(query, corpus, fetch_k, threshold)
+    if reranker is not None:
+        chunks = reranker.rerank(query, chunks, top_k)
+        logger.info(f"Reranked {fetch_k} candidates to {len(chunks)}: {reranker.stats()}")
+
+    retrieval_cache.set(key, corpus, chunks)
+    if semantic_cache is not None:
+        semantic_cache.add(query, semantic_scope, chunks, corpus=corpus)
+    logger.info(f"Retrieval cache miss: {retrieval_cache.stats()}")
+    return chunks
+
+
+RAG_CONTEXT_TOKEN_BUDGET = int(os.environ.get("RAG_CONTEXT_TOKEN_BUDGET", "2000"))
+
+
+def new_context_assembler() -> ContextAssembler:
+    return ContextAssembler(
+        token_budget=RAG_CONTEXT_TOKEN_BUDGET,
+        similarity_threshold=float(os.environ.get("RAG_DEDUP_SIMILARITY", "0.8")),
+    )
+
+
+RAG_RETRIEVAL_TIMEOUT_SECONDS = float(os.environ.get("RAG_RETRIEVAL_TIMEOUT_SECONDS", "20"))
+
+# Thread pool khusus retrieval supaya panggilan RAG yang blocking tidak memblokir event loop
+_retrieval_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("RAG_RETRIEVAL_WORKERS", "8")),
+    thread_name_prefix="icmje-retrieval",
+)
+
+
+async def retrieve_icmje_chunks_async(query: str, top_k: int = RAG_TOP_K,
+                                      threshold: float = RAG_DISTANCE_THRESHOLD,
+                                      timeout: float = RAG_RETRIEVAL_TIMEOUT_SECONDS) -> list:
+    """
+    Runs retrieve_icmje_chunks on the bounded retrieval pool without blocking
+    the event loop. Raises TimeoutError after `timeout` seconds; a call that is
+    still queued is cancelled, one already running finishes in the background
+    and still populates the cache.
+    """
+    return await run_with_timeout(
+        _retrieval_executor, retrieve_icmje_chunks, query, top_k, threshold, timeout=timeout
+    )
+
+
+async def search_icmje_policy(query: str) -> str:
+    """
+    Search the RAG corpus for specific ICMJE Recommendations, 
+    ethics requirements, and manuscript reporting standards.
+    """
+    try:
+        chunks = await retrieve_icmje_chunks_async(query)
+    except TimeoutError as e:
+        logger.warning(f"{e} (query: '{query}')")
+        return f"Error: {e}. Retry the search or narrow the query."
+    context, report = new_context_assembler().assemble(chunks)
+    logger.info(f"Context assembly for '{query}': {report}")
     return context if context else "No specific ICMJE policy found in RAG."
 
-import logging
 
-# Setup logging sederhana agar kita bisa lihat error di terminal
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
+RAG_BATCH_CONCURRENCY = int(os.environ.get("RAG_BATCH_CONCURRENCY", "4"))
+
+
+async def search_icmje_policies(queries: list[str]) -> str:
+    """
+    Search the RAG corpus for several ICMJE topics in one call (e.g. authorship,
+    conflicts of interest, trial registration, data sharing). Returns one
+    merged context grouped by query, with overlapping policy text shown once.
+    """
+    queries = list(dict.fromkeys(q.strip() for q in queries if q and q.strip()))
+    if not queries:
+        return "Error: No queries provided."
+
+    results = await retrieve_many(queries, retrieve_icmje_chunks_async, RAG_BATCH_CONCURRENCY)
+    context, tokens_saved = merge_batched_contexts(queries, results, new_context_assembler())
+    logger.info(f"Batched context assembly saved ~{tokens_saved} tokens over {len(queries)} queries")
+    return context
+
 
 # Konfigurasi Folder
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-INPUT_DIR = os.path.join(BASE_DIR, "inputs")
-IMAGE_DIR = os.path.join(BASE_DIR, "temp_figures")
-OUTPUT_DIR = os.path.join(BASE_DIR, "outputs")
+# disk: upload/gambar/PDF disimpan di workspace folder; memory: semua tetap sebagai bytes,
+# PDF akhir dikirim sebagai ADK artifact
+ARTIFACT_MODE = os.environ.get("ARTIFACT_MODE", "disk").lower()
+
+# Tiap session punya workspace sendiri (inputs/figures/outputs) -> aman untuk banyak user paralel
+workspaces = WorkspaceManager(
+    root=os.environ.get("WORKSPACE_ROOT") or os.path.join(BASE_DIR, "workspaces"),
+    ttl_seconds=float(os.environ.get("WORKSPACE_TTL_SECONDS", "86400")),
+    gc_interval_seconds=float(os.environ.get("WORKSPACE_GC_INTERVAL_SECONDS", "600")),
+    in_memory=ARTIFACT_MODE == "memory",
+)
+workspaces.start_gc()
+# Cache lintas session (blob, manifest ekstraksi, segmentasi) yang tidak dipakai selama ini dihapus oleh GC workspace
+CACHE_RETENTION_SECONDS = float(os.environ.get("CACHE_RETENTION_SECONDS", str(30 * 86400)))
+
+# Upload disimpan content-addressed (sha256) lintas session; tidak dipakai di mode memory
+blob_store = None if ARTIFACT_MODE == "memory" else BlobStore(
+    os.environ.get("BLOB_STORE_DIR") or os.path.join(BASE_DIR, "blobs"),
+    max_age_seconds=CACHE_RETENTION_SECONDS,
+)
+if blob_store is not None:
+    workspaces.add_gc_hook(blob_store.collect_garbage)
+
 
-for d in [INPUT_DIR, IMAGE_DIR, OUTPUT_DIR]:
-    os.makedirs(d, exist_ok=True)
+def get_workspace(tool_context: ToolContext):
+    return workspaces.get(workspace_id_from_context(tool_context))
+
+
+def uploaded_pdf_bytes(tool_context: ToolContext):
+    """Bytes of the PDF attached to the current message, or None."""
+    user_content = tool_context.user_content
+    if not user_content or not user_content.parts:
+        return None
+    for part in user_content.parts:
+        if hasattr(part, "inline_data") and part.inline_data:
+            if part.inline_data.mime_type == "application/pdf":
+                return part.inline_data.data
+    return None
 
 
 
 # # --- TOOL 1: JEMBATAN UI KE LOKAL ---
 async def save_ui_file_to_local(filename: str, tool_context: ToolContext):
     """
-    Saves the file attached in the UI to the local 'inputs' folder. 
+    Saves the file attached in the UI to this session's 'inputs' folder. 
     Run this tool first before processing any PDF.
 
     """
@@ -118,14 +414,26 @@ async def save_ui_file_to_local(filename: str, tool_context: ToolContext):
                     break
 
         if found_part:
-            # 4. Buat folder dan simpan datanya (bytes)
-            os.makedirs(INPUT_DIR, exist_ok=True)
-            path = os.path.join(INPUT_DIR, filename)
-            
-            with open(path, "wb") as f:
-                f.write(found_part.data) # .data berisi bytes PDF
-                
-            return f"SUCCESS: File '{filename}' berhasil disimpan secara lokal di {path}"
+            # 4. Simpan datanya (bytes) sekali di blob store (nama file = sha256), lalu
+            #    hard-link ke workspace session ini. Upload ulang file yang sama tidak ditulis lagi.
+            filename = safe_name(filename)
+            workspace = get_workspace(tool_context)
+            if blob_store is not None:
+                digest, created = blob_store.put(filename, found_part.data) # .data berisi bytes PDF
+                path = workspace.link_input(filename, blob_store.path(digest))
+                logger.info(f"Blob store: {blob_store.stats()}")
+            else:
+                digest, created = sha256_hex(found_part.data), True
+                path = workspace.write_input(filename, found_part.data)
+
+            # Hash dokumen disimpan di session state -> hasil turunan (ekstraksi, teks) bisa dipakai ulang
+            documents = dict(tool_context.state.get("documents") or {})
+            documents[filename] = digest
+            tool_context.state["documents"] = documents
+            tool_context.state["document_sha256"] = digest
+
+            status = "disimpan" if created else "sudah ada (dedup, tidak ditulis ulang)"
+            return f"SUCCESS: File '{filename}' {status} secara lokal di {path} (sha256 {digest[:12]})"
         
         return f"ERROR: File '{filename}' tidak ditemukan di dalam pesan."
 
@@ -135,28 +443,152 @@ async def save_ui_file_to_local(filename: str, tool_context: ToolContext):
 
 vision_model = GenerativeModel("gemini-2.0-flash-001")
 
-async def classify_image_with_vision(image_bytes: bytes) -> bool:
-    image_part = types.Part.from_bytes(
-        data=image_bytes,
-        mime_type="image/png"
+VISION_MODEL = os.environ.get("VISION_MODEL", "gemini-2.0-flash-001")
+VISION_CONCURRENCY = int(os.environ.get("VISION_CONCURRENCY", "8"))
+VISION_MAX_RETRIES = int(os.environ.get("VISION_MAX_RETRIES", "5"))
+# 429 (quota) dan 5xx sementara layak di-retry dengan backoff
+_RETRYABLE_STATUS = {429, 500, 503}
+# 400 lain (prompt/schema salah) tidak akan sembuh dengan memecah batch
+_PAYLOAD_TOO_LARGE_HINTS = ("too large", "payload size", "request size", "exceeds the maximum", "token count")
+
+
+# Batas concurrency berlaku untuk semua dokumen/batch di event loop yang sama, bukan per panggilan
+_vision_limiter = LoopSemaphore(VISION_CONCURRENCY)
+
+
+def _is_retryable(error: Exception) -> bool:
+    return isinstance(error, genai_errors.APIError) and error.code in _RETRYABLE_STATUS
+
+
+def _is_payload_too_large(error: Exception) -> bool:
+    if not isinstance(error, genai_errors.APIError):
+        return False
+    if error.code == 413:
+        return True
+    message = (getattr(error, "message", None) or str(error)).lower()
+    return error.code == 400 and any(hint in message for hint in _PAYLOAD_TOO_LARGE_HINTS)
+
+
+# Normalisasi gambar (thumbnail untuk vision, versi ter-cap untuk PDF), di-cache per hash konten.
+# Mode memory: tanpa cache disk
+image_normalizer = ImageNormalizer(
+    cache_dir=None if ARTIFACT_MODE == "memory"
+    else os.environ.get("IMAGE_NORMALIZE_CACHE_DIR") or os.path.join(BASE_DIR, "cache", "normalized"),
+    thumbnail_px=int(os.environ.get("VISION_THUMBNAIL_PX", "512")),
+    embed_max_px=int(os.environ.get("IMAGE_EMBED_MAX_PX", "1600")),
+    jpeg_quality=int(os.environ.get("IMAGE_JPEG_QUALITY", "85")),
+    max_age_seconds=float(os.environ.get("IMAGE_NORMALIZE_CACHE_TTL_SECONDS", "604800")),
+)
+workspaces.add_gc_hook(image_normalizer.collect_garbage)
+
+# Cache verdict per hash gambar: logo/banner penerbit yang berulang tidak dikirim ke Gemini lagi
+# (mode memory: SQLite in-memory, hilang saat proses berhenti)
+image_cache = image_cache_from_env(
+    os.path.join(BASE_DIR, "cache", "image_verdicts.db"),
+    in_memory=ARTIFACT_MODE == "memory",
+)
+
+
+# Batch: banyak gambar dalam satu request Gemini (1 = nonaktif)
+VISION_BATCH_SIZE = int(os.environ.get("VISION_BATCH_SIZE", "8"))
+# Batas payload inline per request (~20 MB di Vertex), beri margin untuk overhead base64/prompt
+VISION_BATCH_MAX_BYTES = int(os.environ.get("VISION_BATCH_MAX_BYTES", str(12 * 1024 * 1024)))
+
+VISION_SINGLE_PROMPT = (
+    "Classify this image as SCIENTIFIC_FIGURE or PUBLISHER_ARTIFACT. "
+    "Respond with ONLY ONE WORD."
+)
+VISION_BATCH_PROMPT = (
+    "You will receive {count} images, each preceded by its index. "
+    "Classify EACH image as SCIENTIFIC_FIGURE or PUBLISHER_ARTIFACT "
+    "(logos, branding, headers, banners, badges, decorations). "
+    "Return one entry per image with its index and verdict."
+)
+
+# Kunci cache verdict: semua yang memengaruhi jawaban model untuk satu gambar.
+# Bump VISION_PROMPT_VERSION untuk membuang verdict lama tanpa mengubah model/prompt.
+VISION_PROMPT_VERSION = os.environ.get("VISION_PROMPT_VERSION", "1")
+VISION_CLASSIFIER_VERSION = classifier_version(
+    VISION_MODEL,
+    VISION_SINGLE_PROMPT,
+    VISION_BATCH_PROMPT,
+    VISION_VERDICTS,
+    image_normalizer.thumbnail_px,
+    VISION_PROMPT_VERSION,
+)
+
+_BATCH_VERDICT_SCHEMA = types.Schema(
+    type=types.Type.ARRAY,
+    items=types.Schema(
+        type=types.Type.OBJECT,
+        properties={
+            "index": types.Schema(type=types.Type.INTEGER),
+            "verdict": types.Schema(type=types.Type.STRING, enum=list(VISION_VERDICTS)),
+        },
+        required=["index", "verdict"],
+    ),
+)
+
+
+async def _generate_content(model: str, contents: list, config: types.GenerateContentConfig,
+                            limiter: LoopSemaphore, max_retries: int):
+    """One generate_content request under `limiter`, retried on quota/transient errors."""
+    return await call_with_retry(
+        lambda: genai_client.aio.models.generate_content(
+            model=model,
+            contents=contents,
+            config=config,
+        ),
+        limiter,
+        max_retries,
+        _is_retryable,
     )
 
-    response = genai_client.models.generate_content(
-        model="gemini-2.0-flash-001",
-        contents=[
-            "Classify this image as SCIENTIFIC_FIGURE or PUBLISHER_ARTIFACT. "
-            "Respond with ONLY ONE WORD.",
-            image_part
+
+async def _generate_vision_content(contents: list, config: types.GenerateContentConfig):
+    return await _generate_content(VISION_MODEL, contents, config, _vision_limiter, VISION_MAX_RETRIES)
+
+
+async def _classify_single_image(image_bytes: bytes) -> str:
+    response = await _generate_vision_content(
+        [
+            VISION_SINGLE_PROMPT,
+            types.Part.from_bytes(data=image_bytes, mime_type=guess_image_mime(image_bytes)),
         ],
-        config=types.GenerateContentConfig(
+        types.GenerateContentConfig(
             temperature=0
         )
     )
+    print(f"Vision result: {response.text.strip().upper()}")
+    return response.text
+
+
+async def _classify_image_batch(images: list) -> str:
+    contents = [VISION_BATCH_PROMPT.format(count=len(images))]
+    for index, image_bytes in enumerate(images):
+        contents.append(f"Image {index}:")
+        contents.append(types.Part.from_bytes(data=image_bytes, mime_type=guess_image_mime(image_bytes)))
+    response = await _generate_vision_content(
+        contents,
+        types.GenerateContentConfig(
+            temperature=0,
+            response_mime_type="application/json",
+            response_schema=_BATCH_VERDICT_SCHEMA,
+        ),
+    )
+    return response.text
 
-    result = response.text.strip().upper()
-    print(f"Vision result: {result}")
 
-    return result == "SCIENTIFIC_FIGURE"
+# Cache verdict, dedup lintas panggilan, packing batch dan pemecahan batch yang terlalu besar
+vision_classifier = VisionClassifier(
+    _classify_single_image,
+    _classify_image_batch,
+    VISION_CLASSIFIER_VERSION,
+    cache=image_cache,
+    batch_size=VISION_BATCH_SIZE,
+    batch_max_bytes=VISION_BATCH_MAX_BYTES,
+    is_payload_too_large=_is_payload_too_large,
+)
 
 def normalize_figures(content: str) -> str:
     """
@@ -176,8 +608,72 @@ def normalize_figures(content: str) -> str:
 
     return "\n".join(output)
 
-# --- TOOL 2: EKSTRAKSI DARI LOKAL (TIDAK BUTUH CONTEXT) ---
-async def extract_images_from_local(filename: str):
+PDF_EXTRACT_WORKERS = int(os.environ.get("PDF_EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1))))
+# PDF di bawah ukuran ini tetap memakai jalur single-process yang murah
+PDF_PARALLEL_MIN_BYTES = int(os.environ.get("PDF_PARALLEL_MIN_BYTES", str(10 * 1024 * 1024)))
+_pdf_process_pool = None
+
+# Concurrency & backpressure untuk pipeline extract -> classify -> persist
+PIPELINE_CLASSIFIER_WORKERS = int(os.environ.get("PIPELINE_CLASSIFIER_WORKERS", "4"))
+PIPELINE_WRITER_WORKERS = int(os.environ.get("PIPELINE_WRITER_WORKERS", "2"))
+PIPELINE_QUEUE_SIZE = int(os.environ.get("PIPELINE_QUEUE_SIZE", "16"))
+PIPELINE_MAX_IN_FLIGHT = int(os.environ.get("PIPELINE_MAX_IN_FLIGHT", "64"))
+
+
+# Manifest hasil ekstraksi per hash PDF: file yang sama tidak diparse & diklasifikasi ulang.
+# Versi berubah (-> manifest lama miss) bila model, prompt, filter atau normalisasi berubah.
+EXTRACTION_VERSION = classifier_version(
+    VISION_CLASSIFIER_VERSION,
+    filter_config_from_env(),
+    [image_normalizer.thumbnail_px, image_normalizer.embed_max_px, image_normalizer.jpeg_quality],
+)
+extraction_manifests = manifest_store_from_env(
+    os.path.join(BASE_DIR, "cache", "extraction"),
+    enabled_by_default=ARTIFACT_MODE != "memory",
+    max_age_seconds=CACHE_RETENTION_SECONDS,
+)
+if extraction_manifests is not None:
+    workspaces.add_gc_hook(extraction_manifests.collect_garbage)
+
+
+def get_pdf_process_pool():
+    """Process pool for page-sharded extraction, created on first use."""
+    global _pdf_process_pool
+    if _pdf_process_pool is None and PDF_EXTRACT_WORKERS > 1:
+        _pdf_process_pool = ProcessPoolExecutor(
+            max_workers=PDF_EXTRACT_WORKERS,
+            mp_context=pdf_pool_context(),
+        )
+    return _pdf_process_pool
+
+
+def resolve_input_pdf(filename: str, tool_context: ToolContext):
+    """
+    Returns (input_name, source) for a PDF of this session, where source is a path
+    (disk mode) or bytes (memory mode) that PyMuPDF can open, or (None, None).
+    """
+    workspace = get_workspace(tool_context)
+    input_name = safe_name(filename) if filename else None
+    source = workspace.input_source(input_name) if input_name else None
+    if source is None:
+        # Nama dari LLM kadang sedikit berbeda: pakai PDF terbaru di workspace session ini
+        pdfs = workspace.list_inputs(".pdf")
+        if pdfs:
+            input_name = pdfs[0]
+            source = workspace.input_source(input_name)
+        elif ARTIFACT_MODE == "memory":
+            # Langsung dari buffer inline_data, tanpa round-trip ke disk
+            source = uploaded_pdf_bytes(tool_context)
+    return input_name, source
+
+
+def document_hash(input_name: str, source, tool_context: ToolContext) -> str:
+    """Hash dari save_ui_file_to_local (session state), atau dihitung bila belum ada."""
+    return (tool_context.state.get("documents") or {}).get(input_name) or sha256_of_source(source)
+
+
+# --- TOOL 2: EKSTRAKSI DARI LOKAL ---
+async def extract_images_from_local(filename: str, tool_context: ToolContext):
     """
     Extracts images from a PDF that has been synchronized to local storage.
     Args:
@@ -185,31 +681,262 @@ async def extract_images_from_local(filename: str):
     """
     print(f"filename: {filename}")
 
-    file_path = os.path.join(INPUT_DIR, "JCRMHS.pdf")
-    if not os.path.exists(file_path):
+    workspace = get_workspace(tool_context)
+    input_name, source = resolve_input_pdf(filename, tool_context)
+    if source is None:
         return f"Error: File belum disinkronkan. Jalankan 'save_ui_file_to_local' dulu."
 
     try:
-        doc = fitz.open(file_path)
-        image_count = 0
-        # Bersihkan folder gambar lama
-        for f in os.listdir(IMAGE_DIR): os.remove(os.path.join(IMAGE_DIR, f))
-
-        for page in doc:
-            for img in page.get_images(full=True):
-                xref = img[0]
-                base_image = doc.extract_image(xref)
-                if not await classify_image_with_vision(base_image["image"]):
-                    continue    
-                image_count += 1
-                path = os.path.join(IMAGE_DIR, f"figure{image_count}.png")
-                with open(path, "wb") as f:
-                    f.write(base_image["image"])
-        doc.close()
-        return f"SUCCESS: {image_count} gambar diekstrak secara lokal."
+        # Bersihkan folder gambar lama (hanya milik session ini)
+        workspace.clear_figures()
+
+        document_sha256 = document_hash(input_name, source, tool_context)
+        if extraction_manifests is not None:
+            manifest = extraction_manifests.get(document_sha256, EXTRACTION_VERSION)
+            if manifest is not None:
+                for figure in manifest["figures"]:
+                    workspace.write_figure(figure["name"], extraction_manifests.figure_bytes(figure))
+                return (
+                    f"SUCCESS: {len(manifest['figures'])} gambar diekstrak secara lokal "
+                    f"(dari manifest tersimpan untuk sha256 {document_sha256[:12]}). "
+                    f"File: {', '.join(figure['name'] for figure in manifest['figures']) or '-'}. "
+                    f"Pre-filter: {format_filter_report(manifest['filter_report'])}."
+                )
+
+        # Pipeline bertahap: ekstraksi (CPU) -> klasifikasi (network) -> tulis ke disk.
+        # Parsing PyMuPDF jalan di luar event loop; PDF besar dipecah per halaman ke process pool.
+        filter_report = new_filter_report()
+
+        def candidates():
+            for candidate in iter_candidate_images(
+                source,
+                filter_config_from_env(),
+                filter_report,
+                executor=get_pdf_process_pool(),
+                shard_count=PDF_EXTRACT_WORKERS,
+                min_parallel_bytes=PDF_PARALLEL_MIN_BYTES,
+            ):
+                # Thumbnail kecil untuk classifier, versi ter-cap (JPEG/PNG sesuai konten) untuk PDF
+                candidate.update(image_normalizer.normalize(candidate["image"]))
+                yield candidate
+
+        def write_figure(number, candidate):
+            return workspace.write_figure(f"figure{number}.{candidate['ext']}", candidate["embed"])
+
+        figures, timings = await run_figure_pipeline(
+            candidates,
+            vision_classifier.classify_many,
+            write_figure,
+            classifier_workers=PIPELINE_CLASSIFIER_WORKERS,
+            writer_workers=PIPELINE_WRITER_WORKERS,
+            batch_size=VISION_BATCH_SIZE,
+            queue_size=PIPELINE_QUEUE_SIZE,
+            max_in_flight=PIPELINE_MAX_IN_FLIGHT,
+        )
+        logger.info(f"Image pre-filter: {format_filter_report(filter_report)}")
+        logger.info(f"Figure pipeline timings: {timings}")
+
+        if extraction_manifests is not None:
+            extraction_manifests.put(
+                document_sha256,
+                EXTRACTION_VERSION,
+                [
+                    {
+                        "number": number,
+                        "name": os.path.basename(path),
+                        "page": candidate["page"],
+                        "xref": candidate["xref"],
+                        "verdict": "SCIENTIFIC_FIGURE",
+                        "data": candidate["embed"],
+                    }
+                    for number, candidate, path in figures
+                ],
+                filter_report=filter_report,
+                rejected_by_classifier=filter_report["candidates"] - len(figures),
+            )
+
+        return (
+            f"SUCCESS: {len(figures)} gambar diekstrak secara lokal. "
+            f"File: {', '.join(os.path.basename(path) for _, _, path in figures) or '-'}. "
+            f"Pre-filter: {format_filter_report(filter_report)}. "
+            f"Timings: {timings}."
+        )
     except Exception as e:
         return f"Error ekstraksi: {str(e)}"
 
+# Segmentasi teks naskah (IMRaD/ICMJE), di-cache per hash dokumen
+section_store = SectionStore(
+    cache_dir=None if ARTIFACT_MODE == "memory"
+    else os.environ.get("SECTION_CACHE_DIR") or os.path.join(BASE_DIR, "cache", "sections"),
+    max_age_seconds=CACHE_RETENTION_SECONDS,
+)
+workspaces.add_gc_hook(section_store.collect_garbage)
+# Batas teks per section yang dikembalikan ke model
+SECTION_MAX_CHARS = int(os.environ.get("SECTION_MAX_CHARS", "20000"))
+
+
+async def load_manuscript_sections(tool_context: ToolContext, filename: str | None = None):
+    """Returns (document_sha256, segmentation) for the session's PDF, or (None, None)."""
+    input_name, source = resolve_input_pdf(filename, tool_context)
+    if source is None:
+        return None, None
+    document_sha256 = document_hash(input_name, source, tool_context)
+    segmentation = section_store.get(document_sha256)
+    if segmentation is None:
+        # PyMuPDF CPU-bound -> jalan di thread, bukan di event loop
+        segmentation = await asyncio.to_thread(segment_pdf, source)
+        section_store.set(document_sha256, segmentation)
+    return document_sha256, segmentation
+
+
+async def get_manuscript_sections(sections: list[str], tool_context: ToolContext):
+    """
+    Returns the section outline of the uploaded manuscript PDF (section names,
+    pages, sizes and expected ICMJE sections that were not found), plus the
+    full text of the requested sections.
+    Args:
+        sections: Section names to return in full, e.g. ["methods", "funding",
+            "conflicts_of_interest"]. Pass an empty list to get only the outline.
+    """
+    try:
+        document_sha256, segmentation = await load_manuscript_sections(tool_context)
+        if segmentation is None:
+            return "Error: Tidak ada PDF. Jalankan 'save_ui_file_to_local' dulu."
+
+        parts = [f"OUTLINE (sha256 {document_sha256[:12]}):\n{format_outline(segmentation)}"]
+        selected = select_sections(segmentation, sections or [])
+        for section in selected:
+            text = section["text"]
+            if len(text) > SECTION_MAX_CHARS:
+                text = text[:SECTION_MAX_CHARS] + f"\n[... truncated, {len(section['text'])} chars total]"
+            parts.append(f"## {section['name']} ({section['heading'] or 'untitled'}, p.{section['page_start']})\n{text}")
+        unknown = [n for n in sections or [] if not select_sections(segmentation, [n])]
+        if unknown:
+            parts.append(f"Sections not found: {', '.join(unknown)}")
+        return "\n\n".join(parts)
+    except Exception as e:
+        return f"Error segmentasi naskah: {e}"
+
+
+async def run_icmje_precheck(tool_context: ToolContext):
+    """
+    Runs deterministic ICMJE pre-checks (conflict of interest, funding, trial
+    registration, data sharing, ethics, corresponding author, word count, ...)
+    on the uploaded manuscript PDF and returns structured JSON findings.
+    """
+    try:
+        document_sha256, segmentation = await load_manuscript_sections(tool_context)
+        if segmentation is None:
+            return "Error: Tidak ada PDF. Jalankan 'save_ui_file_to_local' dulu."
+        report = run_precheck(segmentation)
+        logger.info(
+            f"Pre-check {document_sha256[:12]}: {len(report['findings'])} findings "
+            f"in {report['elapsed_ms']} ms"
+        )
+        return json.dumps(report, ensure_ascii=False)
+    except Exception as e:
+        return f"Error pre-check: {e}"
+
+
+# Map-reduce review: tiap section ditinjau paralel terhadap aturan ICMJE yang relevan
+REVIEW_MODEL = os.environ.get("REVIEW_MODEL", "gemini-2.0-flash-001")
+REVIEW_CONCURRENCY = int(os.environ.get("REVIEW_CONCURRENCY", "6"))
+REVIEW_MAX_RETRIES = int(os.environ.get("REVIEW_MAX_RETRIES", "5"))
+REVIEW_CHUNK_MAX_CHARS = int(os.environ.get("REVIEW_CHUNK_MAX_CHARS", "12000"))
+# Review ulang hanya section yang berubah sejak review sebelumnya di session yang sama
+REVIEW_INCREMENTAL = os.environ.get("REVIEW_INCREMENTAL", "true").lower() in ("1", "true", "yes")
+REVIEW_PROMPT_VERSION = os.environ.get("REVIEW_PROMPT_VERSION", "1")
+
+_SEVERITIES = ["HIGH", "MEDIUM", "LOW"]
+_SECTION_REVIEW_SCHEMA = types.Schema(
+    type=types.Type.OBJECT,
+    properties={
+        "issues": types.Schema(
+            type=types.Type.ARRAY,
+            items=types.Schema(
+                type=types.Type.OBJECT,
+                properties={
+                    "title": types.Schema(type=types.Type.STRING),
+                    "description": types.Schema(type=types.Type.STRING),
+                    "icmjeSection": types.Schema(type=types.Type.STRING),
+                    "severity": types.Schema(type=types.Type.STRING, enum=_SEVERITIES),
+                },
+                required=["title", "description", "icmjeSection", "severity"],
+            ),
+        ),
+        "clarificationQuestions": types.Schema(
+            type=types.Type.ARRAY,
+            items=types.Schema(
+                type=types.Type.OBJECT,
+                properties={
+                    "question": types.Schema(type=types.Type.STRING),
+                    "relatedIcmjeSection": types.Schema(type=types.Type.STRING),
+                },
+                required=["question", "relatedIcmjeSection"],
+            ),
+        ),
+    },
+    required=["issues", "clarificationQuestions"],
+)
+
+# Limiter sendiri: review dokumen panjang tidak boleh menghabiskan slot klasifikasi gambar (dan sebaliknya)
+_review_limiter = LoopSemaphore(REVIEW_CONCURRENCY)
+
+
+async def review_section_chunk(chunk: dict) -> dict:
+    """Map step: one section chunk vs. the ICMJE policy retrieved for that section."""
+    policy_context = await search_icmje_policy(policy_query_for(chunk["section"]))
+    response = await _generate_content(
+        REVIEW_MODEL,
+        [section_review_prompt(chunk, policy_context)],
+        types.GenerateContentConfig(
+            temperature=0,
+            response_mime_type="application/json",
+            response_schema=_SECTION_REVIEW_SCHEMA,
+        ),
+        _review_limiter,
+        REVIEW_MAX_RETRIES,
+    )
+    return json.loads(response.text)
+
+
+async def review_manuscript_parallel(tool_context: ToolContext):
+    """
+    Reviews a long uploaded manuscript PDF section by section in parallel
+    against the relevant ICMJE rules, merges the findings (including the
+    deterministic pre-check) and returns JSON in the structured output contract
+    (complianceIssues, clarificationQuestions, complianceStatus).
+    """
+    try:
+        document_sha256, segmentation = await load_manuscript_sections(tool_context)
+        if segmentation is None:
+            return "Error: Tidak ada PDF. Jalankan 'save_ui_file_to_local' dulu."
+
+        chunks = chunk_sections(segmentation, REVIEW_CHUNK_MAX_CHARS)
+        if REVIEW_INCREMENTAL:
+            # Hasil per section disimpan di session state; section yang hash-nya sama dipakai ulang
+            results, timings, section_reviews = await map_sections_incremental(
+                chunks,
+                review_section_chunk,
+                tool_context.state.get("section_reviews"),
+                REVIEW_CONCURRENCY,
+                settings=(REVIEW_MODEL, REVIEW_PROMPT_VERSION, os.environ.get("RAG_CORPUS_VERSION", "")),
+            )
+            tool_context.state["section_reviews"] = section_reviews
+        else:
+            results, timings = await map_sections(chunks, review_section_chunk, REVIEW_CONCURRENCY)
+        review = reduce_findings(results, run_precheck(segmentation)["findings"])
+        failed = [r["chunk"] for r in results if r.get("error")]
+        if failed:
+            review["unreviewedSections"] = failed
+        if REVIEW_INCREMENTAL:
+            review["changedSections"] = [r["chunk"] for r in results if not r.get("carried_forward")]
+        logger.info(f"Parallel review {document_sha256[:12]}: {timings}")
+        return json.dumps(dict(review, timings=timings), ensure_ascii=False)
+    except Exception as e:
+        return f"Error review: {e}"
+
+
 def has_manual_images(tool_context: ToolContext) -> bool:
     user_content = tool_context.user_content
     if not user_content or not user_content.parts:
@@ -233,129 +960,104 @@ async def bootstrap_inputs(tool_context: ToolContext):
     if has_manual_images(tool_context):
         await save_attached_images_to_local(tool_context)
 
-async def save_attached_images_to_local(tool_context):
+async def save_attached_images_to_local(tool_context: ToolContext):
     """
-    Saves manually attached images (non-PDF) to temp_figures folder.
+    Saves manually attached images (non-PDF) to this session's figures folder.
     """
     user_content = tool_context.user_content
     if not user_content or not user_content.parts:
         return "No attached images found."
     print(f"User content parts: {len(user_content.parts)}")
-    image_count = 0
-    for part in user_content.parts:
-        if hasattr(part, "inline_data") and part.inline_data:
-            if part.inline_data.mime_type.startswith("image/"):
-                image_count += 1
-                filename = f"figure{image_count}.png"
-                path = os.path.join(IMAGE_DIR, filename)
-
-                with open(path, "wb") as f:
-                    f.write(part.inline_data.data)
+    workspace = get_workspace(tool_context)
+    images = [
+        part.inline_data.data for part in user_content.parts
+        if getattr(part, "inline_data", None) and part.inline_data.mime_type.startswith("image/")
+    ]
+    if images:
+        # Set gambar baru menggantikan yang lama; figure1.png lama tidak boleh tertinggal di samping figure1.jpg
+        workspace.clear_figures()
+    filenames = []
+    for data in images:
+        normalized = image_normalizer.normalize(data)
+        filename = f"figure{len(filenames) + 1}.{normalized['ext']}"
+        workspace.write_figure(filename, normalized["embed"])
+        filenames.append(filename)
 
-    return f"SUCCESS: {image_count} manual images saved."
+    return f"SUCCESS: {len(filenames)} manual images saved. Files: {', '.join(filenames) or '-'}."
 
-def inject_manual_images(content: str):
+def render_reconstructed_pdf(content: str, workspace) -> bytes:
     """
-    Insert image tags ONLY after existing Figure X captions.
-    Do NOT duplicate Figure titles or captions.
+    Renders the manuscript text and its [[INSERT_IMAGE: ...]] figures to PDF bytes.
     """
-    for i, img in enumerate(sorted(os.listdir(IMAGE_DIR)), start=1):
-        tag = f"[[INSERT_IMAGE: {img}]]"
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_font("Helvetica", size=11)
 
-        # Regex: find "Figure X:" block (caption already exists)
-        pattern = rf"(Figure {i}:[^\n]+(?:\n(?!Figure \d:).+)*)"
+    # Sanitasi sekali untuk seluruh teks (transliterasi ke Latin-1, tag gambar diisolasi)
+    parts = re.split(r'(\[\[INSERT_IMAGE:.*?\]\])', sanitize_text_for_pdf(content))
 
-        match = re.search(pattern, content, re.IGNORECASE)
-        if match:
-            block = match.group(1)
-            if tag not in block:
-                content = content.replace(block, f"{block}\n\n{tag}", 1)
-        else:
-            # fallback ONLY if figure truly not referenced
-            content += f"\n\n{tag}\n"
+    # Tag yang menunjuk file tidak ada = gambar hilang dari PDF; gagal dengan daftar nama yang valid
+    available = workspace.list_figures()
+    missing = sorted({
+        part.strip().replace("[[INSERT_IMAGE:", "").replace("]]", "").strip()
+        for part in parts if part.strip().startswith("[[INSERT_IMAGE:")
+    } - set(available))
+    if missing:
+        raise ValueError(
+            f"[[INSERT_IMAGE]] tags refer to figures not in this session: {', '.join(missing)}. "
+            f"Available figures: {', '.join(available) or '-'}"
+        )
 
-    return content
+    usable_width = pdf.w - pdf.l_margin - pdf.r_margin
 
-def sanitize_text_for_pdf(content: str) -> str:
-    """
-        1. Remove invisible / PDF-breaking unicode
-        2. Force image tags to be isolated by newlines
-        3. Normalize whitespace
-    """
+    for part in parts:
+        part = part.strip()
+        if not part:
+            continue
 
-    # Remove known PDF-breaking chars
-    bad_chars = [
-        "\u000c",  # form feed
-        "\u00ad",  # soft hyphen
-        "\u2028",  # line separator
-        "\u2029",  # paragraph separator
-    ]
-    for ch in bad_chars:
-        content = content.replace(ch, "")
-
-    # Force image tags to be on their own lines
-    content = re.sub(
-        r"\s*\[\[INSERT_IMAGE:\s*(.*?)\]\]\s*",
-        r"\n\n[[INSERT_IMAGE: \1]]\n\n",
-        content
-    )
+        if part.startswith("[[INSERT_IMAGE:"):
+            img_name = part.replace("[[INSERT_IMAGE:", "").replace("]]", "").strip()
+            pdf.ln(5)
+            pdf.set_x(pdf.l_margin)
+            # Path (mode disk) atau BytesIO (mode memory)
+            pdf.image(workspace.figure_source(img_name), w=usable_width)
+            pdf.ln(10)
+            pdf.set_x(pdf.l_margin)
 
-    # Normalize newlines
-    content = re.sub(r"\n{3,}", "\n\n", content)
+        else:
+            pdf.set_x(pdf.l_margin)
+            pdf.multi_cell(usable_width, 7, part)
 
-    return content.strip()
+    return bytes(pdf.output())
 
 # --- TOOL 3: GENERATE PDF KE LOKAL ---
-def generate_reconstructed_pdf_local(content: str):
+def generate_reconstructed_pdf_local(content: str, workspace):
     """
-    Generates the final PDF locally in the 'outputs' folder.
+    Generates the final PDF locally in the workspace's 'outputs' folder.
     """
     try:
-        pdf = FPDF()
-        pdf.add_page()
-        pdf.set_font("Helvetica", size=11)
-
-        parts = re.split(r'(\[\[INSERT_IMAGE:.*?\]\])', content)
-        usable_width = pdf.w - pdf.l_margin - pdf.r_margin
-
-        for part in parts:
-            part = part.strip()
-            if not part:
-                continue
-
-            if part.startswith("[[INSERT_IMAGE:"):
-                img_name = part.replace("[[INSERT_IMAGE:", "").replace("]]", "").strip()
-                img_path = os.path.join(IMAGE_DIR, img_name)
-
-                if os.path.exists(img_path):
-                    pdf.ln(5)
-                    pdf.set_x(pdf.l_margin)
-                    pdf.image(img_path, w=usable_width)
-                    pdf.ln(10)
-                    pdf.set_x(pdf.l_margin)
-
-            else:
-                clean_text = sanitize_text_for_pdf(part)
-                clean_text = clean_text.encode('latin-1', 'replace').decode('latin-1')
-                pdf.set_x(pdf.l_margin)
-                pdf.multi_cell(usable_width, 7, clean_text)
-
-        save_path = os.path.join(OUTPUT_DIR, f"reconstructed_{uuid.uuid4().hex[:4]}.pdf")
-        pdf.output(save_path)
+        save_path = workspace.write_output(
+            f"reconstructed_{uuid.uuid4().hex[:4]}.pdf", render_reconstructed_pdf(content, workspace)
+        )
         return f"SUCCESS: PDF tersimpan secara lokal di: {save_path}"
     except Exception as e:
         return f"Error PDF: {str(e)}"
+
+async def generate_reconstructed_pdf_artifact(content: str, workspace, tool_context: ToolContext):
+    """
+    Generates the final PDF in memory and publishes it as an ADK artifact.
+    """
+    try:
+        pdf_bytes = render_reconstructed_pdf(content, workspace)
+        filename = f"reconstructed_{uuid.uuid4().hex[:4]}.pdf"
+        artifact_part = types.Part.from_bytes(data=pdf_bytes, mime_type="application/pdf")
+        await tool_context.save_artifact(filename=filename, artifact=artifact_part)
+        return f"SUCCESS: PDF '{filename}' dapat diunduh dari tab Artifacts di UI."
+    except Exception as e:
+        return f"Error PDF: {e}"
     
 def is_pdf_uploaded(tool_context: ToolContext) -> bool:
-    user_content = tool_context.user_content
-    if not user_content or not user_content.parts:
-        return False
-
-    for part in user_content.parts:
-        if hasattr(part, "inline_data") and part.inline_data:
-            if part.inline_data.mime_type == "application/pdf":
-                return True
-    return False
+    return uploaded_pdf_bytes(tool_context) is not None
 
 async def reconstruct_and_generate_pdf(content: str, tool_context: ToolContext):
     """
@@ -371,10 +1073,13 @@ async def reconstruct_and_generate_pdf(content: str, tool_context: ToolContext):
     else:
         mode = "MANUAL"
 
+    workspace = get_workspace(tool_context)
     if mode == "MANUAL":
-        content = inject_manual_images(content)
+        content = place_figures(content, workspace.list_figures())
 
-    return generate_reconstructed_pdf_local(content)
+    if ARTIFACT_MODE == "memory":
+        return await generate_reconstructed_pdf_artifact(content, workspace, tool_context)
+    return generate_reconstructed_pdf_local(content, workspace)
 
 root_agent = Agent(
     model='gemini-2.0-flash-001',
@@ -383,6 +1088,10 @@ root_agent = Agent(
     tools=[
         # ask_vertex_retrieval,
         search_icmje_policy,
+        search_icmje_policies,
+        get_manuscript_sections,
+        run_icmje_precheck,
+        review_manuscript_parallel,
         reconstruct_and_generate_pdf,
         extract_images_from_local,
         save_ui_file_to_local,
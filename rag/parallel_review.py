@@ -0,0 +1,268 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Map-reduce compliance review over manuscript sections.
+
+Map: the segmented manuscript is cut into section chunks, and each chunk is
+reviewed on its own against the ICMJE policy text relevant to that section,
+with bounded concurrency. Reduce: chunk findings (plus deterministic
+pre-check findings) are merged, de-duplicated and numbered, and the overall
+Compliance Status from the root instructions is assigned. Wall-clock time is
+bounded by the slowest chunk rather than the whole document.
+
+Reviews can be incremental: each chunk has a stable key and a fingerprint of
+its text and review settings, and results from a previous pass are carried
+forward for chunks whose fingerprint did not change.
+"""
+
+import asyncio
+import hashlib
+import re
+import time
+
+# Section name -> ICMJE policy query used to retrieve the rules it is checked against
+SECTION_POLICY_QUERIES = {
+    "title_page": "ICMJE title page requirements authorship corresponding author word count",
+    "abstract": "ICMJE abstract requirements and trial registration number in abstract",
+    "keywords": "ICMJE manuscript preparation title page and abstract",
+    "introduction": "ICMJE manuscript preparation introduction",
+    "methods": "ICMJE methods reporting statistics ethics approval informed consent reporting guidelines",
+    "results": "ICMJE results reporting statistics",
+    "discussion": "ICMJE discussion reporting limitations",
+    "conclusions": "ICMJE discussion and conclusions reporting",
+    "limitations": "ICMJE discussion reporting limitations",
+    "ethics": "ICMJE protection of research participants ethics approval informed consent",
+    "trial_registration": "ICMJE clinical trial registration requirements",
+    "data_sharing": "ICMJE data sharing statement requirements",
+    "author_contributions": "ICMJE authorship criteria and contributor roles",
+    "conflicts_of_interest": "ICMJE disclosure of financial and non-financial relationships conflicts of interest",
+    "funding": "ICMJE funding source disclosure role of sponsor",
+    "ai_disclosure": "ICMJE use of AI-assisted technology disclosure",
+    "acknowledgments": "ICMJE non-author contributors acknowledgments",
+    "references": "ICMJE references requirements",
+    "figure_legends": "ICMJE illustrations figures and legends",
+}
+DEFAULT_POLICY_QUERY = "ICMJE manuscript preparation and reporting requirements"
+
+COMPLIANCE_STATUSES = ("COMPLIANT", "CONDITIONALLY_COMPLIANT", "NOT_COMPLIANT")
+
+_PARAGRAPH_RE = re.compile(r"\n\s*\n|\n(?=[A-Z])")
+_KEY_RE = re.compile(r"[^a-z0-9]+")
+
+
+def policy_query_for(section_name: str) -> str:
+    return SECTION_POLICY_QUERIES.get(section_name, DEFAULT_POLICY_QUERY)
+
+
+def chunk_sections(segmentation: dict, max_chars: int = 12000) -> list:
+    """
+    Splits sections into review chunks of at most ~max_chars, on paragraph
+    boundaries where possible. Returns [{"id", "key", "section", "heading",
+    "part", "page_start", "text"}]; "key" (section name, occurrence, part) stays
+    the same across revisions even when pages shift.
+    """
+    chunks = []
+    occurrences = {}
+    for section in segmentation["sections"]:
+        text = section["text"]
+        if not text.strip():
+            continue
+        pieces, current = [], ""
+        for paragraph in _PARAGRAPH_RE.split(text):
+            while len(paragraph) > max_chars:  # a single huge paragraph
+                if current:
+                    pieces.append(current)
+                    current = ""
+                pieces.append(paragraph[:max_chars])
+                paragraph = paragraph[max_chars:]
+            if current and len(current) + len(paragraph) + 1 > max_chars:
+                pieces.append(current)
+                current = ""
+            current = f"{current}\n{paragraph}" if current else paragraph
+        if current:
+            pieces.append(current)
+        occurrence = occurrences[section["name"]] = occurrences.get(section["name"], 0) + 1
+        for part, piece in enumerate(pieces, start=1):
+            chunks.append({
+                "id": f"{section['name']}#{section['page_start']}.{part}",
+                "key": f"{section['name']}:{occurrence}:{part}",
+                "section": section["name"],
+                "heading": section["heading"],
+                "part": part,
+                "page_start": section["page_start"],
+                "text": piece.strip(),
+            })
+    return chunks
+
+
+def section_review_prompt(chunk: dict, policy_context: str) -> str:
+    heading = chunk["heading"] or chunk["section"].replace("_", " ")
+    return (
+        "You are a medical publishing and research ethics compliance expert reviewing ONE section of a "
+        "manuscript against the ICMJE Recommendations (Updated April 2025).\n"
+        "Review ONLY the section below. Do not report elements that normally belong to other sections "
+        "(they are reviewed separately). Do not invent ICMJE sections; cite only the policy text given. "
+        "Report only ICMJE-mandated requirements, not optional best practices. "
+        "Ask a clarification question when required information is unclear or ambiguous.\n\n"
+        f"ICMJE POLICY CONTEXT:\n{policy_context}\n\n"
+        f"MANUSCRIPT SECTION: {heading} (page {chunk['page_start']}, part {chunk['part']})\n"
+        f"{chunk['text']}"
+    )
+
+
+def _finding_key(*parts) -> str:
+    return "|".join(_KEY_RE.sub(" ", str(p).lower()).strip() for p in parts)
+
+
+def reduce_findings(chunk_results: list, precheck_findings: list | None = None) -> dict:
+    """
+    Merges chunk results ({"chunk", "issues", "clarificationQuestions"}) and
+    pre-check findings into the root agent's structured output contract.
+
+    Status: any HIGH issue -> NOT_COMPLIANT; any other issue or a required
+    clarification -> CONDITIONALLY_COMPLIANT; otherwise COMPLIANT. Chunks
+    whose review failed ("error") were never checked, so they become a
+    required clarification naming them and the status is never COMPLIANT.
+    """
+    issues, questions, seen = [], [], set()
+
+    for finding in precheck_findings or []:
+        key = _finding_key(finding["title"], finding["icmjeSection"])
+        seen.add(key)
+        issues.append({
+            "title": f"Missing: {finding['title']}",
+            "description": f"No {finding['title'].lower()} was found in the manuscript (deterministic pre-check).",
+            "icmjeSection": finding["icmjeSection"],
+            "severity": finding["severity"],
+            "source": "precheck",
+        })
+
+    for result in chunk_results:
+        for issue in result.get("issues", []):
+            key = _finding_key(issue.get("title", ""), issue.get("icmjeSection", ""))
+            if key in seen:
+                continue
+            seen.add(key)
+            issues.append(dict(issue, severity=str(issue.get("severity", "MEDIUM")).upper(),
+                               source=result["chunk"]))
+        for question in result.get("clarificationQuestions", []):
+            key = _finding_key(question.get("question", ""))
+            if key in seen:
+                continue
+            seen.add(key)
+            questions.append(dict(question, required=True, source=result["chunk"]))
+
+    failed = [result["chunk"] for result in chunk_results if result.get("error")]
+    if failed:
+        questions.append({
+            "question": (
+                f"The automated review failed for these manuscript sections, so they were not checked: "
+                f"{', '.join(failed)}. Please confirm they meet the ICMJE requirements or run the review again."
+            ),
+            "relatedIcmjeSection": "",
+            "required": True,
+            "source": "review",
+        })
+
+    for number, issue in enumerate(issues, start=1):
+        issue["id"] = f"CI-{number}"
+    for number, question in enumerate(questions, start=1):
+        question["id"] = f"Q-{number}"
+
+    if any(issue["severity"] == "HIGH" for issue in issues):
+        status = "NOT_COMPLIANT"
+    elif issues or questions:
+        status = "CONDITIONALLY_COMPLIANT"
+    else:
+        status = "COMPLIANT"
+
+    return {"complianceIssues": issues, "clarificationQuestions": questions, "complianceStatus": status}
+
+
+async def map_sections(chunks: list, review_chunk, concurrency: int = 6):
+    """
+    Runs `review_chunk(chunk) -> {"issues", "clarificationQuestions"}` over all
+    chunks with at most `concurrency` in flight. A failed chunk yields an
+    "error" entry instead of failing the whole review.
+
+    Returns (results in chunk order, timings).
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    durations = {}
+
+    async def run(chunk):
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                result = await review_chunk(chunk)
+            except Exception as e:
+                result = {"issues": [], "clarificationQuestions": [], "error": str(e)}
+            durations[chunk["id"]] = time.perf_counter() - started
+            return dict(result, chunk=chunk["id"], section=chunk["section"])
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(run(chunk) for chunk in chunks))
+    timings = {
+        "chunks": len(chunks),
+        "wall_s": round(time.perf_counter() - started, 3),
+        "slowest_chunk_s": round(max(durations.values(), default=0.0), 3),
+        "sum_chunk_s": round(sum(durations.values()), 3),
+    }
+    return results, timings
+
+
+def chunk_fingerprint(chunk: dict, *settings) -> str:
+    """Hash of the chunk text and everything else that affects its review."""
+    digest = hashlib.sha256(chunk["text"].encode("utf-8"))
+    for value in (chunk["section"], *settings):
+        digest.update(b"\0" + str(value).encode("utf-8"))
+    return digest.hexdigest()
+
+
+async def map_sections_incremental(chunks: list, review_chunk, previous: dict,
+                                   concurrency: int = 6, settings: tuple = ()):
+    """
+    Like map_sections, but chunks whose fingerprint matches `previous`
+    ({key: {"fingerprint", "result"}}, from an earlier pass) are not reviewed
+    again; their stored result is carried forward.
+
+    Returns (results in chunk order, timings, state) where state is the new
+    `previous` to keep for the next pass. Failed chunks are left out of the
+    state so they are retried.
+    """
+    previous = previous or {}
+    fingerprints = {chunk["key"]: chunk_fingerprint(chunk, *settings) for chunk in chunks}
+    changed = [
+        chunk for chunk in chunks
+        if previous.get(chunk["key"], {}).get("fingerprint") != fingerprints[chunk["key"]]
+    ]
+    reviewed, timings = await map_sections(changed, review_chunk, concurrency)
+    reviewed_by_key = {chunk["key"]: result for chunk, result in zip(changed, reviewed, strict=True)}
+
+    results, state = [], {}
+    for chunk in chunks:
+        result = reviewed_by_key.get(chunk["key"])
+        if result is None:
+            # Unchanged: carry the earlier findings forward, with this pass's chunk id
+            result = dict(previous[chunk["key"]]["result"], chunk=chunk["id"], carried_forward=True)
+        results.append(result)
+        if not result.get("error"):
+            state[chunk["key"]] = {
+                "fingerprint": fingerprints[chunk["key"]],
+                "result": {k: v for k, v in result.items() if k != "carried_forward"},
+            }
+
+    timings = dict(timings, chunks=len(chunks), reviewed=len(changed),
+                   carried_forward=len(chunks) - len(changed))
+    return results, timings, state
@@ -0,0 +1,202 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Deterministic ICMJE pre-checks run on the segmented manuscript text.
+
+Each rule is declarative: the sections that satisfy it (when they have body
+text), regex patterns that count as evidence anywhere in the text, and
+optionally a `when` pattern that makes the rule apply only to some
+manuscripts (e.g. trial registration only for clinical trials). Rules with
+`section_patterns` also need the section itself, heading included, to match
+one of the patterns, so an ambiguous heading ("Declarations") followed by
+unrelated text does not count. Rules are compiled once at import and a full run takes
+milliseconds, so mechanical findings reach the model already decided.
+"""
+
+import re
+import time
+
+PRECHECK_RULES = [
+    {
+        "id": "PC-COI",
+        "title": "Conflict of interest disclosure",
+        "icmjeSection": "II.B. Disclosure of Financial and Non-Financial Relationships and Activities, and Conflicts of Interest",
+        "severity": "HIGH",
+        "sections": ["conflicts_of_interest"],
+        "patterns": [r"conflicts?\s+of\s+interests?", r"competing\s+interests?", r"nothing\s+to\s+disclose",
+                     r"ICMJE\s+(?:disclosure\s+)?form"],
+        "section_patterns": [r"\bconflicts?\b", r"\bcompeting\b", r"\bdisclos", r"\bdeclares?\s+(?:no|that)\b",
+                             r"financial\s+(?:relationships?|interests?)"],
+    },
+    {
+        "id": "PC-FUNDING",
+        "title": "Funding statement",
+        "icmjeSection": "II.B. Disclosure of Financial and Non-Financial Relationships and Activities, and Conflicts of Interest",
+        "severity": "HIGH",
+        "sections": ["funding"],
+        "patterns": [r"\bfunded\s+by\b", r"\bgrant\s+(?:no\.?|number|#)", r"financial\s+support",
+                     r"(?:received|receive)\s+no\s+(?:specific\s+)?(?:funding|grant)"],
+        "section_patterns": [r"\bfunding\b", r"\bsupported\s+by\b", r"\bgrants?\b", r"\bsponsors?\b"],
+    },
+    {
+        "id": "PC-TRIAL-REG",
+        "title": "Clinical trial registration number",
+        "icmjeSection": "III.L. Clinical Trial Registration",
+        "severity": "HIGH",
+        "when": r"\brandomi[sz]ed\b|\bclinical\s+trial\b|\bcontrolled\s+trial\b",
+        "sections": [],
+        "patterns": [r"\bNCT\d{8}\b", r"\bISRCTN\d{8}\b", r"\bEudraCT\s*(?:No\.?\s*)?\d{4}-\d{6}-\d{2}\b",
+                     r"\b(?:ChiCTR|ACTRN|CTRI|DRKS|jRCT|UMIN|IRCT|PACTR|KCT|TCTR|RBR|NTR)[-/A-Z0-9]*\d{4,}"],
+    },
+    {
+        "id": "PC-DATA-SHARING",
+        "title": "Data sharing statement",
+        "icmjeSection": "III.M. Data Sharing",
+        "severity": "HIGH",
+        "when": r"\brandomi[sz]ed\b|\bclinical\s+trial\b|\bcontrolled\s+trial\b",
+        "sections": ["data_sharing"],
+        "patterns": [r"data\s+(?:sharing|availability)\s+statement",
+                     r"data\s+(?:are|is|will\s+be)\s+(?:not\s+)?(?:publicly\s+)?available",
+                     r"available\s+(?:from|upon|on)\s+(?:reasonable\s+)?request"],
+    },
+    {
+        "id": "PC-ETHICS",
+        "title": "Ethics approval and informed consent",
+        "icmjeSection": "IV.A.2.g. Ethics approval and informed consent (Protection of Research Participants)",
+        "severity": "HIGH",
+        "when": r"\bpatients?\b|\bparticipants?\b|\bhuman\s+subjects?\b|\bvolunteers?\b",
+        "sections": ["ethics"],
+        "patterns": [r"ethic(?:s|al)\s+(?:committee|approval|review\s+board)", r"institutional\s+review\s+board",
+                     r"\bIRB\b", r"informed\s+consent", r"Declaration\s+of\s+Helsinki"],
+    },
+    {
+        "id": "PC-CORRESPONDING",
+        "title": "Corresponding author",
+        "icmjeSection": "IV.A.3.a. Title Page",
+        "severity": "MEDIUM",
+        "sections": [],
+        "patterns": [r"corresponding\s+author", r"correspondence(?:\s+to)?\s*:", r"address\s+(?:for\s+)?correspondence"],
+    },
+    {
+        "id": "PC-WORD-COUNT",
+        "title": "Word count",
+        "icmjeSection": "IV.A.3.a. Title Page",
+        "severity": "LOW",
+        "sections": [],
+        "patterns": [r"word\s+count", r"\b\d{3,5}\s+words\b"],
+    },
+    {
+        "id": "PC-CONTRIBUTIONS",
+        "title": "Author contributions",
+        "icmjeSection": "II.A. Defining the Role of Authors and Contributors",
+        "severity": "MEDIUM",
+        "sections": ["author_contributions"],
+        "patterns": [r"authors?['\u2019]?\s+contributions?", r"\bCRediT\b", r"contributed\s+(?:equally|to\s+the)"],
+    },
+    {
+        "id": "PC-AI-DISCLOSURE",
+        "title": "Disclosure of AI-assisted technology use",
+        "icmjeSection": "II.A.4. Artificial Intelligence (AI)-Assisted Technology",
+        "severity": "HIGH",
+        "when": r"\bChatGPT\b|\bGPT-\d|\blarge\s+language\s+models?\b|\bLLMs?\b|\bgenerative\s+AI\b",
+        "sections": ["ai_disclosure"],
+        "patterns": [r"(?:used|use\s+of)\s+.{0,60}\b(?:ChatGPT|GPT-\d|language\s+model|AI)\b.{0,80}"
+                     r"\b(?:editing|language|writing|grammar|readability)\b"],
+    },
+    {
+        "id": "PC-ABSTRACT",
+        "title": "Abstract",
+        "icmjeSection": "IV.A.3.b. Abstract",
+        "severity": "MEDIUM",
+        "sections": ["abstract"],
+        "patterns": [],
+    },
+    {
+        "id": "PC-REFERENCES",
+        "title": "Reference list",
+        "icmjeSection": "IV.A.3.g. References",
+        "severity": "MEDIUM",
+        "sections": ["references"],
+        "patterns": [],
+    },
+]
+
+_EVIDENCE_CONTEXT_CHARS = 80
+
+
+def _compile(pattern_list):
+    return re.compile("|".join(f"(?:{p})" for p in pattern_list), re.IGNORECASE) if pattern_list else None
+
+
+_COMPILED_RULES = [
+    dict(
+        rule,
+        _patterns=_compile(rule["patterns"]),
+        _when=_compile([rule["when"]]) if rule.get("when") else None,
+        _section_patterns=_compile(rule["patterns"] + rule["section_patterns"]) if rule.get("section_patterns") else None,
+    )
+    for rule in PRECHECK_RULES
+]
+
+
+def _snippet(text: str, match) -> str:
+    start = max(0, match.start() - _EVIDENCE_CONTEXT_CHARS // 2)
+    end = min(len(text), match.end() + _EVIDENCE_CONTEXT_CHARS // 2)
+    return " ".join(text[start:end].split())
+
+
+def _supporting_section(rule: dict, sections: list):
+    """Name of the first section that satisfies the rule on its own, or None."""
+    for section in sections:
+        if section["name"] not in rule["sections"] or not section["text"].strip():
+            continue  # heading-only sections are not a statement
+        if rule["_section_patterns"] is None or rule["_section_patterns"].search(
+                section["heading"] + "\n" + section["text"]):
+            return section["name"]
+    return None
+
+
+def run_precheck(segmentation: dict) -> dict:
+    """
+    Evaluates every rule against a manuscript segmentation (see
+    manuscript_sections.segment_pdf). Returns
+    {"findings": [...], "passed": [...], "not_applicable": [...], "elapsed_ms"}
+    where findings are rules with no supporting section or evidence.
+    """
+    started = time.perf_counter()
+    sections = segmentation["sections"]
+    # A heading with no body is no evidence, for the section or the text patterns
+    full_text = "\n".join(s["heading"] + "\n" + s["text"] for s in sections if s["text"].strip())
+
+    findings, passed, not_applicable = [], [], []
+    for rule in _COMPILED_RULES:
+        result = {key: rule[key] for key in ("id", "title", "icmjeSection", "severity")}
+        if rule["_when"] is not None and not rule["_when"].search(full_text):
+            not_applicable.append(result)
+            continue
+        section = _supporting_section(rule, sections)
+        match = rule["_patterns"].search(full_text) if rule["_patterns"] is not None else None
+        if section is not None:
+            passed.append(dict(result, status="PRESENT", evidence=f"section '{section}'"))
+        elif match is not None:
+            passed.append(dict(result, status="PRESENT", evidence=_snippet(full_text, match)))
+        else:
+            findings.append(dict(result, status="MISSING"))
+
+    return {
+        "findings": findings,
+        "passed": passed,
+        "not_applicable": not_applicable,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+    }
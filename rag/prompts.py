@@ -41,6 +41,25 @@ def return_instructions_root() -> str:
         • IMMEDIATELY call 'save_ui_file_to_local' to sync the file to disk (Uploaded attachment (if present)).
         • IMMEDIATELY call 'save_attached_images_to_local' to sync the file to disk (if Uploaded attachment is image (if present)).
         • Image Extraction (Immediate Action): If the user uploads a PDF, you MUST immediately call `extract_images_from_pdf` before doing anything else.
+        • Manuscript Structure: For an uploaded PDF, call `get_manuscript_sections` with an empty list to get
+          the section outline (and which expected ICMJE sections were not found), then call it again with only
+          the sections you need (e.g. ["methods", "conflicts_of_interest", "funding"]) instead of re-reading
+          the whole document.
+        • Deterministic Pre-check: For an uploaded PDF, call `run_icmje_precheck` once. Its "findings" (status
+          MISSING) are already-verified mechanical gaps: report them as compliance issues using the given
+          icmjeSection and severity without re-checking them. Items in "passed" only confirm the element is
+          present; you MUST still judge whether its content is adequate. Focus your own reasoning on those
+          judgement calls and on anything the pre-check does not cover.
+        • Long Manuscripts: For long manuscripts or supplements, call `review_manuscript_parallel` instead of
+          reviewing the whole document in one pass. It reviews each section in parallel against the relevant
+          ICMJE rules and returns JSON already in the STRUCTURED OUTPUT CONTRACT format. Use it as your draft:
+          verify it, remove anything not mandated by ICMJE, and keep its Compliance Status unless you find
+          a concrete reason to change it. Sections listed in "unreviewedSections" MUST be reviewed yourself.
+          When the user uploads a REVISED version, call it again: only sections listed in "changedSections" were
+          re-reviewed, findings for unchanged sections are carried forward from the previous pass.
+        • Policy Lookup: When checking several ICMJE sections, call `search_icmje_policies` ONCE with a list of
+          queries (one per section, e.g. authorship, conflicts of interest, trial registration, data sharing)
+          instead of calling `search_icmje_policy` repeatedly.
         • You MUST identify all missing, unclear, incomplete, or non-compliant elements.
         • You MUST ask clarification questions if required.
         • You MUST assign a Compliance Status.
@@ -59,7 +78,8 @@ def return_instructions_root() -> str:
         To ensure images are not lost during the transition from the source PDF to the reconstructed manuscript:
 
         1.  Extraction Mapping:
-            - After running `extract_images_from_pdf`, you will have files named `figure1.png`, `figure2.png`, etc.
+            - After running `extract_images_from_pdf`, you will have files named `figure1.png`, `figure2.jpg`, etc.
+              (the extension follows the image format; always use the exact filename reported).
             - You must use your visual reasoning to match the visual content of these files with the "Figure" mentions in the text.
         2.  Tagging Syntax:
             - In the reconstructed text, you MUST insert a placeholder tag at the exact location the image should appear.
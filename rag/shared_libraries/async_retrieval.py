@@ -0,0 +1,80 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Non-blocking ICMJE retrieval: timeouts, fan-out and context merging.
+
+Retrieval (RAG Engine or the local index) is synchronous, so
+`run_with_timeout` moves it onto a bounded thread pool. `retrieve_many` runs
+one retrieval coroutine per query with a concurrency limit; a failed query
+yields its exception instead of chunks, so one slow or broken topic never
+hides the others. `merge_batched_contexts` then groups the chunks under the
+query that found them.
+"""
+
+import asyncio
+
+
+async def run_with_timeout(executor, fn, *args, timeout: float):
+    """
+    Runs fn(*args) on `executor` without blocking the event loop. Raises
+    TimeoutError after `timeout` seconds; a call that is still queued is
+    cancelled, one already running finishes in the background.
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(executor, fn, *args)
+    try:
+        return await asyncio.wait_for(future, timeout)
+    except asyncio.TimeoutError:
+        raise TimeoutError(f"ICMJE policy retrieval timed out after {timeout:g}s") from None
+
+
+async def retrieve_many(queries: list, retrieve, concurrency: int) -> list:
+    """
+    Awaits `retrieve(query)` for every query with at most `concurrency` in
+    flight. Results are in query order; a query that failed (or was
+    cancelled) yields the exception instead of its chunks.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(query):
+        async with semaphore:
+            return await retrieve(query)
+
+    return await asyncio.gather(*(run(q) for q in queries), return_exceptions=True)
+
+
+def merge_batched_contexts(queries: list, results: list, assembler) -> tuple[str, int]:
+    """
+    Groups retrieved chunks under the query (ICMJE section) that found them.
+    A chunk (or near-duplicate) already shown under an earlier query is not
+    repeated, and each section is trimmed to the assembler's token budget.
+    Returns (context, tokens_saved).
+    """
+    sections = []
+    tokens_saved = 0
+    for query, chunks in zip(queries, results, strict=True):
+        # gather(return_exceptions=True) also returns CancelledError, a BaseException
+        if isinstance(chunks, BaseException):
+            reason = "cancelled" if isinstance(chunks, asyncio.CancelledError) else chunks
+            sections.append(f"## {query}\nRetrieval failed: {reason}")
+            continue
+        body, report = assembler.assemble(chunks)
+        tokens_saved += report["tokens_saved"]
+        if not body:
+            body = (
+                "\nSame policy text as an earlier section above.\n" if chunks
+                else "\nNo specific ICMJE policy found in RAG.\n"
+            )
+        sections.append(f"## {query}{body}")
+    return "\n".join(sections), tokens_saved
@@ -0,0 +1,116 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Content-addressed store for uploaded documents.
+
+Each upload is stored once under the SHA-256 of its bytes:
+
+    <root>/objects/<first 2 hex chars>/<sha256>
+
+and a SQLite index records every upload (name, hash, time), so re-uploading
+the same manuscript (under any name, from any session) costs one hash and no
+write. Work derived from a document can then be keyed on its hash.
+
+Sessions see blobs through hard links in their workspace. collect_garbage()
+deletes blobs whose last upload is older than `max_age_seconds` and that no
+live workspace still links to.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from .workspace import atomic_write
+
+
+class BlobStore:
+    def __init__(self, root: str, max_age_seconds: float | None = None):
+        self.root = root
+        self.max_age_seconds = max_age_seconds
+        self.db_path = os.path.join(root, "index.db")
+        self._lock = threading.Lock()
+        self._stats = {"stored": 0, "deduplicated": 0, "collected": 0}
+        os.makedirs(os.path.join(root, "objects"), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS uploads ("
+                "name TEXT PRIMARY KEY, sha256 TEXT, size INTEGER, uploaded_at REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_uploads_sha256 ON uploads (sha256)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def path(self, sha256: str) -> str:
+        return os.path.join(self.root, "objects", sha256[:2], sha256)
+
+    def put(self, name: str, data: bytes):
+        """
+        Stores `data` (if not already present) and points `name` at it.
+        Returns (sha256, created) where created is False for a duplicate.
+        """
+        sha256 = hashlib.sha256(data).hexdigest()
+        path = self.path(sha256)
+        # Under the lock so collect_garbage cannot delete the blob between the check and the index row
+        with self._lock, self._connect() as conn:
+            created = not os.path.exists(path)
+            if created:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                atomic_write(path, data)
+            conn.execute(
+                "INSERT OR REPLACE INTO uploads VALUES (?, ?, ?, ?)",
+                (name, sha256, len(data), time.time()),
+            )
+            self._stats["stored" if created else "deduplicated"] += 1
+        return sha256, created
+
+    def collect_garbage(self) -> int:
+        """
+        Deletes blobs not uploaded for max_age_seconds and no longer hard-linked
+        from a workspace, with their index rows. Returns how many.
+        """
+        if self.max_age_seconds is None:
+            return 0
+        cutoff = time.time() - self.max_age_seconds
+        removed = 0
+        with self._lock, self._connect() as conn:
+            last_upload = dict(conn.execute("SELECT sha256, MAX(uploaded_at) FROM uploads GROUP BY sha256"))
+            for directory, _, names in os.walk(os.path.join(self.root, "objects")):
+                for name in names:
+                    path = os.path.join(directory, name)
+                    try:
+                        stat = os.stat(path)
+                        # Without an index row (its name now points at another blob) the file mtime counts
+                        if max(last_upload.get(name, 0), stat.st_mtime) >= cutoff or stat.st_nlink > 1:
+                            continue  # recently uploaded, or still linked into a live workspace
+                        os.remove(path)
+                    except FileNotFoundError:
+                        continue
+                    conn.execute("DELETE FROM uploads WHERE sha256 = ?", (name,))
+                    removed += 1
+            self._stats["collected"] += removed
+        return removed
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats)
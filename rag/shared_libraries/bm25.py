@@ -0,0 +1,136 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""BM25 inverted index over the ICMJE corpus chunks and rank fusion helpers.
+
+The index is precomputed from the local index's chunks.json and saved as
+bm25.json, so the agent never re-tokenizes the corpus at startup:
+    python -m rag.shared_libraries.bm25 rag/local_index
+"""
+
+import argparse
+import json
+import math
+import os
+import re
+from collections import Counter, defaultdict
+
+BM25_FILE = "bm25.json"
+
+# Keeps dotted / hyphenated terms such as "clinicaltrials.gov" or "co-author" intact
+_TERM_RE = re.compile(r"[a-z0-9]+(?:[.\-][a-z0-9]+)*")
+
+
+def tokenize(text: str) -> list:
+    """Lowercased terms; compound terms also contribute their parts."""
+    tokens = []
+    for term in _TERM_RE.findall(text.lower()):
+        tokens.append(term)
+        if "." in term or "-" in term:
+            tokens.extend(re.split(r"[.\-]", term))
+    return tokens
+
+
+class BM25Index:
+    """Okapi BM25 over a fixed list of chunk dicts."""
+
+    def __init__(self, chunks: list, postings: dict, doc_lengths: list, k1=1.5, b=0.75):
+        self.chunks = chunks
+        self.postings = postings
+        self.doc_lengths = doc_lengths
+        self.k1 = k1
+        self.b = b
+        n_docs = len(doc_lengths)
+        self.avg_doc_length = (sum(doc_lengths) / n_docs) if n_docs else 0.0
+        self.idf = {
+            term: math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, docs in postings.items()
+        }
+
+    @classmethod
+    def build(cls, chunks: list, **kwargs) -> "BM25Index":
+        postings = defaultdict(list)
+        doc_lengths = []
+        for doc_id, chunk in enumerate(chunks):
+            counts = Counter(tokenize(chunk["text"]))
+            doc_lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                postings[term].append([doc_id, tf])
+        return cls(chunks, dict(postings), doc_lengths, **kwargs)
+
+    def save(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "k1": self.k1,
+                "b": self.b,
+                "chunks": self.chunks,
+                "postings": self.postings,
+                "doc_lengths": self.doc_lengths,
+            }, f)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["chunks"], data["postings"], data["doc_lengths"],
+                   k1=data["k1"], b=data["b"])
+
+    def search(self, query: str, top_k: int) -> list:
+        """Returns [(chunk dict, score)] for the top_k best-scoring chunks."""
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for doc_id, tf in self.postings[term]:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / self.avg_doc_length)
+                scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+        best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+        return [(self.chunks[doc_id], score) for doc_id, score in best]
+
+
+def chunk_key(chunk: dict) -> str:
+    return " ".join(chunk["text"].split())
+
+
+def reciprocal_rank_fusion(rankings: list, top_k: int, k: int = 60) -> list:
+    """
+    Fuses several ranked chunk lists: score(d) = sum(1 / (k + rank)). Chunks
+    with identical text are treated as the same document; the first seen copy
+    (and its metadata, e.g. vector distance) is kept.
+    """
+    scores = defaultdict(float)
+    first_seen = {}
+    for ranking in rankings:
+        for rank, chunk in enumerate(ranking, start=1):
+            key = chunk_key(chunk)
+            scores[key] += 1.0 / (k + rank)
+            first_seen.setdefault(key, chunk)
+    fused = sorted(scores, key=scores.get, reverse=True)[:top_k]
+    return [first_seen[key] for key in fused]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute the BM25 index for a local index dir.")
+    parser.add_argument("index_dir")
+    args = parser.parse_args()
+    with open(os.path.join(args.index_dir, "chunks.json"), encoding="utf-8") as f:
+        chunks = json.load(f)
+    path = os.path.join(args.index_dir, BM25_FILE)
+    BM25Index.build(chunks).save(path)
+    print(f"BM25 index over {len(chunks)} chunks written to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Builds the retrieved-policy context string handed back to the model.
+
+Near-duplicate chunks are dropped using MinHash signatures over word
+shingles, overlapping windows of the same source are stitched into one
+block, and the result is trimmed to a token budget. Chunks that do not
+overlap stay separate blocks in rank order, even when they come from the
+same document.
+"""
+
+import zlib
+
+import numpy as np
+
+SHINGLE_SIZE = 5
+NUM_PERMUTATIONS = 64
+_MERSENNE_PRIME = (1 << 31) - 1  # keeps a * hash + b inside uint64
+_rng = np.random.default_rng(1234)
+_PERM_A = _rng.integers(1, _MERSENNE_PRIME, NUM_PERMUTATIONS, dtype=np.uint64)
+_PERM_B = _rng.integers(0, _MERSENNE_PRIME, NUM_PERMUTATIONS, dtype=np.uint64)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough Gemini token estimate (~4 characters per token)."""
+    return (len(text) + 3) // 4
+
+
+def format_chunk(source_uri: str, text: str) -> str:
+    return f"\n[ICMJE SOURCE: {source_uri}]\n{text}\n"
+
+
+def minhash_signature(text: str) -> np.ndarray:
+    words = text.lower().split()
+    if len(words) < SHINGLE_SIZE:
+        shingles = [" ".join(words)]
+    else:
+        shingles = [" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)]
+    hashes = np.array([zlib.crc32(s.encode("utf-8")) for s in shingles], dtype=np.uint64)
+    # (num_perm, n_shingles) universal hashes, min over shingles
+    return ((np.outer(_PERM_A, hashes) + _PERM_B[:, None]) % _MERSENNE_PRIME).min(axis=1)
+
+
+def _stitch(left: str, right: str, max_overlap_words: int = 80, min_overlap_words: int = SHINGLE_SIZE):
+    """
+    Joins two windows of the same source when the end of `left` overlaps the
+    start of `right` by at least `min_overlap_words` words, dropping the
+    repeated words. Returns None if they don't overlap.
+    """
+    left_words, right_words = left.split(), right.split()
+    for size in range(min(max_overlap_words, len(left_words), len(right_words)), min_overlap_words - 1, -1):
+        if left_words[-size:] == right_words[:size]:
+            return " ".join(left_words + right_words[size:])
+    return None
+
+
+class ContextAssembler:
+    """
+    Deduplicates, merges and budget-trims retrieved chunks. Signatures seen by
+    one assembler persist across assemble() calls, so a batch of queries can
+    share one instance and never repeat the same policy text.
+    """
+
+    def __init__(self, token_budget: int = 2000, similarity_threshold: float = 0.8):
+        self.token_budget = token_budget
+        self.similarity_threshold = similarity_threshold
+        self._signatures = []
+
+    def _is_duplicate(self, signature: np.ndarray) -> bool:
+        if not self._signatures:
+            return False
+        similarity = (np.stack(self._signatures) == signature).mean(axis=1)
+        return bool(similarity.max() >= self.similarity_threshold)
+
+    def assemble(self, chunks: list):
+        """Returns (context string, report dict)."""
+        tokens_before = sum(estimate_tokens(format_chunk(c["source_uri"], c["text"])) for c in chunks)
+
+        unique = []
+        for chunk in chunks:
+            signature = minhash_signature(chunk["text"])
+            if self._is_duplicate(signature):
+                continue
+            self._signatures.append(signature)
+            unique.append(chunk)
+
+        # Rank order; a window overlapping an earlier block of the same source joins that block
+        merged = []  # [source, text]
+        for chunk in unique:
+            source, text = chunk["source_uri"], chunk["text"]
+            for block in merged:
+                if block[0] != source:
+                    continue
+                stitched = _stitch(block[1], text) or _stitch(text, block[1])
+                if stitched is not None:
+                    block[1] = stitched
+                    break
+            else:
+                merged.append([source, text])
+
+        blocks = []
+        remaining = self.token_budget if self.token_budget > 0 else None
+        for source, text in merged:
+            block = format_chunk(source, text)
+            if remaining is not None:
+                cost = estimate_tokens(block)
+                if cost > remaining:
+                    # Trim the last block at a word boundary if a useful amount fits
+                    keep_chars = (remaining - estimate_tokens(format_chunk(source, ""))) * 4 - len(" ...")
+                    if keep_chars >= 200:
+                        blocks.append(format_chunk(source, text[:keep_chars].rsplit(" ", 1)[0] + " ..."))
+                    break
+                remaining -= cost
+            blocks.append(block)
+
+        context = "".join(blocks)
+        tokens_after = estimate_tokens(context)
+        report = {
+            "chunks_in": len(chunks),
+            "duplicates_removed": len(chunks) - len(unique),
+            "blocks_out": len(blocks),
+            "tokens_before": tokens_before,
+            "tokens_after": tokens_after,
+            "tokens_saved": max(0, tokens_before - tokens_after),
+        }
+        return context, report
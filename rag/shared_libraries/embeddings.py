@@ -0,0 +1,90 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Pluggable text embedding functions.
+
+Every embedding function takes a list of strings and returns a float32 NumPy
+matrix of shape (len(texts), dim) with L2-normalized rows, so cosine
+similarity is a plain dot product.
+"""
+
+import importlib
+import itertools
+import os
+import re
+import zlib
+
+import numpy as np
+
+HASHING_DIM = 512
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32)
+
+
+def hashing_embedding(texts: list, dim: int = HASHING_DIM) -> np.ndarray:
+    """
+    Offline embedding: hashes word unigrams, bigrams and character trigrams into
+    a fixed number of buckets. No network or model download is needed, which
+    makes it the default for tests and local development.
+    """
+    matrix = np.zeros((len(texts), dim), dtype=np.float32)
+    for row, text in enumerate(texts):
+        words = _TOKEN_RE.findall(text.lower())
+        features = list(words)
+        features += [f"{a} {b}" for a, b in itertools.pairwise(words)]
+        for word in words:
+            padded = f"#{word}#"
+            features += [padded[i:i + 3] for i in range(len(padded) - 2)]
+        for feature in features:
+            h = zlib.crc32(feature.encode("utf-8"))
+            sign = 1.0 if h & 0x80000000 else -1.0
+            matrix[row, h % dim] += sign
+    return _normalize_rows(matrix)
+
+
+_vertex_models = {}
+
+
+def vertex_embedding(texts: list) -> np.ndarray:
+    """Embeds with a Vertex AI text embedding model (RAG_EMBEDDING_MODEL)."""
+    from vertexai.language_models import TextEmbeddingModel
+
+    model_name = os.environ.get("RAG_EMBEDDING_MODEL", "text-embedding-004")
+    if model_name not in _vertex_models:
+        _vertex_models[model_name] = TextEmbeddingModel.from_pretrained(model_name)
+    embeddings = _vertex_models[model_name].get_embeddings(list(texts))
+    return _normalize_rows(np.array([e.values for e in embeddings], dtype=np.float32))
+
+
+def get_embedding_function(name: str | None = None):
+    """
+    Resolves an embedding backend by name: "hashing", "vertex", or a
+    "package.module:function" path to a custom local embedding function.
+    Defaults to the RAG_EMBEDDING_BACKEND environment variable.
+    """
+    name = name or os.environ.get("RAG_EMBEDDING_BACKEND", "vertex")
+    if name == "hashing":
+        return hashing_embedding
+    if name == "vertex":
+        return vertex_embedding
+    if ":" in name:
+        module_name, func_name = name.split(":", 1)
+        func = getattr(importlib.import_module(module_name), func_name)
+        return lambda texts: _normalize_rows(np.asarray(func(texts), dtype=np.float32))
+    raise ValueError(f"Unknown embedding backend: {name}")
@@ -0,0 +1,197 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Memoized figure extraction results, keyed by PDF content hash.
+
+A manifest records what extracting a document produced: the accepted figures
+with their page, xref, verdict, file name and the SHA-256 of the stored
+figure bytes, plus the pre-filter report. Manifests are also keyed by a
+classifier version (a hash of the vision model, prompts and extraction
+settings), so changing any of those makes old results miss instead of
+being served stale. Manifests unused for `max_age_seconds`, and figure files
+no manifest refers to any more, are removed by collect_garbage().
+
+    <root>/manifests.db
+    <root>/figures/<first 2 hex chars>/<sha256>
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from .workspace import atomic_write
+
+
+def classifier_version(*parts) -> str:
+    """Stable short hash of everything that influences extraction results."""
+    raw = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def sha256_of_source(source) -> str:
+    """SHA-256 of a document given as bytes or as a path (read in chunks)."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return hashlib.sha256(source).hexdigest()
+    digest = hashlib.sha256()
+    with open(source, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ExtractionManifestStore:
+    def __init__(self, root: str, max_age_seconds: float | None = None):
+        self.root = root
+        self.max_age_seconds = max_age_seconds
+        self.db_path = os.path.join(root, "manifests.db")
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stored": 0}
+        os.makedirs(os.path.join(root, "figures"), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS manifests ("
+                "document_sha256 TEXT, classifier_version TEXT, created REAL, manifest TEXT, "
+                "last_used REAL, PRIMARY KEY (document_sha256, classifier_version))"
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(manifests)")}
+            if "last_used" not in columns:  # databases created before expiry existed
+                conn.execute("ALTER TABLE manifests ADD COLUMN last_used REAL")
+                conn.execute("UPDATE manifests SET last_used = created")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _figure_path(self, sha256: str) -> str:
+        return os.path.join(self.root, "figures", sha256[:2], sha256)
+
+    def get(self, document_sha256: str, version: str):
+        """Returns the manifest dict, or None if missing or its figure files are gone."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT manifest FROM manifests WHERE document_sha256 = ? AND classifier_version = ?",
+                (document_sha256, version),
+            ).fetchone()
+            if row:
+                conn.execute(
+                    "UPDATE manifests SET last_used = ? WHERE document_sha256 = ? AND classifier_version = ?",
+                    (time.time(), document_sha256, version),
+                )
+        manifest = json.loads(row[0]) if row else None
+        if manifest is not None and not all(
+            os.path.exists(self._figure_path(f["sha256"])) for f in manifest["figures"]
+        ):
+            manifest = None
+        with self._lock:
+            self._stats["hits" if manifest is not None else "misses"] += 1
+        return manifest
+
+    def put(self, document_sha256: str, version: str, figures: list, **extra) -> dict:
+        """
+        Stores a manifest. `figures` are dicts with at least "name" and "data"
+        (the figure bytes); the bytes are stored by hash and replaced by
+        "sha256" and "size" in the manifest. `extra` is saved as-is.
+        """
+        entries = []
+        for figure in figures:
+            figure = dict(figure)
+            data = figure.pop("data")
+            figure["sha256"] = hashlib.sha256(data).hexdigest()
+            figure["size"] = len(data)
+            path = self._figure_path(figure["sha256"])
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                atomic_write(path, data)
+            entries.append(figure)
+
+        manifest = dict(extra, document_sha256=document_sha256, classifier_version=version,
+                        created=time.time(), figures=entries)
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO manifests VALUES (?, ?, ?, ?, ?)",
+                (document_sha256, version, manifest["created"], json.dumps(manifest), manifest["created"]),
+            )
+            # Manifests for older classifier versions can never hit again
+            conn.execute(
+                "DELETE FROM manifests WHERE document_sha256 = ? AND classifier_version != ?",
+                (document_sha256, version),
+            )
+            self._stats["stored"] += 1
+        return manifest
+
+    def figure_bytes(self, figure: dict) -> bytes:
+        with open(self._figure_path(figure["sha256"]), "rb") as f:
+            return f.read()
+
+    def invalidate(self, document_sha256: str | None = None) -> None:
+        """Drops the manifests of one document, or all of them."""
+        with self._lock, self._connect() as conn:
+            if document_sha256 is None:
+                conn.execute("DELETE FROM manifests")
+            else:
+                conn.execute("DELETE FROM manifests WHERE document_sha256 = ?", (document_sha256,))
+
+    def collect_garbage(self) -> int:
+        """
+        Deletes manifests unused for max_age_seconds, then figure files that no
+        remaining manifest refers to. Returns how many manifests were deleted.
+        """
+        if self.max_age_seconds is None:
+            return 0
+        cutoff = time.time() - self.max_age_seconds
+        with self._lock, self._connect() as conn:
+            removed = conn.execute("DELETE FROM manifests WHERE last_used < ?", (cutoff,)).rowcount
+            referenced = {
+                figure["sha256"]
+                for (manifest,) in conn.execute("SELECT manifest FROM manifests")
+                for figure in json.loads(manifest)["figures"]
+            }
+            for directory, _, names in os.walk(os.path.join(self.root, "figures")):
+                for name in names:
+                    path = os.path.join(directory, name)
+                    try:
+                        # Recent files may belong to a put() whose manifest is not committed yet
+                        if name not in referenced and os.path.getmtime(path) < cutoff:
+                            os.remove(path)
+                    except FileNotFoundError:
+                        continue
+        return removed
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats)
+
+
+def manifest_store_from_env(default_root: str, enabled_by_default: bool = True,
+                            max_age_seconds: float | None = None):
+    """
+    Returns the store configured by EXTRACTION_MANIFEST_* variables, or None if
+    disabled. An unset or blank EXTRACTION_MANIFEST_ENABLED means `enabled_by_default`.
+    """
+    enabled = os.environ.get("EXTRACTION_MANIFEST_ENABLED", "").strip().lower()
+    if not (enabled in ("1", "true", "yes") if enabled else enabled_by_default):
+        return None
+    return ExtractionManifestStore(
+        os.environ.get("EXTRACTION_MANIFEST_DIR") or default_root,
+        max_age_seconds=max_age_seconds,
+    )
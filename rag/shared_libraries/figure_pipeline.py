@@ -0,0 +1,190 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Streaming extract -> classify -> persist pipeline for PDF figures.
+
+Three stages connected by bounded asyncio queues:
+
+  extract   a synchronous candidate iterator (PyMuPDF, CPU-bound) drained
+            in a worker thread
+  classify  `classifier_workers` coroutines, each taking up to `batch_size`
+            candidates per call to the (network-bound) classifier
+  write     a sequencer that restores page order and numbers accepted
+            figures, feeding `writer_workers` disk writers
+
+At most `max_in_flight` candidates exist between extraction and the
+sequencer, so memory stays flat no matter how large the PDF is.
+"""
+
+import asyncio
+import concurrent.futures
+import heapq
+import threading
+import time
+
+_DONE = object()
+
+
+class _Stopped(Exception):
+    pass
+
+
+class StageTimer:
+    def __init__(self):
+        self.stats = {}
+
+    def add(self, stage: str, seconds: float, items: int = 1) -> None:
+        entry = self.stats.setdefault(stage, {"items": 0, "calls": 0, "busy_s": 0.0})
+        entry["items"] += items
+        entry["calls"] += 1
+        entry["busy_s"] += seconds
+
+    def report(self) -> dict:
+        return {
+            stage: dict(entry, busy_s=round(entry["busy_s"], 3))
+            for stage, entry in self.stats.items()
+        }
+
+
+async def run_figure_pipeline(candidates_factory, classify, write, *,
+                              classifier_workers: int = 4, writer_workers: int = 2,
+                              batch_size: int = 8, queue_size: int = 16,
+                              max_in_flight: int = 64):
+    """
+    Args:
+        candidates_factory: zero-arg callable returning an iterator of candidate
+            dicts (with an "image" key and optionally a "thumbnail") in page
+            order; runs in a thread.
+        classify: async callable(list of image bytes) -> list of bools.
+        write: sync callable(figure_number, candidate) -> path; runs in a thread.
+
+    Returns (figures, timings) where figures is [(number, candidate, path)] in
+    page order and timings holds per-stage item counts and busy seconds.
+    """
+    loop = asyncio.get_running_loop()
+    classify_queue = asyncio.Queue(queue_size)
+    result_queue = asyncio.Queue(queue_size)
+    write_queue = asyncio.Queue(queue_size)
+    window = asyncio.Semaphore(max_in_flight)
+    stop = threading.Event()
+    timer = StageTimer()
+    figures = []
+    started = time.perf_counter()
+
+    def call_in_loop(coro_fn):
+        future = asyncio.run_coroutine_threadsafe(coro_fn(), loop)
+        while True:
+            try:
+                return future.result(timeout=0.5)
+            except concurrent.futures.TimeoutError:
+                if stop.is_set():
+                    future.cancel()
+                    raise _Stopped() from None
+
+    def extract():
+        iterator = iter(candidates_factory())
+        seq = 0
+        try:
+            while True:
+                t0 = time.perf_counter()
+                candidate = next(iterator, _DONE)
+                if candidate is _DONE:
+                    break
+                timer.add("extract", time.perf_counter() - t0)
+                call_in_loop(window.acquire)
+                call_in_loop(lambda item=(seq, candidate): classify_queue.put(item))
+                seq += 1
+            for _ in range(classifier_workers):
+                call_in_loop(lambda: classify_queue.put(_DONE))
+        except _Stopped:
+            pass
+
+    async def classifier():
+        done = False
+        while not done:
+            item = await classify_queue.get()
+            if item is _DONE:
+                break
+            batch = [item]
+            while len(batch) < batch_size:
+                try:
+                    item = classify_queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
+                if item is _DONE:
+                    done = True
+                    break
+                batch.append(item)
+            t0 = time.perf_counter()
+            # Prefer the small classifier rendition when the extractor produced one
+            verdicts = await classify([
+                candidate.get("thumbnail", candidate["image"]) for _, candidate in batch
+            ])
+            timer.add("classify", time.perf_counter() - t0, len(batch))
+            for (seq, candidate), is_figure in zip(batch, verdicts, strict=True):
+                await result_queue.put((seq, candidate, is_figure))
+        await result_queue.put(_DONE)
+
+    async def sequencer():
+        pending = []
+        next_seq = 0
+        figure_number = 0
+        finished_workers = 0
+        while finished_workers < classifier_workers:
+            item = await result_queue.get()
+            if item is _DONE:
+                finished_workers += 1
+                continue
+            heapq.heappush(pending, item)  # ordered by seq, which is unique
+            while pending and pending[0][0] == next_seq:
+                _seq, candidate, is_figure = heapq.heappop(pending)
+                next_seq += 1
+                window.release()
+                if is_figure:
+                    figure_number += 1
+                    await write_queue.put((figure_number, candidate))
+        for _ in range(writer_workers):
+            await write_queue.put(_DONE)
+
+    async def writer():
+        while True:
+            item = await write_queue.get()
+            if item is _DONE:
+                return
+            number, candidate = item
+            t0 = time.perf_counter()
+            path = await asyncio.to_thread(write, number, candidate)
+            timer.add("write", time.perf_counter() - t0)
+            figures.append((number, candidate, path))
+
+    tasks = [asyncio.ensure_future(asyncio.to_thread(extract))]
+    tasks += [asyncio.create_task(classifier()) for _ in range(classifier_workers)]
+    tasks.append(asyncio.create_task(sequencer()))
+    tasks += [asyncio.create_task(writer()) for _ in range(writer_workers)]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        # Surface the first stage failure to callers; the finally block stops the rest
+        for task in tasks:
+            if task.done() and not task.cancelled() and task.exception() is not None:
+                raise task.exception()
+    finally:
+        stop.set()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    figures.sort(key=lambda figure: figure[0])
+    timings = timer.report()
+    timings["total_s"] = round(time.perf_counter() - started, 3)
+    return figures, timings
@@ -0,0 +1,110 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Places [[INSERT_IMAGE: ...]] tags after existing "Figure N:" captions.
+
+The document is tokenized once into caption anchors (first "Figure N:" per
+number, extended over the caption's continuation lines), images are mapped to
+figure numbers in one pass, and the output is assembled with a single join,
+so the cost is linear in document size plus the number of images.
+"""
+
+import re
+
+_CAPTION_RE = re.compile(r"Figure (\d+):[^\n]", re.IGNORECASE)
+_NEXT_CAPTION_RE = re.compile(r"Figure \d+:", re.IGNORECASE)
+_EXISTING_TAG_RE = re.compile(r"\[\[INSERT_IMAGE:\s*(.*?)\s*\]\]")
+_FIGURE_NUMBER_RE = re.compile(r"(\d+)(?:\.[A-Za-z0-9]+)?$")
+
+
+def image_tag(name: str) -> str:
+    return f"[[INSERT_IMAGE: {name}]]"
+
+
+def _caption_block_end(content: str, start: int) -> int:
+    """
+    End offset of the caption starting at `start`: its own line plus following
+    non-empty lines that do not begin another "Figure N:" caption.
+    """
+    end = content.find("\n", start)
+    while end != -1:
+        line_start = end + 1
+        next_end = content.find("\n", line_start)
+        line_end = len(content) if next_end == -1 else next_end
+        if line_end == line_start or _NEXT_CAPTION_RE.match(content, line_start):
+            return end
+        end = next_end
+    return len(content)
+
+
+def caption_anchors(content: str) -> dict:
+    """Maps figure number -> end offset of its first caption block, in one scan."""
+    anchors = {}
+    for match in _CAPTION_RE.finditer(content):
+        number = int(match.group(1))
+        if number not in anchors:
+            anchors[number] = _caption_block_end(content, match.start())
+    return anchors
+
+
+def number_images(image_names: list) -> list:
+    """
+    Returns [(figure_number, name)]: the number in the file name
+    (figure12.png -> 12), else the image's position in that order.
+    """
+    def sort_key(name):
+        match = _FIGURE_NUMBER_RE.search(name)
+        return (int(match.group(1)) if match else float("inf"), name)
+
+    numbered = []
+    for position, name in enumerate(sorted(image_names, key=sort_key), start=1):
+        match = _FIGURE_NUMBER_RE.search(name)
+        numbered.append((int(match.group(1)) if match else position, name))
+    return numbered
+
+
+def place_figures(content: str, image_names: list) -> str:
+    """
+    Insert image tags ONLY after existing Figure X captions.
+    Do NOT duplicate Figure titles or captions; images whose tag is already in
+    the text are left alone, and images without a caption are appended.
+    """
+    anchors = caption_anchors(content)
+    already_tagged = set(_EXISTING_TAG_RE.findall(content))
+    insertions = []  # (offset, figure number, tag)
+    unplaced = []
+    used = set()
+    for number, name in number_images(image_names):
+        if name in already_tagged:
+            continue
+        tag = image_tag(name)
+        if number in anchors and number not in used:
+            used.add(number)
+            insertions.append((anchors[number], number, tag))
+        else:
+            # fallback ONLY if figure truly not referenced
+            unplaced.append(tag)
+
+    if not insertions and not unplaced:
+        return content
+    insertions.sort()
+    pieces, cursor = [], 0
+    for offset, _, tag in insertions:
+        pieces.append(content[cursor:offset])
+        pieces.append(f"\n\n{tag}")
+        cursor = offset
+    pieces.append(content[cursor:])
+    pieces.extend(f"\n\n{tag}\n" for tag in unplaced)
+    return "".join(pieces)
+
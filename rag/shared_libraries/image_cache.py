@@ -0,0 +1,227 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Persistent cache of image classification verdicts.
+
+Images are keyed by the SHA-256 of their bytes, per classifier version, so
+publisher logos and banners that repeat across pages and manuscripts are
+decided locally. Optionally a 64-bit difference hash (dHash) is stored too,
+letting re-encoded or slightly resized copies of the same artifact hit the
+cache. Entries are evicted least-recently-used beyond `max_entries`.
+
+Lookups and writes are batched (get_many / set_many, one SQLite connection
+per batch) and the dHashes of a classifier are kept in memory after the
+first lookup, so a miss never scans the table. Both still do blocking I/O
+and image decoding: async callers should run them in a thread. Without a
+db_path the cache lives in a private in-memory SQLite database.
+"""
+
+import hashlib
+import io
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+import numpy as np
+from PIL import Image
+
+
+def sha256_hex(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def perceptual_hash(image_bytes: bytes):
+    """64-bit dHash of the image, or None if Pillow cannot decode it."""
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as image:
+            pixels = np.asarray(image.convert("L").resize((9, 8)), dtype=np.int16)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return None
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    value = int(np.packbits(bits).view(">u8")[0])
+    # SQLite integers are signed 64-bit
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+class ImageVerdictCache:
+    def __init__(self, db_path: str | None = None, max_entries: int = 10000,
+                 use_phash: bool = True, max_phash_distance: int = 4):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.use_phash = use_phash
+        self.max_phash_distance = max_phash_distance
+        self._lock = threading.Lock()
+        self._stats = {"exact_hits": 0, "phash_hits": 0, "misses": 0}
+        # classifier -> {sha256: (phash, verdict)}, loaded on first lookup
+        self._phash_entries = {}
+        # classifier -> (sha256 list, uint64 array), rebuilt after changes
+        self._phash_arrays = {}
+        if db_path:
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+            self._uri = None
+            self._keepalive = None
+        else:
+            # Shared in-memory database, alive as long as this connection is open
+            self._uri = f"file:image-verdicts-{uuid.uuid4().hex}?mode=memory&cache=shared"
+            self._keepalive = sqlite3.connect(self._uri, uri=True, check_same_thread=False)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS image_verdicts ("
+                "sha256 TEXT, classifier TEXT, phash INTEGER, verdict TEXT, last_used REAL, "
+                "PRIMARY KEY (sha256, classifier))"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_image_verdicts_last_used "
+                "ON image_verdicts (last_used)"
+            )
+
+    @contextmanager
+    def _connect(self):
+        if self._uri:
+            conn = sqlite3.connect(self._uri, uri=True, timeout=5)
+        else:
+            conn = sqlite3.connect(self.db_path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _phash_index(self, conn, classifier: str):
+        entries = self._phash_entries.get(classifier)
+        if entries is None:
+            rows = conn.execute(
+                "SELECT sha256, phash, verdict FROM image_verdicts "
+                "WHERE classifier = ? AND phash IS NOT NULL",
+                (classifier,),
+            ).fetchall()
+            entries = self._phash_entries[classifier] = {sha: (phash, verdict) for sha, phash, verdict in rows}
+            self._phash_arrays.pop(classifier, None)
+        arrays = self._phash_arrays.get(classifier)
+        if arrays is None:
+            shas = list(entries)
+            stored = np.array([entries[sha][0] for sha in shas], dtype=np.int64).view(np.uint64)
+            arrays = self._phash_arrays[classifier] = (shas, stored)
+        return entries, arrays
+
+    def _nearest(self, conn, classifier: str, phash: int):
+        """(sha256, verdict) of the closest stored dHash within the distance limit, or None."""
+        entries, (shas, stored) = self._phash_index(conn, classifier)
+        if not shas:
+            return None
+        xor = np.bitwise_xor(stored, np.uint64(phash & ((1 << 64) - 1)))
+        distances = np.unpackbits(xor.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+        best = int(np.argmin(distances))
+        if distances[best] > self.max_phash_distance:
+            return None
+        return shas[best], entries[shas[best]][1]
+
+    def get_many(self, images: list, classifier: str) -> dict:
+        """
+        Looks up [(sha256, image bytes)] in one batch. Returns {sha256: verdict}
+        for the images that hit, exactly or by dHash.
+        """
+        verdicts = {}
+        if not images:
+            return verdicts
+        with self._lock, self._connect() as conn:
+            shas = [sha for sha, _ in images]
+            for start in range(0, len(shas), 500):  # stay under SQLite's parameter limit
+                part = shas[start:start + 500]
+                rows = conn.execute(
+                    f"SELECT sha256, verdict FROM image_verdicts WHERE classifier = ? "
+                    f"AND sha256 IN ({','.join('?' * len(part))})",
+                    (classifier, *part),
+                ).fetchall()
+                verdicts.update(rows)
+            touched = list(verdicts)
+            self._stats["exact_hits"] += len(verdicts)
+
+            for sha, image_bytes in images:
+                if sha in verdicts:
+                    continue
+                phash = perceptual_hash(image_bytes) if self.use_phash else None
+                match = self._nearest(conn, classifier, phash) if phash is not None else None
+                if match is None:
+                    self._stats["misses"] += 1
+                    continue
+                verdicts[sha] = match[1]
+                touched.append(match[0])
+                self._stats["phash_hits"] += 1
+
+            now = time.time()
+            conn.executemany(
+                "UPDATE image_verdicts SET last_used = ? WHERE sha256 = ? AND classifier = ?",
+                [(now, sha, classifier) for sha in touched],
+            )
+        return verdicts
+
+    def get(self, image_bytes: bytes, classifier: str, sha256: str | None = None):
+        """Returns the cached verdict string or None."""
+        sha256 = sha256 or sha256_hex(image_bytes)
+        return self.get_many([(sha256, image_bytes)], classifier).get(sha256)
+
+    def set_many(self, entries: list, classifier: str) -> None:
+        """Stores [(sha256, image bytes, verdict)] in one batch."""
+        if not entries:
+            return
+        now = time.time()
+        rows = [
+            (sha, classifier, perceptual_hash(image_bytes) if self.use_phash else None, verdict, now)
+            for sha, image_bytes, verdict in entries
+        ]
+        with self._lock, self._connect() as conn:
+            conn.executemany("INSERT OR REPLACE INTO image_verdicts VALUES (?, ?, ?, ?, ?)", rows)
+            index = self._phash_entries.get(classifier)
+            if index is not None:
+                for sha, _, phash, verdict, _ in rows:
+                    if phash is not None:
+                        index[sha] = (phash, verdict)
+                self._phash_arrays.pop(classifier, None)
+
+            overflow = conn.execute("SELECT COUNT(*) FROM image_verdicts").fetchone()[0] - self.max_entries
+            if overflow > 0:
+                evicted = conn.execute(
+                    "SELECT rowid, sha256, classifier FROM image_verdicts ORDER BY last_used LIMIT ?",
+                    (overflow,),
+                ).fetchall()
+                conn.executemany("DELETE FROM image_verdicts WHERE rowid = ?", [(r[0],) for r in evicted])
+                for _, sha, evicted_classifier in evicted:
+                    if self._phash_entries.get(evicted_classifier, {}).pop(sha, None) is not None:
+                        self._phash_arrays.pop(evicted_classifier, None)
+
+    def set(self, image_bytes: bytes, classifier: str, verdict: str, sha256: str | None = None) -> None:
+        self.set_many([(sha256 or sha256_hex(image_bytes), image_bytes, verdict)], classifier)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats)
+
+
+def image_cache_from_env(default_path: str, in_memory: bool = False):
+    """
+    Returns the cache configured by IMAGE_CACHE_* variables, or None if
+    disabled. With `in_memory` nothing is written to disk, whatever the path.
+    """
+    if os.environ.get("IMAGE_CACHE_ENABLED", "true").lower() not in ("1", "true", "yes"):
+        return None
+    return ImageVerdictCache(
+        db_path=None if in_memory else os.environ.get("IMAGE_CACHE_PATH") or default_path,
+        max_entries=int(os.environ.get("IMAGE_CACHE_MAX_ENTRIES", "10000")),
+        use_phash=os.environ.get("IMAGE_CACHE_PHASH", "true").lower() in ("1", "true", "yes"),
+        max_phash_distance=int(os.environ.get("IMAGE_CACHE_PHASH_DISTANCE", "4")),
+    )
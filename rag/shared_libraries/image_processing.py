@@ -0,0 +1,161 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Image normalization for classification and PDF embedding.
+
+Every extracted image yields two renditions:
+  * a small thumbnail sent to the vision classifier, and
+  * a size-capped version for the reconstructed PDF, encoded as JPEG for
+    photographic content and PNG for line art / transparency, with a file
+    extension that matches the actual encoding.
+Renditions are cached on disk by the SHA-256 of the source bytes; entries
+not used for `max_age_seconds` are removed by collect_garbage().
+"""
+
+import hashlib
+import io
+import os
+import time
+
+from PIL import Image
+
+from .workspace import atomic_write
+
+_MAGIC = (
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"\xff\xd8\xff", "jpeg"),
+    (b"GIF8", "gif"),
+    (b"BM", "bmp"),
+    (b"II*\x00", "tiff"),
+    (b"MM\x00*", "tiff"),
+)
+_EXTENSIONS = {"jpeg": "jpg", "png": "png", "gif": "gif", "bmp": "bmp", "tiff": "tif", "webp": "webp"}
+
+
+def guess_image_format(data: bytes, default: str = "png") -> str:
+    for magic, fmt in _MAGIC:
+        if data.startswith(magic):
+            return fmt
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "webp"
+    return default
+
+
+def guess_image_mime(data: bytes) -> str:
+    return f"image/{guess_image_format(data)}"
+
+
+def image_extension(data: bytes) -> str:
+    return _EXTENSIONS.get(guess_image_format(data), "png")
+
+
+def _is_photographic(image) -> bool:
+    """Many distinct colors in a small sample -> photo-like, JPEG compresses it better."""
+    if image.mode in ("1", "P", "LA", "RGBA") or "transparency" in image.info:
+        return False
+    sample = image.convert("RGB").resize((64, 64))
+    return len(set(sample.getdata())) > 512
+
+
+def _encode(image, photographic: bool, jpeg_quality: int) -> bytes:
+    buffer = io.BytesIO()
+    if photographic:
+        image.convert("RGB").save(buffer, "JPEG", quality=jpeg_quality, optimize=True)
+    else:
+        if image.mode not in ("1", "L", "LA", "P", "RGB", "RGBA"):
+            image = image.convert("RGBA" if "A" in image.mode else "RGB")
+        image.save(buffer, "PNG", optimize=True)
+    return buffer.getvalue()
+
+
+def _rendition(image, source: bytes, max_side: int, jpeg_quality: int) -> bytes:
+    within_cap = max(image.size) <= max_side
+    if within_cap and guess_image_format(source, default="") in ("png", "jpeg"):
+        return source  # already small and embeddable: avoid re-encoding loss
+    photographic = _is_photographic(image)
+    if not within_cap:
+        image = image.copy()
+        image.thumbnail((max_side, max_side))
+    return _encode(image, photographic, jpeg_quality)
+
+
+class ImageNormalizer:
+    def __init__(self, cache_dir: str | None = None, thumbnail_px: int = 512,
+                 embed_max_px: int = 1600, jpeg_quality: int = 85,
+                 max_age_seconds: float | None = None):
+        self.cache_dir = cache_dir
+        self.thumbnail_px = thumbnail_px
+        self.embed_max_px = embed_max_px
+        self.jpeg_quality = jpeg_quality
+        self.max_age_seconds = max_age_seconds
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _cache_path(self, digest: str, kind: str):
+        if not self.cache_dir:
+            return None
+        settings = f"{self.thumbnail_px}-{self.embed_max_px}-{self.jpeg_quality}"
+        return os.path.join(self.cache_dir, f"{digest}-{settings}-{kind}")
+
+    def _cached(self, digest: str, kind: str):
+        path = self._cache_path(digest, kind)
+        if path and os.path.exists(path):
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+                os.utime(path)  # mtime = last use, for collect_garbage
+            except FileNotFoundError:  # removed by a concurrent collection
+                return None
+            return data
+        return None
+
+    def _store(self, digest: str, kind: str, data: bytes) -> None:
+        path = self._cache_path(digest, kind)
+        if path:
+            atomic_write(path, data)
+
+    def normalize(self, data: bytes) -> dict:
+        """
+        Returns {"thumbnail": bytes, "embed": bytes, "ext": str}, where ext is the
+        file extension of the embed rendition. Undecodable images pass through.
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        thumbnail = self._cached(digest, "thumb")
+        embed = self._cached(digest, "embed")
+        if thumbnail is None or embed is None:
+            try:
+                with Image.open(io.BytesIO(data)) as image:
+                    image.load()
+                    thumbnail = _rendition(image, data, self.thumbnail_px, self.jpeg_quality)
+                    embed = _rendition(image, data, self.embed_max_px, self.jpeg_quality)
+            except (OSError, ValueError, Image.DecompressionBombError):
+                thumbnail = embed = data
+            self._store(digest, "thumb", thumbnail)
+            self._store(digest, "embed", embed)
+        return {"thumbnail": thumbnail, "embed": embed, "ext": image_extension(embed)}
+
+    def collect_garbage(self) -> int:
+        """Deletes cached renditions unused for max_age_seconds. Returns how many."""
+        if not self.cache_dir or self.max_age_seconds is None:
+            return 0
+        cutoff = time.time() - self.max_age_seconds
+        removed = 0
+        for entry in os.scandir(self.cache_dir):
+            try:
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+                    removed += 1
+            except FileNotFoundError:
+                continue
+        return removed
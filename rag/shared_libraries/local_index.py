@@ -0,0 +1,202 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""In-process vector index over the ICMJE Recommendations PDF.
+
+The policy document is chunked locally with PyMuPDF, embedded once, and
+stored as a .npy matrix that is memory-mapped at query time. Two index types
+are supported: "flat" (exact search over every chunk) and "ivf" (k-means
+inverted lists, probing the nearest `nprobe` lists only).
+
+Build an index with:
+    python -m rag.shared_libraries.local_index path/to/ICMJE.pdf --out rag/local_index
+"""
+
+import argparse
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from .bm25 import BM25_FILE, BM25Index
+from .embeddings import get_embedding_function
+
+CHUNKS_FILE = "chunks.json"
+EMBEDDINGS_FILE = "embeddings.npy"
+META_FILE = "meta.json"
+IVF_CENTROIDS_FILE = "ivf_centroids.npy"
+IVF_ORDER_FILE = "ivf_order.npy"
+IVF_OFFSETS_FILE = "ivf_offsets.npy"
+
+
+def chunk_pdf(pdf_path: str, chunk_words: int = 200, overlap_words: int = 40,
+              source_uri: str | None = None) -> list:
+    """Splits the PDF text into overlapping word windows, page by page."""
+    import fitz
+
+    source_uri = source_uri or os.path.basename(pdf_path)
+    step = max(1, chunk_words - overlap_words)
+    chunks = []
+    with fitz.open(pdf_path) as doc:
+        for page_number, page in enumerate(doc, start=1):
+            words = page.get_text("text").split()
+            for start in range(0, len(words), step):
+                window = words[start:start + chunk_words]
+                if not window:
+                    break
+                chunks.append({
+                    "source_uri": source_uri,
+                    "text": " ".join(window),
+                    "page": page_number,
+                })
+                if start + chunk_words >= len(words):
+                    break
+    return chunks
+
+
+def _kmeans(vectors: np.ndarray, n_lists: int, iterations: int = 20, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), n_lists, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = np.argmax(vectors @ centroids.T, axis=1)
+        for i in range(n_lists):
+            members = vectors[assignments == i]
+            if len(members):
+                centroid = members.mean(axis=0)
+                centroids[i] = centroid / (np.linalg.norm(centroid) or 1.0)
+    return centroids.astype(np.float32), np.argmax(vectors @ centroids.T, axis=1)
+
+
+def build_index(pdf_path: str, index_dir: str, embedding_backend: str | None = None,
+                index_type: str = "flat", n_lists: int | None = None,
+                source_uri: str | None = None, batch_size: int = 64) -> dict:
+    """Chunks, embeds and writes an index directory. Returns its metadata."""
+    embedding_backend = embedding_backend or os.environ.get("RAG_EMBEDDING_BACKEND", "vertex")
+    embed_fn = get_embedding_function(embedding_backend)
+    chunks = chunk_pdf(pdf_path, source_uri=source_uri)
+    if not chunks:
+        raise ValueError(f"No text could be extracted from {pdf_path}")
+
+    vectors = np.concatenate([
+        embed_fn([c["text"] for c in chunks[i:i + batch_size]])
+        for i in range(0, len(chunks), batch_size)
+    ]).astype(np.float32)
+
+    os.makedirs(index_dir, exist_ok=True)
+    with open(os.path.join(index_dir, CHUNKS_FILE), "w", encoding="utf-8") as f:
+        json.dump(chunks, f)
+    np.save(os.path.join(index_dir, EMBEDDINGS_FILE), vectors)
+    # Lexical index for hybrid retrieval, precomputed so startup never re-tokenizes
+    BM25Index.build(chunks).save(os.path.join(index_dir, BM25_FILE))
+
+    with open(pdf_path, "rb") as f:
+        pdf_sha256 = hashlib.sha256(f.read()).hexdigest()
+    meta = {
+        "embedding_backend": embedding_backend,
+        "dim": int(vectors.shape[1]),
+        "count": len(chunks),
+        "index_type": index_type,
+        "source_sha256": pdf_sha256,
+    }
+
+    if index_type == "ivf":
+        n_lists = min(n_lists or max(1, int(np.sqrt(len(chunks)))), len(chunks))
+        centroids, assignments = _kmeans(vectors, n_lists)
+        order = np.argsort(assignments, kind="stable").astype(np.int64)
+        offsets = np.searchsorted(assignments[order], np.arange(n_lists + 1)).astype(np.int64)
+        np.save(os.path.join(index_dir, IVF_CENTROIDS_FILE), centroids)
+        np.save(os.path.join(index_dir, IVF_ORDER_FILE), order)
+        np.save(os.path.join(index_dir, IVF_OFFSETS_FILE), offsets)
+        meta["n_lists"] = n_lists
+    elif index_type != "flat":
+        raise ValueError(f"Unknown index type: {index_type}")
+
+    with open(os.path.join(index_dir, META_FILE), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
+class LocalVectorIndex:
+    """Read-only, memory-mapped view of an index directory."""
+
+    def __init__(self, index_dir: str, nprobe: int = 4):
+        with open(os.path.join(index_dir, META_FILE), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        with open(os.path.join(index_dir, CHUNKS_FILE), encoding="utf-8") as f:
+            self.chunks = json.load(f)
+        self.embeddings = np.load(os.path.join(index_dir, EMBEDDINGS_FILE), mmap_mode="r")
+        self.embed_fn = get_embedding_function(self.meta["embedding_backend"])
+        self.nprobe = nprobe
+        if self.meta["index_type"] == "ivf":
+            self.centroids = np.load(os.path.join(index_dir, IVF_CENTROIDS_FILE))
+            self.order = np.load(os.path.join(index_dir, IVF_ORDER_FILE), mmap_mode="r")
+            self.offsets = np.load(os.path.join(index_dir, IVF_OFFSETS_FILE))
+
+    def _candidates(self, vector: np.ndarray):
+        if self.meta["index_type"] != "ivf":
+            return None
+        nprobe = min(self.nprobe, len(self.centroids))
+        lists = np.argpartition(-(self.centroids @ vector), nprobe - 1)[:nprobe]
+        return np.concatenate([
+            self.order[self.offsets[i]:self.offsets[i + 1]] for i in lists
+        ])
+
+    def search_vector(self, vector: np.ndarray, top_k: int, threshold: float) -> list:
+        """
+        Returns up to top_k chunk dicts whose cosine distance (1 - similarity)
+        is within threshold, nearest first, matching RAG Engine semantics.
+        """
+        candidates = self._candidates(vector)
+        matrix = self.embeddings if candidates is None else self.embeddings[candidates]
+        distances = 1.0 - np.asarray(matrix @ vector)
+        k = min(top_k, len(distances))
+        if k == 0:
+            return []
+        best = np.argpartition(distances, k - 1)[:k]
+        best = best[np.argsort(distances[best])]
+        results = []
+        for i in best:
+            if distances[i] > threshold:
+                break
+            chunk_id = int(i if candidates is None else candidates[i])
+            results.append(dict(self.chunks[chunk_id], distance=float(distances[i])))
+        return results
+
+    def search(self, query: str, top_k: int, threshold: float) -> list:
+        return self.search_vector(self.embed_fn([query])[0], top_k, threshold)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a local ICMJE vector index.")
+    parser.add_argument("pdf_path")
+    parser.add_argument("--out", default=os.environ.get("ICMJE_LOCAL_INDEX_DIR", "rag/local_index"))
+    parser.add_argument("--index-type", choices=["flat", "ivf"], default="flat")
+    parser.add_argument("--n-lists", type=int, default=None)
+    parser.add_argument("--embedding-backend", default=None)
+    parser.add_argument("--source-uri", default=None)
+    args = parser.parse_args()
+    meta = build_index(
+        args.pdf_path,
+        args.out,
+        embedding_backend=args.embedding_backend,
+        index_type=args.index_type,
+        n_lists=args.n_lists,
+        source_uri=args.source_uri,
+    )
+    print(f"Index written to {args.out}: {meta}")
+
+
+if __name__ == "__main__":
+    main()
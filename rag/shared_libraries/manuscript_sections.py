@@ -0,0 +1,272 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Local text extraction and IMRaD/ICMJE section segmentation for manuscripts.
+
+Text is read with PyMuPDF's layout output (blocks -> lines -> spans), running
+headers/footers and bare page numbers are dropped, and lines that look like
+section headings ("2. Methods", "CONFLICTS OF INTEREST", "Funding: ...") start
+a new section. Everything before the first heading is the title page.
+Results are cached by document hash, in memory and optionally on disk, where
+files unused for `max_age_seconds` are removed by SectionStore.collect_garbage().
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from .pdf_images import open_pdf
+from .workspace import atomic_write
+
+# Bump when the segmentation logic changes so cached outlines are rebuilt
+SEGMENTER_VERSION = "2"
+
+# Canonical section name -> heading aliases (regex alternations, case-insensitive)
+SECTION_ALIASES = {
+    "abstract": r"abstract|structured abstract",
+    "keywords": r"key\s*words|index terms",
+    "introduction": r"introduction|background",
+    "methods": r"(?:materials?|patients?|subjects?)\s+and\s+methods?|methods?|methodology|study design",
+    "results": r"results",
+    "discussion": r"discussion",
+    "conclusions": r"conclusions?|concluding remarks",
+    "limitations": r"(?:study\s+)?limitations",
+    "ethics": r"ethic(?:s|al)(?:\s+(?:approval|statement|considerations|declarations?))?|informed consent",
+    "trial_registration": r"(?:clinical\s+)?trial\s+registration",
+    "data_sharing": r"data\s+(?:sharing|availability)(?:\s+statement)?",
+    "author_contributions": r"authors?['\u2019]?\s+contributions?|contributorship|credit\s+authorship(?:\s+contribution)?(?:\s+statement)?",
+    "conflicts_of_interest": r"(?:declaration\s+of\s+)?(?:conflicts?|competing)\s+(?:of\s+)?interests?|disclosures?|declarations?(?:\s+of\s+interests?)?",
+    "funding": r"funding(?:\s+(?:statement|sources?|information))?|financial\s+support|sources?\s+of\s+funding",
+    "ai_disclosure": r"(?:use\s+of\s+)?(?:generative\s+)?(?:ai|artificial\s+intelligence)(?:[\s-]+assisted)?(?:\s+(?:technologies|tools|disclosure|statement))?",
+    "acknowledgments": r"acknowledge?ments?",
+    "references": r"references|bibliography|literature\s+cited",
+    "figure_legends": r"figure\s+legends?|legends?\s+(?:to|for)\s+figures?",
+}
+
+# Sections ICMJE expects in a research manuscript (reported as missing when absent)
+ICMJE_EXPECTED_SECTIONS = (
+    "abstract", "introduction", "methods", "results", "discussion",
+    "author_contributions", "conflicts_of_interest", "funding", "references",
+)
+
+_NUMBERING = r"(?:(?:\d+|[IVX]+)(?:\.\d+)*\.?\s+)?"
+_HEADING_RES = [
+    # Whole line is the heading: "2. Methods", "CONFLICTS OF INTEREST:"
+    (name, re.compile(rf"^\s*{_NUMBERING}(?:{aliases})\s*[:.]?\s*$", re.IGNORECASE))
+    for name, aliases in SECTION_ALIASES.items()
+]
+_INLINE_HEADING_RES = [
+    # Run-in heading followed by text: "Funding: This work was supported by ..."
+    (name, re.compile(rf"^\s*{_NUMBERING}({aliases})\s*:\s+(\S.*)$", re.IGNORECASE))
+    for name, aliases in SECTION_ALIASES.items()
+]
+_NUMBERED_RE = re.compile(r"^\s*(?:\d+|[IVX]+)(?:\.\d+)*\.?\s+\S")
+# Run-in labels of a structured abstract ("Methods: ...") stay inside the abstract
+_ABSTRACT_SUBSECTIONS = {"introduction", "methods", "results", "discussion", "conclusions",
+                         "limitations", "trial_registration"}
+_PAGE_NUMBER_RE = re.compile(r"^\s*(?:page\s+)?\d+(?:\s*(?:of|/)\s*\d+)?\s*$", re.IGNORECASE)
+_DIGITS_RE = re.compile(r"\d+")
+_MAX_HEADING_WORDS = 8
+
+
+def extract_layout_lines(doc) -> list:
+    """
+    Returns [{"page", "text", "size", "bold"}] in reading order, with running
+    headers/footers (lines repeated on most pages) and page numbers removed.
+    """
+    lines = []
+    for page_index in range(doc.page_count):
+        layout = doc[page_index].get_text("dict", sort=True)
+        for block in layout["blocks"]:
+            if block.get("type", 0) != 0:
+                continue  # image block
+            for line in block["lines"]:
+                spans = [s for s in line["spans"] if s["text"].strip()]
+                if not spans:
+                    continue
+                lines.append({
+                    "page": page_index + 1,
+                    "text": " ".join(s["text"].strip() for s in spans),
+                    "size": max(s["size"] for s in spans),
+                    "bold": all(s["flags"] & 16 for s in spans),
+                })
+
+    if doc.page_count >= 3:
+        # Same text (digits ignored) on at least half of the pages -> running header/footer
+        pages_per_text = Counter()
+        for key in {(_DIGITS_RE.sub("#", line["text"]), line["page"]) for line in lines}:
+            pages_per_text[key[0]] += 1
+        repeated = {t for t, n in pages_per_text.items() if n >= max(3, doc.page_count / 2)}
+        lines = [line for line in lines if _DIGITS_RE.sub("#", line["text"]) not in repeated]
+    return [line for line in lines if not _PAGE_NUMBER_RE.match(line["text"])]
+
+
+def match_heading(text: str):
+    """
+    Returns (section_name, heading, rest_of_line) if the line starts a section,
+    else None.
+    """
+    if len(text.split()) <= _MAX_HEADING_WORDS:
+        for name, pattern in _HEADING_RES:
+            if pattern.match(text):
+                return name, text.strip().rstrip(":."), ""
+    for name, pattern in _INLINE_HEADING_RES:
+        match = pattern.match(text)
+        if match:
+            return name, match.group(1), match.group(2)
+    return None
+
+
+def _is_strong_heading(line: dict, rest: str, body_size: float) -> bool:
+    """Numbered, bold, all-caps or larger-than-body whole-line heading."""
+    return not rest and bool(
+        _NUMBERED_RE.match(line["text"]) or line["bold"] or line["text"].isupper()
+        or line["size"] > body_size + 0.5
+    )
+
+
+def segment_lines(lines: list) -> list:
+    """Groups layout lines into [{"name", "heading", "page_start", "page_end", "text"}]."""
+    sizes = sorted(line["size"] for line in lines)
+    body_size = sizes[len(sizes) // 2] if sizes else 0
+    sections = []
+    current = {"name": "title_page", "heading": "", "page_start": 1, "page_end": 1, "lines": []}
+    for line in lines:
+        heading = match_heading(line["text"])
+        if heading is not None and not _is_strong_heading(line, heading[2], body_size):
+            # A short body line such as "Results." or "Declarations" is not a heading
+            # unless typeset like one; run-in labels of a structured abstract stay inside it
+            if not heading[2] or (current["name"] == "abstract" and heading[0] in _ABSTRACT_SUBSECTIONS):
+                heading = None
+        if heading is not None:
+            sections.append(current)
+            name, heading_text, rest = heading
+            current = {"name": name, "heading": heading_text, "page_start": line["page"],
+                       "page_end": line["page"], "lines": [rest] if rest else []}
+            continue
+        current["lines"].append(line["text"])
+        current["page_end"] = line["page"]
+    sections.append(current)
+
+    result = []
+    for section in sections:
+        text = "\n".join(section.pop("lines")).strip()
+        if text or section["heading"]:
+            result.append(dict(section, text=text, chars=len(text)))
+    return result
+
+
+def segment_pdf(source) -> dict:
+    """
+    Extracts and segments a PDF given as a path or bytes. Returns
+    {"pages", "sections", "missing"} where missing lists expected ICMJE
+    sections with no matching heading.
+    """
+    with open_pdf(source) as doc:
+        page_count = doc.page_count
+        lines = extract_layout_lines(doc)
+    sections = segment_lines(lines)
+    found = {s["name"] for s in sections}
+    return {
+        "pages": page_count,
+        "sections": sections,
+        "missing": [name for name in ICMJE_EXPECTED_SECTIONS if name not in found],
+    }
+
+
+def format_outline(segmentation: dict) -> str:
+    lines = [f"Pages: {segmentation['pages']}"]
+    for s in segmentation["sections"]:
+        pages = f"p.{s['page_start']}" + (f"-{s['page_end']}" if s["page_end"] != s["page_start"] else "")
+        heading = f" \"{s['heading']}\"" if s["heading"] else ""
+        lines.append(f"- {s['name']}{heading} ({pages}, {s['chars']} chars)")
+    if segmentation["missing"]:
+        lines.append(f"Not found: {', '.join(segmentation['missing'])}")
+    return "\n".join(lines)
+
+
+def select_sections(segmentation: dict, names: list) -> list:
+    """Sections whose canonical name (or heading text) matches one of `names`."""
+    wanted = {n.strip().lower().replace(" ", "_") for n in names if n.strip()}
+    return [
+        s for s in segmentation["sections"]
+        if s["name"] in wanted or s["heading"].lower().replace(" ", "_") in wanted
+    ]
+
+
+class SectionStore:
+    """Segmentations keyed by document hash: memory LRU plus optional JSON files."""
+
+    def __init__(self, cache_dir: str | None = None, max_entries: int = 32,
+                 max_age_seconds: float | None = None):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_seconds
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, document_sha256: str):
+        if not self.cache_dir:
+            return None
+        return os.path.join(self.cache_dir, f"{document_sha256}-v{SEGMENTER_VERSION}.json")
+
+    def get(self, document_sha256: str):
+        with self._lock:
+            if document_sha256 in self._memory:
+                self._memory.move_to_end(document_sha256)
+                return self._memory[document_sha256]
+        path = self._path(document_sha256)
+        if path and os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    segmentation = json.load(f)
+                os.utime(path)  # mtime = last use, for collect_garbage
+            except FileNotFoundError:  # removed by a concurrent collection
+                return None
+            self._remember(document_sha256, segmentation)
+            return segmentation
+        return None
+
+    def set(self, document_sha256: str, segmentation: dict) -> None:
+        self._remember(document_sha256, segmentation)
+        path = self._path(document_sha256)
+        if path:
+            atomic_write(path, json.dumps(segmentation).encode("utf-8"))
+
+    def _remember(self, document_sha256: str, segmentation: dict) -> None:
+        with self._lock:
+            self._memory[document_sha256] = segmentation
+            self._memory.move_to_end(document_sha256)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def collect_garbage(self) -> int:
+        """Deletes cached JSON files unused for max_age_seconds. Returns how many."""
+        if not self.cache_dir or self.max_age_seconds is None:
+            return 0
+        cutoff = time.time() - self.max_age_seconds
+        removed = 0
+        for entry in os.scandir(self.cache_dir):
+            try:
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+                    removed += 1
+            except FileNotFoundError:
+                continue
+        return removed
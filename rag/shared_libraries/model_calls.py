@@ -0,0 +1,63 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Concurrency limits and retries for model API calls.
+
+An asyncio.Semaphore belongs to one event loop, so `LoopSemaphore` keeps one
+per loop: the limit then holds across every tool call and document running
+on that loop. `call_with_retry` retries transient failures with jittered
+exponential backoff and holds a limiter slot only while a request is
+actually in flight, not while it waits to retry.
+"""
+
+import asyncio
+import logging
+import random
+import weakref
+
+logger = logging.getLogger(__name__)
+
+
+class LoopSemaphore:
+    """At most `limit` holders per event loop."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    def __call__(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.limit)
+        return semaphore
+
+
+async def call_with_retry(call, limiter: LoopSemaphore, max_retries: int, is_retryable,
+                          base_delay: float = 1.0, max_delay: float = 30.0):
+    """
+    Awaits `call()` under `limiter`, retrying up to `max_retries` times when
+    `is_retryable(error)` holds. The last error, or any error that is not
+    retryable, is raised.
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            async with limiter():
+                return await call()
+        except Exception as e:
+            if not is_retryable(e) or attempt == max_retries:
+                raise
+            delay = min(max_delay, base_delay * 2 ** attempt) * (0.5 + random.random())
+            logger.warning(f"Model call failed ({e}), retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
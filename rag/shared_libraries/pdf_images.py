@@ -0,0 +1,159 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Candidate image collection from PDFs, with cheap pre-filters.
+
+Everything here runs before any vision model call: repeated xrefs are
+collapsed, images that appear on most pages (running headers, logos) are
+dropped, and tiny, extremely elongated or very small-payload images are
+rejected using the metadata PyMuPDF already has.
+"""
+
+import multiprocessing
+import os
+
+from rag_workers.pdf_shards import (
+    FILTER_NAMES,
+    extract_shard,
+    iter_extracted,
+    new_filter_report,
+    open_pdf,
+    scan_image_references,
+    scan_shard,
+    source_size,
+)
+
+
+def filter_config_from_env() -> dict:
+    return {
+        "min_pixel_area": int(os.environ.get("IMAGE_MIN_PIXEL_AREA", "10000")),
+        "max_aspect_ratio": float(os.environ.get("IMAGE_MAX_ASPECT_RATIO", "8")),
+        "min_bytes": int(os.environ.get("IMAGE_MIN_BYTES", "2048")),
+        "header_page_fraction": float(os.environ.get("IMAGE_HEADER_PAGE_FRACTION", "0.5")),
+        "header_min_pages": int(os.environ.get("IMAGE_HEADER_MIN_PAGES", "3")),
+    }
+
+
+def select_xrefs(references: dict, page_count: int, config: dict, report: dict) -> list:
+    """
+    Applies the metadata-only filters and returns surviving xrefs ordered by
+    first page. Removal counts are added to `report`.
+    """
+    header_pages = max(config["header_min_pages"], config["header_page_fraction"] * page_count)
+    selected = []
+    for xref, ref in references.items():
+        pages = ref["pages"]
+        report["references"] += len(pages)
+        report["duplicate_xref"] += len(pages) - 1
+        width, height = ref["width"], ref["height"]
+        if len(set(pages)) >= header_pages:
+            report["running_header"] += 1
+        elif width * height < config["min_pixel_area"]:
+            report["too_small"] += 1
+        elif max(width, height) > config["max_aspect_ratio"] * max(1, min(width, height)):
+            report["bad_aspect_ratio"] += 1
+        else:
+            selected.append(xref)
+    selected.sort(key=lambda xref: references[xref]["pages"][0])
+    return selected
+
+
+def collect_candidate_images(doc, config: dict):
+    """
+    Returns (candidates, report) for a whole open fitz document. Candidates are
+    dicts with xref, page (1-based, first occurrence), image bytes, ext,
+    width and height, in page order.
+    """
+    report = new_filter_report()
+    references = scan_image_references(doc)
+    xrefs = select_xrefs(references, doc.page_count, config, report)
+    return list(iter_extracted(doc, xrefs, references, config, report)), report
+
+
+def pdf_pool_context():
+    """
+    Start method for the extraction process pool: forkserver where available,
+    else spawn. fork would copy the parent's event loop, thread pools, SQLite
+    connections and gRPC channels into every worker. Workers run functions
+    from rag_workers.pdf_shards, which never imports the agent.
+    """
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return multiprocessing.get_context(method)
+
+
+def page_shards(page_count: int, shard_count: int) -> list:
+    size = max(1, -(-page_count // max(1, shard_count)))
+    return [(start, min(start + size, page_count)) for start in range(0, page_count, size)]
+
+
+def iter_candidate_images_parallel(source, page_count: int, config: dict,
+                                   executor, shard_count: int, report: dict):
+    """
+    Yields the same candidates as collect_candidate_images, in page order, using
+    `executor` (a ProcessPoolExecutor). Phase 1 scans image references per
+    page shard; the filters need the whole-document view, so they run here;
+    phase 2 decodes each surviving xref in the shard holding its first page,
+    and shard results are streamed back as they complete, in order.
+    """
+    shards = page_shards(page_count, shard_count)
+    references = {}
+    scans = executor.map(scan_shard, [source] * len(shards), *zip(*shards, strict=True))
+    for shard_refs in scans:  # shard order == page order
+        for xref, ref in shard_refs.items():
+            if xref in references:
+                references[xref]["pages"].extend(ref["pages"])
+            else:
+                references[xref] = ref
+
+    xrefs = select_xrefs(references, page_count, config, report)
+    by_shard = [[] for _ in shards]
+    for xref in xrefs:
+        first_page = references[xref]["pages"][0] - 1
+        shard_index = next(i for i, (start, end) in enumerate(shards) if start <= first_page < end)
+        by_shard[shard_index].append(xref)
+
+    jobs = [
+        executor.submit(extract_shard, source, shard_xrefs,
+                        {x: references[x] for x in shard_xrefs}, config)
+        for shard_xrefs in by_shard if shard_xrefs
+    ]
+    for job in jobs:
+        candidates, shard_report = job.result()
+        report["too_few_bytes"] += shard_report["too_few_bytes"]
+        report["candidates"] += shard_report["candidates"]
+        yield from candidates
+
+
+def iter_candidate_images(source, config: dict, report: dict, executor=None,
+                          shard_count: int = 1, min_parallel_bytes: int = 0):
+    """
+    Streams candidates in page order from a PDF given as a path or as bytes.
+    Documents of at least `min_parallel_bytes` (with more than one page) are
+    sharded across `executor`; smaller ones use the single-process path.
+    """
+    with open_pdf(source) as doc:
+        page_count = doc.page_count
+        parallel = (executor is not None and shard_count > 1 and page_count > 1
+                    and source_size(source) >= min_parallel_bytes)
+        if not parallel:
+            references = scan_image_references(doc)
+            xrefs = select_xrefs(references, page_count, config, report)
+            yield from iter_extracted(doc, xrefs, references, config, report)
+            return
+    yield from iter_candidate_images_parallel(source, page_count, config, executor, shard_count, report)
+
+
+def format_filter_report(report: dict) -> str:
+    removed = ", ".join(f"{name}={report[name]}" for name in FILTER_NAMES)
+    return f"{report['references']} image references -> {report['candidates']} candidates ({removed})"
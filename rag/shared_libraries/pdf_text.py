@@ -0,0 +1,124 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Text sanitization for the core-font (Latin-1) PDF writer.
+
+A single scan with one precompiled character class finds every character
+that is PDF-breaking or outside Latin-1, and a precomputed replacement table
+removes or transliterates it (smart quotes, dashes, <=/>=, Greek letters, ...)
+instead of letting the encoder turn medical symbols into "?". Characters not
+in the table are resolved once via Unicode decomposition and memoized.
+Precompiled regexes with literal prefixes then isolate image tags and
+collapse blank lines.
+
+Manuscript text is overwhelmingly Latin-1, so scanning for the few special
+characters is several times faster than str.translate, which does a dict
+lookup for every character.
+"""
+
+import re
+import unicodedata
+
+# Invisible or layout-breaking characters, removed outright
+_REMOVED_CHARS = (
+    "\u000c"  # form feed
+    "\u00ad"  # soft hyphen
+    "\u2028"  # line separator
+    "\u2029"  # paragraph separator
+    "\u200b\u200c\u200d\u2060\ufeff"  # zero-width characters / BOM
+)
+
+# Non-Latin-1 characters common in manuscripts -> Latin-1 replacements
+LATIN1_TRANSLITERATIONS = {
+    "\u2018": "'", "\u2019": "'", "\u201a": "'", "\u201b": "'", "\u2032": "'",
+    "\u201c": '"', "\u201d": '"', "\u201e": '"', "\u201f": '"', "\u2033": '"',
+    "\u2039": "<", "\u203a": ">",
+    "\u2010": "-", "\u2011": "-", "\u2012": "-", "\u2013": "-", "\u2014": "--", "\u2015": "--",
+    "\u2212": "-",  # minus sign
+    "\u2026": "...",
+    "\u2022": "\u00b7", "\u2023": "\u00b7", "\u2027": "\u00b7", "\u22c5": "\u00b7",
+    "\u2264": "<=", "\u2265": ">=", "\u2260": "!=", "\u2248": "~", "\u223c": "~",
+    "\u2192": "->", "\u2190": "<-", "\u2194": "<->", "\u2191": "^", "\u2193": "v",
+    "\u221e": "infinity", "\u221a": "sqrt", "\u2211": "sum", "\u2206": "delta",
+    "\u2030": "o/oo", "\u2122": "(TM)", "\u20ac": "EUR", "\u2020": "+", "\u2021": "++",
+    # en/em/thin/hair/narrow no-break spaces
+    "\u2002": " ", "\u2003": " ", "\u2007": " ", "\u2008": " ", "\u2009": " ", "\u200a": " ", "\u202f": " ",
+    "\u03bc": "\u00b5",  # Greek mu -> micro sign (Latin-1)
+    "\u03b1": "alpha", "\u03b2": "beta", "\u03b3": "gamma", "\u03b4": "delta", "\u03b5": "epsilon",
+    "\u03b6": "zeta", "\u03b7": "eta", "\u03b8": "theta", "\u03ba": "kappa", "\u03bb": "lambda",
+    "\u03bd": "nu", "\u03be": "xi", "\u03c0": "pi", "\u03c1": "rho", "\u03c3": "sigma",
+    "\u03c4": "tau", "\u03c6": "phi", "\u03c7": "chi", "\u03c8": "psi", "\u03c9": "omega",
+    "\u0394": "Delta", "\u03a3": "Sigma", "\u03a9": "Omega",
+    "\u2070": "^0", "\u2074": "^4", "\u2075": "^5", "\u2076": "^6", "\u2077": "^7",
+    "\u2078": "^8", "\u2079": "^9", "\u207a": "^+", "\u207b": "^-",
+    "\u2080": "0", "\u2081": "1", "\u2082": "2", "\u2083": "3", "\u2084": "4",
+    "\ufb00": "ff", "\ufb01": "fi", "\ufb02": "fl", "\ufb03": "ffi", "\ufb04": "ffl",
+}
+
+# Character -> replacement for everything _SPECIAL_RE can match; grows with memoized fallbacks
+_REPLACEMENTS = dict(LATIN1_TRANSLITERATIONS)
+_REPLACEMENTS.update(dict.fromkeys(_REMOVED_CHARS, ""))
+
+# Outside Latin-1, plus the Latin-1 characters we remove (form feed, soft hyphen)
+_SPECIAL_RE = re.compile(r"[^\x00-\x0b\x0d-\xac\xae-\xff]")
+# Literal prefix keeps these scans fast; whitespace around tags is stripped in _isolate_image_tags
+_IMAGE_TAG_RE = re.compile(r"\[\[INSERT_IMAGE:\s*(.*?)\]\]")
+_BLANK_LINES_RE = re.compile(r"\n\n\n+")
+
+
+def _replace_special(match) -> str:
+    char = match.group()
+    value = _REPLACEMENTS.get(char)
+    if value is None:
+        # Unlisted character: Unicode decomposition (accented letters -> base letter), else "?"
+        decomposed = unicodedata.normalize("NFKD", char)
+        value = "".join(c for c in decomposed if ord(c) < 256 and not unicodedata.combining(c)) or "?"
+        _REPLACEMENTS[char] = value
+    return value
+
+
+def to_latin1(text: str) -> str:
+    """Removes PDF-breaking characters and transliterates to Latin-1."""
+    return _SPECIAL_RE.sub(_replace_special, text)
+
+
+def _isolate_image_tags(content: str) -> str:
+    """Puts every [[INSERT_IMAGE: ...]] tag on its own paragraph, in one split + join."""
+    pieces = _IMAGE_TAG_RE.split(content)  # text, name, text, name, ..., text
+    if len(pieces) == 1:
+        return content
+    last = len(pieces) - 1
+    output = []
+    for i in range(0, len(pieces), 2):
+        text = pieces[i]
+        if i > 0:
+            text = text.lstrip()
+        if i < last:
+            text = text.rstrip()
+            output.append(text)
+            output.append(f"\n\n[[INSERT_IMAGE: {pieces[i + 1]}]]\n\n")
+        else:
+            output.append(text)
+    return "".join(output)
+
+
+def sanitize_text_for_pdf(content: str) -> str:
+    """
+        1. Remove invisible / PDF-breaking unicode, transliterate to Latin-1
+        2. Force image tags to be isolated by newlines
+        3. Normalize whitespace
+    """
+    content = _isolate_image_tags(to_latin1(content))
+    return _BLANK_LINES_RE.sub("\n\n", content).strip()
+
@@ -21,6 +21,11 @@ from dotenv import load_dotenv, set_key
 import requests
 import tempfile
 
+try:
+  from .retrieval_cache import cache_from_env
+except ImportError:  # run as a script: python rag/shared_libraries/prepare_corpus_and_data.py
+  from retrieval_cache import cache_from_env
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -98,6 +103,10 @@ def upload_pdf_to_corpus(corpus_name, pdf_path, display_name, description):
         description=description,
     )
     print(f"Successfully uploaded {display_name} to corpus")
+    # Cached retrievals for this corpus are stale once new content is imported
+    if os.getenv("RAG_CACHE_DB_PATH"):
+      cache_from_env().invalidate_corpus(corpus_name)
+      print(f"Invalidated retrieval cache entries for {corpus_name}")
     return rag_file
   except ResourceExhausted as e:
     print(f"Error uploading file {display_name}: {e}")
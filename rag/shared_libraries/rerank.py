@@ -0,0 +1,100 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Local rerank stage for over-fetched retrieval candidates.
+
+A scorer is any callable `(query, texts) -> array of scores` (higher is
+better). The default is a lexical-overlap scorer computed as one NumPy pass
+over the candidate batch; a local cross-encoder can be plugged in with
+RAG_RERANKER="package.module:function".
+"""
+
+import importlib
+import threading
+import time
+from collections import Counter
+
+import numpy as np
+
+from .bm25 import tokenize
+
+
+def lexical_overlap_scores(query: str, texts: list) -> np.ndarray:
+    """
+    Saturated, IDF-weighted query-term overlap (BM25-style, with IDF taken
+    over the candidate batch), normalized to [0, 1].
+    """
+    terms = list(dict.fromkeys(tokenize(query)))
+    if not terms or not texts:
+        return np.zeros(len(texts), dtype=np.float32)
+    column = {term: i for i, term in enumerate(terms)}
+    tf = np.zeros((len(texts), len(terms)), dtype=np.float32)
+    lengths = np.zeros(len(texts), dtype=np.float32)
+    for row, text in enumerate(texts):
+        tokens = tokenize(text)
+        lengths[row] = len(tokens)
+        for term, count in Counter(t for t in tokens if t in column).items():
+            tf[row, column[term]] = count
+
+    df = (tf > 0).sum(axis=0)
+    idf = np.log1p((len(texts) - df + 0.5) / (df + 0.5))
+    length_norm = 1.2 * (0.25 + 0.75 * lengths / max(lengths.mean(), 1.0))
+    saturated = tf * 2.2 / (tf + length_norm[:, None])
+    return (saturated @ idf) / (2.2 * idf.sum() or 1.0)
+
+
+def _load_scorer(name: str):
+    if name == "lexical":
+        return lexical_overlap_scores
+    if ":" in name:
+        module_name, func_name = name.split(":", 1)
+        return getattr(importlib.import_module(module_name), func_name)
+    raise ValueError(f"Unknown reranker: {name}")
+
+
+class Reranker:
+    """Reorders candidate chunks and keeps the best `top_n`, recording latency."""
+
+    def __init__(self, name: str = "lexical", vector_weight: float = 0.3):
+        self.name = name
+        self.scorer = _load_scorer(name)
+        self.vector_weight = vector_weight
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "candidates": 0, "total_ms": 0.0, "max_ms": 0.0}
+
+    def rerank(self, query: str, chunks: list, top_n: int) -> list:
+        if len(chunks) <= 1:
+            return chunks[:top_n]
+        started = time.perf_counter()
+        scores = np.asarray(self.scorer(query, [c["text"] for c in chunks]), dtype=np.float32)
+        # Keep some of the first-stage signal: cosine similarity where the backend reports it
+        similarity = np.array(
+            [1.0 - c["distance"] if c.get("distance") is not None else 0.0 for c in chunks],
+            dtype=np.float32,
+        )
+        scores = scores + self.vector_weight * similarity
+        order = np.argsort(-scores, kind="stable")[:top_n]
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self._stats["calls"] += 1
+            self._stats["candidates"] += len(chunks)
+            self._stats["total_ms"] += elapsed_ms
+            self._stats["max_ms"] = max(self._stats["max_ms"], elapsed_ms)
+        return [dict(chunks[i], rerank_score=float(scores[i])) for i in order]
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["avg_ms"] = round(stats["total_ms"] / stats["calls"], 3) if stats["calls"] else 0.0
+        return stats
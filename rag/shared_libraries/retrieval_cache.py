@@ -0,0 +1,227 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Exact-match cache for ICMJE policy retrieval results.
+
+Entries are keyed by the normalized query text, the corpus name, top_k and the
+vector distance threshold. An in-memory LRU tier is always active; an optional
+SQLite tier keeps results across process restarts.
+
+invalidate_corpus() is also recorded in the SQLite tier, so an invalidation
+made by another process (e.g. the corpus preparation script) reaches running
+agents within `invalidation_poll_seconds`, together with any listeners such
+as the semantic cache.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """Lowercases and collapses whitespace so trivial variations share a key."""
+    return _WHITESPACE_RE.sub(" ", query).strip().lower()
+
+
+def make_cache_key(query: str, corpus: str, top_k: int, threshold: float) -> str:
+    raw = json.dumps(
+        [normalize_query(query), corpus or "", int(top_k), round(float(threshold), 6)]
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class RetrievalCache:
+    """
+    Two-tier (memory LRU + optional SQLite) cache for retrieved RAG chunks.
+
+    Values are lists of chunk dicts ({"source_uri", "text", "distance"}) so the
+    same entry can be reformatted or post-processed by the caller.
+    """
+
+    def __init__(self, max_entries=256, ttl_seconds=3600, db_path=None,
+                 invalidation_poll_seconds=5.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path
+        self.invalidation_poll_seconds = invalidation_poll_seconds
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "memory_hits": 0, "disk_hits": 0, "misses": 0}
+        self._invalidated = {}  # corpus -> time of its latest invalidation
+        self._invalidations_polled = 0.0
+        self._listeners = []
+        if db_path:
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+            with self._connect() as conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS retrieval_cache ("
+                    "key TEXT PRIMARY KEY, corpus TEXT, created REAL, value TEXT)"
+                )
+                conn.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_retrieval_cache_corpus "
+                    "ON retrieval_cache (corpus)"
+                )
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS retrieval_cache_invalidations ("
+                    "corpus TEXT PRIMARY KEY, invalidated_at REAL)"
+                )
+                self._invalidated = dict(conn.execute(
+                    "SELECT corpus, invalidated_at FROM retrieval_cache_invalidations"
+                ).fetchall())
+            self._invalidations_polled = time.monotonic()
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _expired(self, created: float) -> bool:
+        return bool(self.ttl_seconds) and time.time() - created > self.ttl_seconds
+
+    def get(self, key: str):
+        self._poll_invalidations()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                corpus, created, value = entry
+                if not self._expired(created):
+                    self._memory.move_to_end(key)
+                    self._stats["hits"] += 1
+                    self._stats["memory_hits"] += 1
+                    return value
+                del self._memory[key]
+
+            if self.db_path:
+                with self._connect() as conn:
+                    row = conn.execute(
+                        "SELECT corpus, created, value FROM retrieval_cache WHERE key = ?",
+                        (key,),
+                    ).fetchone()
+                    if row is not None:
+                        corpus, created, value = row
+                        if not self._expired(created):
+                            value = json.loads(value)
+                            self._remember(key, corpus, created, value)
+                            self._stats["hits"] += 1
+                            self._stats["disk_hits"] += 1
+                            return value
+                        conn.execute("DELETE FROM retrieval_cache WHERE key = ?", (key,))
+
+            self._stats["misses"] += 1
+            return None
+
+    def set(self, key: str, corpus: str, value: list, created: float | None = None) -> None:
+        """`created` keeps the original age of a value copied from another cache."""
+        created = time.time() if created is None else created
+        if self._expired(created) or created < self._invalidated.get(corpus, 0.0):
+            return
+        with self._lock:
+            self._remember(key, corpus, created, value)
+            if self.db_path:
+                with self._connect() as conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO retrieval_cache VALUES (?, ?, ?, ?)",
+                        (key, corpus, created, json.dumps(value)),
+                    )
+
+    def _remember(self, key, corpus, created, value) -> None:
+        self._memory[key] = (corpus, created, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def add_invalidation_listener(self, listener) -> None:
+        """Calls `listener(corpus)` whenever a corpus is invalidated, here or in another process."""
+        self._listeners.append(listener)
+
+    def invalidated_at(self, corpus: str) -> float:
+        """Time of the latest invalidation of `corpus` (0.0 if never)."""
+        self._poll_invalidations()
+        return self._invalidated.get(corpus, 0.0)
+
+    def invalidate_corpus(self, corpus: str) -> None:
+        """Drops every entry for a corpus, e.g. after new files are imported."""
+        invalidated_at = time.time()
+        with self._lock:
+            self._drop_corpus(corpus, invalidated_at)
+            if self.db_path:
+                with self._connect() as conn:
+                    conn.execute("DELETE FROM retrieval_cache WHERE corpus = ?", (corpus,))
+                    conn.execute(
+                        "INSERT OR REPLACE INTO retrieval_cache_invalidations VALUES (?, ?)",
+                        (corpus, invalidated_at),
+                    )
+        for listener in self._listeners:
+            listener(corpus)
+
+    def _drop_corpus(self, corpus: str, invalidated_at: float) -> None:
+        self._invalidated[corpus] = invalidated_at
+        for key in [k for k, v in self._memory.items() if v[0] == corpus]:
+            del self._memory[key]
+
+    def _poll_invalidations(self) -> None:
+        """Applies invalidations recorded by other processes, at most every poll interval."""
+        if not self.db_path or time.monotonic() - self._invalidations_polled < self.invalidation_poll_seconds:
+            return
+        invalidated = []
+        with self._lock:
+            self._invalidations_polled = time.monotonic()
+            with self._connect() as conn:
+                rows = conn.execute(
+                    "SELECT corpus, invalidated_at FROM retrieval_cache_invalidations"
+                ).fetchall()
+            for corpus, invalidated_at in rows:
+                if invalidated_at > self._invalidated.get(corpus, 0.0):
+                    self._drop_corpus(corpus, invalidated_at)
+                    invalidated.append(corpus)
+        for corpus in invalidated:
+            for listener in self._listeners:
+                listener(corpus)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            if self.db_path:
+                with self._connect() as conn:
+                    conn.execute("DELETE FROM retrieval_cache")
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._memory)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+        return stats
+
+
+def cache_from_env():
+    """Builds the cache from RAG_CACHE_* environment variables."""
+    return RetrievalCache(
+        max_entries=int(os.environ.get("RAG_CACHE_MAX_ENTRIES", "256")),
+        ttl_seconds=float(os.environ.get("RAG_CACHE_TTL_SECONDS", "3600")),
+        db_path=os.environ.get("RAG_CACHE_DB_PATH") or None,
+        invalidation_poll_seconds=float(os.environ.get("RAG_CACHE_INVALIDATION_POLL_SECONDS", "5")),
+    )
@@ -0,0 +1,135 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Embedding-similarity cache for ICMJE policy retrieval.
+
+Past query embeddings live in one preallocated float32 matrix, so a lookup is
+a single matrix-vector product over all cached queries. A cached result is
+served when the cosine similarity to a previous query in the same scope
+(corpus, top_k, threshold) is at or above the configured threshold.
+Entries expire after the same TTL as the exact-match retrieval cache and
+are dropped when their corpus is invalidated.
+"""
+
+import itertools
+import os
+import threading
+import time
+
+import numpy as np
+
+from .embeddings import get_embedding_function
+
+
+class SemanticCache:
+    """Serves cached chunks for paraphrased queries."""
+
+    def __init__(self, embed_fn, threshold=0.9, max_entries=512, ttl_seconds=3600):
+        self.embed_fn = embed_fn
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._matrix = None  # (max_entries, dim), allocated on first insert
+        self._scopes = np.full(max_entries, -1, dtype=np.int32)
+        self._last_used = np.zeros(max_entries, dtype=np.float64)
+        self._created = np.zeros(max_entries, dtype=np.float64)  # wall clock, comparable to the exact cache
+        self._values = [None] * max_entries
+        self._queries = [None] * max_entries
+        self._corpora = [None] * max_entries
+        self._scope_ids = {}
+        self._next_scope_id = itertools.count()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0}
+
+    def _embed(self, query: str) -> np.ndarray:
+        return np.asarray(self.embed_fn([query]), dtype=np.float32)[0]
+
+    def _scope_id(self, scope: str) -> int:
+        if scope not in self._scope_ids:
+            self._scope_ids[scope] = next(self._next_scope_id)
+        return self._scope_ids[scope]
+
+    def _free(self, stale: np.ndarray) -> None:
+        """Frees the slots where the boolean mask `stale` (over the first slots) is set."""
+        slots = np.flatnonzero(stale)
+        self._last_used[slots] = 0.0  # reuse these slots first
+        self._scopes[slots] = -1
+
+    def lookup(self, query: str, scope: str):
+        """Returns (value, similarity, matched_query, created) or None on a miss."""
+        with self._lock:
+            scope_id = self._scope_ids.get(scope)
+            if self._size == 0 or scope_id is None:
+                self._stats["misses"] += 1
+                return None
+        vector = self._embed(query)
+        with self._lock:
+            if self.ttl_seconds:
+                self._free(self._created[:self._size] < time.time() - self.ttl_seconds)
+            sims = self._matrix[:self._size] @ vector
+            sims[self._scopes[:self._size] != scope_id] = -np.inf
+            best = int(np.argmax(sims))
+            if sims[best] < self.threshold:
+                self._stats["misses"] += 1
+                return None
+            self._last_used[best] = time.monotonic()
+            self._stats["hits"] += 1
+            return self._values[best], float(sims[best]), self._queries[best], float(self._created[best])
+
+    def add(self, query: str, scope: str, value, corpus: str | None = None) -> None:
+        vector = self._embed(query)
+        with self._lock:
+            if self._matrix is None:
+                self._matrix = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+            if self._size < self.max_entries:
+                slot = self._size
+                self._size += 1
+            else:
+                slot = int(np.argmin(self._last_used))  # evict least recently used
+            self._matrix[slot] = vector
+            self._scopes[slot] = self._scope_id(scope)
+            self._last_used[slot] = time.monotonic()
+            self._created[slot] = time.time()
+            self._values[slot] = value
+            self._queries[slot] = query
+            self._corpora[slot] = corpus
+
+    def invalidate_scope(self, scope: str) -> None:
+        with self._lock:
+            scope_id = self._scope_ids.pop(scope, None)
+            if scope_id is not None:
+                self._free(self._scopes == scope_id)
+
+    def invalidate_corpus(self, corpus: str) -> None:
+        """Drops every entry added for `corpus` (see RetrievalCache.add_invalidation_listener)."""
+        with self._lock:
+            stale = np.array([c == corpus for c in self._corpora[:self._size]], dtype=bool)
+            self._free(stale)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats, entries=self._size)
+
+
+def semantic_cache_from_env():
+    """Returns a SemanticCache when RAG_SEMANTIC_CACHE is enabled, else None."""
+    if os.environ.get("RAG_SEMANTIC_CACHE", "false").lower() not in ("1", "true", "yes"):
+        return None
+    return SemanticCache(
+        embed_fn=get_embedding_function(),
+        threshold=float(os.environ.get("RAG_SEMANTIC_CACHE_THRESHOLD", "0.9")),
+        max_entries=int(os.environ.get("RAG_SEMANTIC_CACHE_MAX_ENTRIES", "512")),
+        ttl_seconds=float(os.environ.get("RAG_CACHE_TTL_SECONDS", "3600")),
+    )
@@ -0,0 +1,188 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Scientific-figure vs. publisher-artifact classification of PDF images.
+
+The model calls are injected: `classify_single(image_bytes)` returns the
+model's one-word verdict and `classify_batch(images)` returns the JSON text
+of a [{"index", "verdict"}] list for several images sent in one request.
+Around them this module adds the verdict cache, deduplication (within a
+call and across concurrent calls on the same event loop), request packing
+by image count and payload size, splitting of batches rejected as too
+large, and single-image fallback for images a batch answer left out.
+"""
+
+import asyncio
+import json
+import logging
+import weakref
+
+from .image_cache import sha256_hex
+
+logger = logging.getLogger(__name__)
+
+SCIENTIFIC_FIGURE = "SCIENTIFIC_FIGURE"
+VERDICTS = (SCIENTIFIC_FIGURE, "PUBLISHER_ARTIFACT")
+
+
+def pack_batches(images: list, max_count: int, max_bytes: int) -> list:
+    """Greedy packing by image count and total payload bytes."""
+    batches, current, current_bytes = [], [], 0
+    for image_bytes in images:
+        if current and (len(current) >= max_count
+                        or current_bytes + len(image_bytes) > max_bytes):
+            batches.append(current)
+            current, current_bytes = [], 0
+        current.append(image_bytes)
+        current_bytes += len(image_bytes)
+    if current:
+        batches.append(current)
+    return batches
+
+
+class VisionClassifier:
+    def __init__(self, classify_single, classify_batch, version: str, cache=None,
+                 batch_size: int = 8, batch_max_bytes: int = 12 * 1024 * 1024,
+                 is_payload_too_large=None):
+        self.classify_single = classify_single
+        self.classify_batch = classify_batch
+        self.version = version
+        self.cache = cache
+        self.batch_size = batch_size
+        self.batch_max_bytes = batch_max_bytes
+        self.is_payload_too_large = is_payload_too_large or (lambda error: False)
+        # event loop -> {sha256: future}: images being classified by any call on that loop
+        self._in_flight = weakref.WeakKeyDictionary()
+
+    async def classify_image(self, image_bytes: bytes) -> bool:
+        """Classifies one image with a single-image request, through the cache."""
+        if self.cache is not None:
+            cached = await asyncio.to_thread(self.cache.get, image_bytes, self.version)
+            if cached is not None:
+                return cached == SCIENTIFIC_FIGURE
+
+        verdict = (await self.classify_single(image_bytes)).strip().upper()
+        if self.cache is not None and verdict in VERDICTS:
+            await asyncio.to_thread(self.cache.set, image_bytes, self.version, verdict)
+        return verdict == SCIENTIFIC_FIGURE
+
+    async def classify_batch_request(self, images: list) -> list:
+        """
+        Classifies several images in ONE request, returning one bool per
+        image. Splits the batch in half when the request is rejected as too
+        large; images missing from the model's answer fall back to
+        single-image classification.
+        """
+        if len(images) == 1:
+            return [await self.classify_image(images[0])]
+
+        try:
+            answer = await self.classify_batch(images)
+        except Exception as e:
+            if not self.is_payload_too_large(e):
+                raise
+            logger.warning(f"Vision batch of {len(images)} rejected as too large ({e}), splitting")
+            middle = len(images) // 2
+            return (
+                await self.classify_batch_request(images[:middle])
+                + await self.classify_batch_request(images[middle:])
+            )
+
+        verdicts = {}
+        try:
+            for entry in json.loads(answer):
+                if 0 <= entry["index"] < len(images) and entry["verdict"] in VERDICTS:
+                    verdicts[entry["index"]] = entry["verdict"]
+        except (ValueError, KeyError, TypeError):
+            logger.warning("Vision batch returned malformed JSON, falling back to single calls")
+
+        if self.cache is not None and verdicts:
+            await asyncio.to_thread(
+                self.cache.set_many,
+                [(sha256_hex(images[index]), images[index], verdict) for index, verdict in verdicts.items()],
+                self.version,
+            )
+
+        results = []
+        for index, image_bytes in enumerate(images):
+            verdict = verdicts.get(index)
+            if verdict is None:
+                results.append(await self.classify_image(image_bytes))
+                continue
+            results.append(verdict == SCIENTIFIC_FIGURE)
+        logger.info(f"Vision batch result: {len(images)} images, {sum(results)} scientific figures")
+        return results
+
+    async def classify_many(self, images: list) -> list:
+        """
+        Classifies many images at once, packing uncached images `batch_size`
+        per request. Images already being classified by another call (e.g. a
+        parallel pipeline batch or document) are awaited instead of sent
+        again. Results are returned in the same order as `images`.
+        """
+        unique = {}
+        for image_bytes in images:
+            unique.setdefault(sha256_hex(image_bytes), image_bytes)
+
+        # One cache lookup per call, in a thread so the event loop is not blocked
+        cached = {}
+        if self.cache is not None:
+            cached = await asyncio.to_thread(self.cache.get_many, list(unique.items()), self.version)
+        verdicts = {digest: verdict == SCIENTIFIC_FIGURE for digest, verdict in cached.items()}
+
+        loop = asyncio.get_running_loop()
+        in_flight = self._in_flight.setdefault(loop, {})
+        waiting, pending = {}, {}
+        for digest, image_bytes in unique.items():
+            if digest in cached:
+                continue
+            if digest in in_flight:
+                waiting[digest] = in_flight[digest]
+            else:
+                pending[digest] = image_bytes
+                in_flight[digest] = loop.create_future()
+
+        batches = pack_batches(list(pending.values()), self.batch_size, self.batch_max_bytes)
+        try:
+            results = await asyncio.gather(*(self.classify_batch_request(batch) for batch in batches))
+            for digest, is_figure in zip(pending.keys(), (v for batch in results for v in batch), strict=True):
+                verdicts[digest] = is_figure
+                in_flight[digest].set_result(is_figure)
+        except Exception as e:
+            for digest in pending:
+                future = in_flight[digest]
+                if not future.done():
+                    future.set_exception(e)
+                    future.exception()  # retrieved, even if no other call is waiting
+            raise
+        finally:
+            for digest in pending:
+                future = in_flight.pop(digest)
+                future.cancel()  # no-op unless this call was cancelled
+
+        for digest, future in waiting.items():
+            try:
+                verdicts[digest] = await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                # The owning call was cancelled before it finished: classify here
+                verdicts[digest] = (await self.classify_many([unique[digest]]))[0]
+
+        logger.info(
+            f"Classified {len(images)} images: {len(unique)} unique, {len(pending)} sent to "
+            f"the model in {len(batches)} requests, {len(waiting)} shared with other calls"
+            + (f"; verdict cache {self.cache.stats()}" if self.cache is not None else "")
+        )
+        return [verdicts[sha256_hex(image_bytes)] for image_bytes in images]
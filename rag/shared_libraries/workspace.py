@@ -0,0 +1,294 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Per-session isolated workspaces for uploads, figures and outputs.
+
+Each ADK session gets its own directory tree under a common root:
+
+    <root>/<session id>/inputs
+    <root>/<session id>/figures
+    <root>/<session id>/outputs
+
+so concurrent sessions served by one worker never see or delete each
+other's files. Writes go to a temporary file and are renamed into place, and
+a background thread removes workspaces idle for longer than the TTL.
+
+With `in_memory=True` the manager hands out MemoryWorkspace objects instead:
+same interface, but inputs, figures and outputs are kept as bytes and
+nothing touches the filesystem.
+"""
+
+import io
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+_UNSAFE_CHARS_RE = re.compile(r"[^A-Za-z0-9._-]")
+_LAST_USED_FILE = ".last_used"
+
+
+def safe_name(name: str) -> str:
+    """Strips directories and unsafe characters from a user-supplied name."""
+    cleaned = _UNSAFE_CHARS_RE.sub("_", os.path.basename(name or "")).lstrip(".")
+    return cleaned or uuid.uuid4().hex[:8]
+
+
+def atomic_write(path: str, data: bytes) -> str:
+    """Writes `data` so readers see either the old file or the complete new one."""
+    tmp_path = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.{uuid.uuid4().hex}.tmp")
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return path
+
+
+class Workspace:
+    def __init__(self, root: str, workspace_id: str):
+        self.id = workspace_id
+        self.path = os.path.join(root, workspace_id)
+        self.input_dir = os.path.join(self.path, "inputs")
+        self.image_dir = os.path.join(self.path, "figures")
+        self.output_dir = os.path.join(self.path, "outputs")
+        for d in (self.input_dir, self.image_dir, self.output_dir):
+            os.makedirs(d, exist_ok=True)
+        self.touch()
+
+    def touch(self) -> None:
+        with open(os.path.join(self.path, _LAST_USED_FILE), "w") as f:
+            f.write(str(time.time()))
+
+    def input_path(self, name: str) -> str:
+        return os.path.join(self.input_dir, safe_name(name))
+
+    def input_source(self, name: str):
+        """Path of the input, or None if it does not exist."""
+        path = self.input_path(name)
+        return path if os.path.exists(path) else None
+
+    def figure_source(self, name: str):
+        """Path of the figure, or None if it does not exist."""
+        path = self.image_path(name)
+        return path if os.path.exists(path) else None
+
+    def image_path(self, name: str) -> str:
+        return os.path.join(self.image_dir, safe_name(name))
+
+    def output_path(self, name: str) -> str:
+        return os.path.join(self.output_dir, safe_name(name))
+
+    def write_input(self, name: str, data: bytes) -> str:
+        self.touch()
+        return atomic_write(self.input_path(name), data)
+
+    def link_input(self, name: str, source_path: str) -> str:
+        """Exposes an existing file as an input via a hard link (copy if linking fails)."""
+        self.touch()
+        path = self.input_path(name)
+        tmp_path = os.path.join(self.input_dir, f".{os.path.basename(path)}.{uuid.uuid4().hex}.tmp")
+        try:
+            os.link(source_path, tmp_path)
+        except OSError:
+            shutil.copyfile(source_path, tmp_path)
+        os.replace(tmp_path, path)
+        os.utime(path)  # list_inputs orders by mtime; a re-upload counts as newest
+        return path
+
+    def write_figure(self, name: str, data: bytes) -> str:
+        return atomic_write(self.image_path(name), data)
+
+    def write_output(self, name: str, data: bytes) -> str:
+        self.touch()
+        return atomic_write(self.output_path(name), data)
+
+    def list_inputs(self, extension: str | None = None) -> list:
+        """Input filenames, most recently written first."""
+        names = [n for n in os.listdir(self.input_dir) if not n.startswith(".")]
+        if extension:
+            names = [n for n in names if n.lower().endswith(extension)]
+        return sorted(names, key=lambda n: os.path.getmtime(os.path.join(self.input_dir, n)), reverse=True)
+
+    def list_figures(self) -> list:
+        return sorted(n for n in os.listdir(self.image_dir) if not n.startswith("."))
+
+    def clear_figures(self) -> None:
+        for name in os.listdir(self.image_dir):
+            os.remove(os.path.join(self.image_dir, name))
+
+
+class MemoryWorkspace:
+    """Workspace whose files only live in process memory, as bytes."""
+
+    def __init__(self, workspace_id: str):
+        self.id = workspace_id
+        self.inputs = {}
+        self.figures = {}
+        self.outputs = {}
+        self._lock = threading.Lock()
+        self.touch()
+
+    def touch(self) -> None:
+        self.last_used = time.time()
+
+    def _put(self, store: dict, name: str, data: bytes) -> str:
+        name = safe_name(name)
+        with self._lock:
+            store.pop(name, None)  # re-insert so iteration order follows write time
+            store[name] = bytes(data)
+        return f"memory://{self.id}/{name}"
+
+    def write_input(self, name: str, data: bytes) -> str:
+        self.touch()
+        return self._put(self.inputs, name, data)
+
+    def write_figure(self, name: str, data: bytes) -> str:
+        return self._put(self.figures, name, data)
+
+    def write_output(self, name: str, data: bytes) -> str:
+        self.touch()
+        return self._put(self.outputs, name, data)
+
+    def input_source(self, name: str):
+        """Input bytes, or None if there is no such input."""
+        return self.inputs.get(safe_name(name))
+
+    def figure_source(self, name: str):
+        """File-like object with the figure bytes, or None."""
+        data = self.figures.get(safe_name(name))
+        return io.BytesIO(data) if data is not None else None
+
+    def list_inputs(self, extension: str | None = None) -> list:
+        """Input names, most recently written first."""
+        with self._lock:
+            names = list(reversed(self.inputs))
+        return [n for n in names if not extension or n.lower().endswith(extension)]
+
+    def list_figures(self) -> list:
+        with self._lock:
+            return sorted(self.figures)
+
+    def clear_figures(self) -> None:
+        with self._lock:
+            self.figures.clear()
+
+
+class WorkspaceManager:
+    """Hands out workspaces by id and garbage-collects expired ones."""
+
+    def __init__(self, root: str, ttl_seconds: float = 86400, gc_interval_seconds: float = 600,
+                 in_memory: bool = False):
+        self.root = root
+        self.ttl_seconds = ttl_seconds
+        self.gc_interval_seconds = gc_interval_seconds
+        self.in_memory = in_memory
+        self._workspaces = {}
+        self._lock = threading.Lock()
+        self._gc_thread = None
+        self._gc_hooks = []
+        self._stop = threading.Event()
+        if not in_memory:
+            os.makedirs(root, exist_ok=True)
+
+    def get(self, workspace_id: str):
+        workspace_id = safe_name(workspace_id)
+        with self._lock:
+            workspace = self._workspaces.get(workspace_id)
+            if self.in_memory:
+                if workspace is None:
+                    workspace = MemoryWorkspace(workspace_id)
+                    self._workspaces[workspace_id] = workspace
+            elif workspace is None or not os.path.isdir(workspace.path):
+                workspace = Workspace(self.root, workspace_id)
+                self._workspaces[workspace_id] = workspace
+            workspace.touch()
+            return workspace
+
+    def _expired(self, path: str) -> bool:
+        marker = os.path.join(path, _LAST_USED_FILE)
+        try:
+            last_used = os.path.getmtime(marker if os.path.exists(marker) else path)
+        except FileNotFoundError:
+            return False
+        return time.time() - last_used > self.ttl_seconds
+
+    def collect_garbage(self) -> int:
+        """Deletes workspaces idle for longer than the TTL. Returns how many."""
+        if self.in_memory:
+            cutoff = time.time() - self.ttl_seconds
+            with self._lock:
+                expired = [i for i, w in self._workspaces.items() if w.last_used < cutoff]
+                for workspace_id in expired:
+                    del self._workspaces[workspace_id]
+            if expired:
+                logger.info(f"Workspace GC removed {len(expired)} expired in-memory workspaces")
+            return len(expired)
+
+        removed = 0
+        for workspace_id in os.listdir(self.root):
+            path = os.path.join(self.root, workspace_id)
+            if not os.path.isdir(path) or not self._expired(path):
+                continue
+            with self._lock:
+                # get() may have touched the workspace since the unlocked check
+                if not self._expired(path):
+                    continue
+                self._workspaces.pop(workspace_id, None)
+                shutil.rmtree(path, ignore_errors=True)
+            removed += 1
+        if removed:
+            logger.info(f"Workspace GC removed {removed} expired workspaces")
+        return removed
+
+    def add_gc_hook(self, hook) -> None:
+        """Runs `hook()` after every periodic collection, e.g. to expire shared caches."""
+        self._gc_hooks.append(hook)
+
+    def start_gc(self) -> None:
+        if self._gc_thread is not None:
+            return
+
+        def loop():
+            while not self._stop.wait(self.gc_interval_seconds):
+                for task in (self.collect_garbage, *self._gc_hooks):
+                    try:
+                        task()
+                    except Exception as e:
+                        logger.warning(f"Workspace GC failed in {getattr(task, '__qualname__', task)}: {e}")
+
+        self._gc_thread = threading.Thread(target=loop, name="workspace-gc", daemon=True)
+        self._gc_thread.start()
+
+    def stop_gc(self) -> None:
+        self._stop.set()
+
+
+def workspace_id_from_context(tool_context) -> str:
+    """Session id of the ADK tool context, falling back to the invocation id."""
+    session = getattr(tool_context, "session", None)
+    if session is None:
+        invocation_context = getattr(tool_context, "_invocation_context", None)
+        session = getattr(invocation_context, "session", None)
+    if session is not None and getattr(session, "id", None):
+        return session.id
+    return tool_context.invocation_id
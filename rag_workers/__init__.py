@@ -0,0 +1,21 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Entry points for worker processes started by the agent.
+
+Workers started with spawn or forkserver import the module of the function
+they run. Importing anything under `rag` runs rag/__init__.py, which
+resolves Google credentials and builds the agent, so worker code lives in
+this separate top-level package and never imports `rag`.
+"""
@@ -0,0 +1,88 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""PDF image scanning and decoding, shared by the agent and its workers.
+
+rag.shared_libraries.pdf_images builds the filtering and sharding on top of
+these primitives. `scan_shard` and `extract_shard` run in worker processes:
+each opens the document itself, so only the source (path or bytes), page
+ranges and results cross the process boundary.
+"""
+
+import os
+
+FILTER_NAMES = ("duplicate_xref", "running_header", "too_small", "bad_aspect_ratio", "too_few_bytes")
+
+
+def new_filter_report() -> dict:
+    return dict.fromkeys(("references", *FILTER_NAMES, "candidates"), 0)
+
+
+def open_pdf(source):
+    """Opens a PDF from a path or, without touching disk, from its bytes."""
+    import fitz
+
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return fitz.open(stream=source, filetype="pdf")
+    return fitz.open(source)
+
+
+def source_size(source) -> int:
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return len(source)
+    return os.path.getsize(source)
+
+
+def scan_image_references(doc, page_range=None) -> dict:
+    """
+    Maps each image xref to {"pages": [...], "width", "height"} for the pages
+    in `page_range` (0-based, default: whole document), in page order.
+    """
+    references = {}
+    for page_index in page_range if page_range is not None else range(doc.page_count):
+        for img in doc[page_index].get_images(full=True):
+            xref, _, width, height = img[:4]
+            ref = references.setdefault(xref, {"pages": [], "width": width, "height": height})
+            ref["pages"].append(page_index + 1)
+    return references
+
+
+def iter_extracted(doc, xrefs: list, references: dict, config: dict, report: dict):
+    """Decodes the selected xrefs in order, applying the byte-size filter."""
+    for xref in xrefs:
+        base_image = doc.extract_image(xref)
+        if not base_image or len(base_image["image"]) < config["min_bytes"]:
+            report["too_few_bytes"] += 1
+            continue
+        report["candidates"] += 1
+        yield {
+            "xref": xref,
+            "page": references[xref]["pages"][0],
+            "image": base_image["image"],
+            "ext": base_image.get("ext", "png"),
+            "width": base_image.get("width"),
+            "height": base_image.get("height"),
+        }
+
+
+def scan_shard(source, start: int, end: int) -> dict:
+    with open_pdf(source) as doc:
+        return scan_image_references(doc, range(start, min(end, doc.page_count)))
+
+
+def extract_shard(source, xrefs: list, references: dict, config: dict):
+    report = new_filter_report()
+    with open_pdf(source) as doc:
+        candidates = list(iter_extracted(doc, xrefs, references, config, report))
+    return candidates, report
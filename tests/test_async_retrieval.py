@@ -0,0 +1,108 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from rag.shared_libraries.async_retrieval import (
+    merge_batched_contexts,
+    retrieve_many,
+    run_with_timeout,
+)
+from rag.shared_libraries.context_assembly import ContextAssembler
+
+AUTHORSHIP = {"source_uri": "icmje.pdf", "text": "Authors must meet all four ICMJE authorship criteria listed here.", "distance": 0.1}
+DISCLOSURE = {"source_uri": "icmje.pdf", "text": "All authors disclose financial relationships with the ICMJE form.", "distance": 0.2}
+
+
+@pytest.mark.asyncio
+async def test_run_with_timeout_returns_the_result():
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        assert await run_with_timeout(executor, lambda q, k: [q] * k, "authorship", 2, timeout=1) == [
+            "authorship", "authorship",
+        ]
+
+
+@pytest.mark.asyncio
+async def test_run_with_timeout_cancels_queued_calls_without_blocking_the_loop():
+    release = threading.Event()
+    calls = []
+
+    def retrieve(query):
+        calls.append(query)
+        release.wait(5)
+        return [query]
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        running = asyncio.ensure_future(run_with_timeout(executor, retrieve, "running", timeout=5))
+        await asyncio.sleep(0.05)
+        started = time.monotonic()
+        with pytest.raises(TimeoutError, match=r"timed out after 0\.1s"):
+            await run_with_timeout(executor, retrieve, "queued", timeout=0.1)
+        assert time.monotonic() - started < 1
+        release.set()
+        assert await running == ["running"]
+    assert calls == ["running"]
+
+
+@pytest.mark.asyncio
+async def test_retrieve_many_keeps_query_order_and_bounds_concurrency():
+    in_flight, peak = 0, 0
+
+    async def retrieve(query):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01 if query == "slow" else 0)
+        in_flight -= 1
+        return [query]
+
+    queries = ["slow", "a", "b", "c", "d"]
+    assert await retrieve_many(queries, retrieve, concurrency=2) == [[q] for q in queries]
+    assert peak == 2
+
+
+@pytest.mark.asyncio
+async def test_retrieve_many_returns_failures_in_place():
+    async def retrieve(query):
+        if query == "broken":
+            raise TimeoutError("ICMJE policy retrieval timed out after 20s")
+        if query == "cancelled":
+            raise asyncio.CancelledError()
+        return [AUTHORSHIP]
+
+    results = await retrieve_many(["authorship", "broken", "cancelled"], retrieve, concurrency=4)
+    assert results[0] == [AUTHORSHIP]
+    assert isinstance(results[1], TimeoutError)
+    assert isinstance(results[2], asyncio.CancelledError)
+
+
+def test_merge_groups_by_query_and_reports_failures():
+    results = [[AUTHORSHIP], TimeoutError("timed out after 20s"), asyncio.CancelledError(), [AUTHORSHIP], [DISCLOSURE], []]
+    queries = ["authorship", "registration", "data sharing", "contributors", "disclosure", "preprints"]
+    context, tokens_saved = merge_batched_contexts(queries, results, ContextAssembler(token_budget=500))
+
+    sections = context.split("## ")[1:]
+    assert [s.splitlines()[0] for s in sections] == queries
+    assert AUTHORSHIP["text"] in sections[0]
+    assert "Retrieval failed: timed out after 20s" in sections[1]
+    assert "Retrieval failed: cancelled" in sections[2]
+    assert "Same policy text as an earlier section above." in sections[3]
+    assert DISCLOSURE["text"] in sections[4]
+    assert "No specific ICMJE policy found in RAG." in sections[5]
+    assert tokens_saved > 0
@@ -0,0 +1,70 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import time
+
+from rag.shared_libraries.blob_store import BlobStore
+from rag.shared_libraries.workspace import WorkspaceManager
+
+
+def _age(path, seconds: float) -> None:
+    stale = time.time() - seconds
+    os.utime(path, (stale, stale))
+
+
+def _age_uploads(store: BlobStore, seconds: float) -> None:
+    with store._connect() as conn:
+        conn.execute("UPDATE uploads SET uploaded_at = ?", (time.time() - seconds,))
+
+
+def test_put_deduplicates_by_content(tmp_path):
+    store = BlobStore(str(tmp_path))
+    first, created = store.put("a.pdf", b"%PDF-1")
+    assert created
+    second, created = store.put("renamed.pdf", b"%PDF-1")
+    assert (second, created) == (first, False)
+    assert store.stats() == {"stored": 1, "deduplicated": 1, "collected": 0}
+
+
+def test_collect_garbage_keeps_recent_and_linked_blobs(tmp_path):
+    store = BlobStore(str(tmp_path / "blobs"), max_age_seconds=60)
+    workspaces = WorkspaceManager(str(tmp_path / "workspaces"), ttl_seconds=60)
+    linked, _ = store.put("linked.pdf", b"linked")
+    orphan, _ = store.put("orphan.pdf", b"orphan")
+    workspace = workspaces.get("session")
+    workspace.link_input("linked.pdf", store.path(linked))
+    _age_uploads(store, 120)
+    for sha256 in (linked, orphan):
+        _age(store.path(sha256), 120)
+
+    assert store.collect_garbage() == 1
+    assert not os.path.exists(store.path(orphan))
+    assert os.path.exists(store.path(linked))
+
+    # Once the workspace is collected, nothing links the blob any more
+    _age(os.path.join(workspace.path, ".last_used"), 120)
+    workspaces.collect_garbage()
+    assert store.collect_garbage() == 1
+    assert not os.path.exists(store.path(linked))
+
+
+def test_collect_garbage_drops_blobs_whose_name_moved(tmp_path):
+    store = BlobStore(str(tmp_path), max_age_seconds=60)
+    old, _ = store.put("paper.pdf", b"v1")
+    new, _ = store.put("paper.pdf", b"v2")
+    _age(store.path(old), 120)
+    assert store.collect_garbage() == 1
+    assert not os.path.exists(store.path(old))
+    assert os.path.exists(store.path(new))
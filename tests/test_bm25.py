@@ -0,0 +1,62 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from rag.shared_libraries.bm25 import BM25Index, reciprocal_rank_fusion, tokenize
+
+CHUNKS = [
+    {"source_uri": "icmje.pdf", "text": "Trials must be registered at clinicaltrials.gov before enrollment."},
+    {"source_uri": "icmje.pdf", "text": "Authors should disclose conflicts of interest using the ICMJE form."},
+    {"source_uri": "icmje.pdf", "text": "A data sharing statement is required for clinical trial reports."},
+    {"source_uri": "icmje.pdf", "text": "Each co-author must approve the final version of the manuscript."},
+]
+
+
+def chunk(text):
+    return {"source_uri": "icmje.pdf", "text": text}
+
+
+def test_tokenize_keeps_compound_terms_and_their_parts():
+    assert tokenize("Registered at ClinicalTrials.gov by a co-author") == [
+        "registered", "at", "clinicaltrials.gov", "clinicaltrials", "gov", "by", "a", "co-author", "co", "author",
+    ]
+
+
+def test_search_ranks_exact_terms_first():
+    index = BM25Index.build(CHUNKS)
+    results = index.search("clinicaltrials.gov registration", top_k=2)
+    assert results[0][0] is CHUNKS[0]
+    assert index.search("conflicts of interest", top_k=1)[0][0] is CHUNKS[1]
+    assert index.search("unrelated zebra", top_k=3) == []
+
+
+def test_save_and_load_round_trip(tmp_path):
+    path = str(tmp_path / "bm25.json")
+    BM25Index.build(CHUNKS).save(path)
+    loaded = BM25Index.load(path)
+    assert loaded.search("data sharing statement", top_k=1)[0][0] == CHUNKS[2]
+
+
+def test_rrf_rewards_chunks_ranked_by_both():
+    vector = [dict(chunk("a"), distance=0.1), chunk("b"), chunk("c")]
+    lexical = [chunk("c"), chunk("d"), chunk("a")]
+    fused = reciprocal_rank_fusion([vector, lexical], top_k=4, k=60)
+    assert [c["text"] for c in fused] == ["a", "c", "b", "d"]
+    assert fused[0]["distance"] == 0.1  # first copy's metadata is kept
+
+
+def test_rrf_matches_chunks_by_normalized_text_only():
+    fused = reciprocal_rank_fusion([[chunk("same  text\n")], [chunk("same text")]], top_k=5)
+    assert len(fused) == 1
+    fused = reciprocal_rank_fusion([[chunk("vertex chunk")], [chunk("local window")]], top_k=5)
+    assert len(fused) == 2
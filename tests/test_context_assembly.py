@@ -0,0 +1,78 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from rag.shared_libraries.context_assembly import (
+    ContextAssembler,
+    estimate_tokens,
+    minhash_signature,
+)
+
+AUTHORSHIP = (
+    "The ICMJE recommends that authorship be based on the following four criteria: substantial "
+    "contributions to the conception or design of the work, drafting the work or revising it critically "
+    "for important intellectual content, final approval of the version to be published, and agreement "
+    "to be accountable for all aspects of the work."
+)
+REGISTRATION = (
+    "The ICMJE requires, and recommends, that all medical journal editors require registration of "
+    "clinical trials in a public trials registry at or before the time of first patient enrollment."
+)
+DATA_SHARING = (
+    "Manuscripts submitted to ICMJE journals that report the results of clinical trials must contain "
+    "a data sharing statement as described in the section on data sharing."
+)
+
+
+def chunk(text, source="icmje.pdf"):
+    return {"source_uri": source, "text": text}
+
+
+def test_minhash_near_duplicates_are_similar():
+    a = minhash_signature(AUTHORSHIP)
+    b = minhash_signature(AUTHORSHIP.replace("four", "4"))
+    c = minhash_signature(REGISTRATION)
+    assert (a == b).mean() > 0.7
+    assert (a == c).mean() < 0.2
+
+
+def test_duplicates_removed_within_and_across_calls():
+    assembler = ContextAssembler(token_budget=0)
+    context, report = assembler.assemble([chunk(AUTHORSHIP), chunk(AUTHORSHIP + " ")])
+    assert report["duplicates_removed"] == 1
+    assert context.count("four criteria") == 1
+    _, report = assembler.assemble([chunk(AUTHORSHIP), chunk(REGISTRATION)])
+    assert report["duplicates_removed"] == 1 and report["blocks_out"] == 1
+
+
+def test_overlapping_windows_of_one_source_are_stitched():
+    words = AUTHORSHIP.split()
+    first, second = " ".join(words[:30]), " ".join(words[20:])
+    context, report = ContextAssembler(token_budget=0).assemble([chunk(second), chunk(first)])
+    assert report["blocks_out"] == 1
+    assert " ".join(context.split()[3:]) == AUTHORSHIP  # after "[ICMJE SOURCE: icmje.pdf]"
+
+
+def test_unrelated_chunks_of_one_source_keep_rank_order():
+    chunks = [chunk(REGISTRATION), chunk(AUTHORSHIP, source="other.pdf"), chunk(DATA_SHARING)]
+    context, report = ContextAssembler(token_budget=0).assemble(chunks)
+    assert report["blocks_out"] == 3
+    assert context.index("registration of clinical") < context.index("four criteria") < context.index("data sharing statement")
+
+
+def test_token_budget_trims_the_last_block():
+    chunks = [chunk(AUTHORSHIP * 3), chunk(REGISTRATION * 3), chunk(DATA_SHARING * 3)]
+    context, report = ContextAssembler(token_budget=200).assemble(chunks)
+    assert estimate_tokens(context) <= 200
+    assert context.rstrip().endswith("...")
+    assert report["tokens_saved"] > 0
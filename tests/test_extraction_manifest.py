@@ -0,0 +1,64 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import time
+
+from rag.shared_libraries.extraction_manifest import (
+    ExtractionManifestStore,
+    classifier_version,
+    manifest_store_from_env,
+)
+
+FIGURES = [{"name": "figure1.png", "page": 2, "data": b"figure-1"}, {"name": "figure2.png", "page": 5, "data": b"figure-2"}]
+
+
+def test_manifest_round_trip_per_version(tmp_path):
+    store = ExtractionManifestStore(str(tmp_path))
+    version = classifier_version("model", "prompt", 1)
+    store.put("doc", version, FIGURES, filter_report={"candidates": 2})
+    manifest = store.get("doc", version)
+    assert [store.figure_bytes(f) for f in manifest["figures"]] == [b"figure-1", b"figure-2"]
+    assert manifest["filter_report"] == {"candidates": 2}
+    assert store.get("doc", classifier_version("model", "prompt", 2)) is None
+
+
+def test_collect_garbage_expires_unused_manifests_and_their_figures(tmp_path):
+    store = ExtractionManifestStore(str(tmp_path), max_age_seconds=60)
+    store.put("old", "v1", FIGURES[:1])
+    store.put("used", "v1", FIGURES[1:])
+    stale = time.time() - 120
+    with store._connect() as conn:
+        conn.execute("UPDATE manifests SET last_used = ?", (stale,))
+    for directory, _, names in os.walk(tmp_path / "figures"):
+        for name in names:
+            os.utime(os.path.join(directory, name), (stale, stale))
+    assert store.get("used", "v1") is not None  # a hit counts as use
+
+    assert store.collect_garbage() == 1
+    assert store.get("old", "v1") is None
+    manifest = store.get("used", "v1")
+    assert store.figure_bytes(manifest["figures"][0]) == b"figure-2"
+    remaining = [name for _, _, names in os.walk(tmp_path / "figures") for name in names]
+    assert remaining == [manifest["figures"][0]["sha256"]]
+
+
+def test_blank_enabled_setting_uses_the_default(tmp_path, monkeypatch):
+    monkeypatch.setenv("EXTRACTION_MANIFEST_ENABLED", " ")
+    assert manifest_store_from_env(str(tmp_path)) is not None
+    assert manifest_store_from_env(str(tmp_path), enabled_by_default=False) is None
+    monkeypatch.setenv("EXTRACTION_MANIFEST_ENABLED", "false")
+    assert manifest_store_from_env(str(tmp_path)) is None
+    monkeypatch.setenv("EXTRACTION_MANIFEST_ENABLED", "TRUE")
+    assert manifest_store_from_env(str(tmp_path), enabled_by_default=False) is not None
@@ -0,0 +1,113 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import random
+
+import pytest
+
+from rag.shared_libraries.figure_pipeline import run_figure_pipeline
+
+
+def _candidates(count: int):
+    return [{"page": i + 1, "image": bytes([i % 256]) * 16} for i in range(count)]
+
+
+def _is_figure(image: bytes) -> bool:
+    return image[0] % 3 != 0
+
+
+@pytest.mark.asyncio
+async def test_figures_numbered_in_page_order_despite_out_of_order_classification():
+    rng = random.Random(0)
+
+    async def classify(images):
+        await asyncio.sleep(rng.random() / 100)
+        return [_is_figure(image) for image in images]
+
+    written = []
+
+    def write(number, candidate):
+        written.append((number, candidate["page"]))
+        return f"figure{number}"
+
+    figures, timings = await run_figure_pipeline(
+        lambda: iter(_candidates(50)), classify, write,
+        classifier_workers=4, writer_workers=2, batch_size=3, queue_size=4, max_in_flight=8,
+    )
+    expected_pages = [c["page"] for c in _candidates(50) if _is_figure(c["image"])]
+    assert [page for _, page in sorted(written)] == expected_pages
+    assert [(number, candidate["page"], path) for number, candidate, path in figures] == [
+        (number, page, f"figure{number}") for number, page in enumerate(expected_pages, start=1)
+    ]
+    assert timings["classify"]["items"] == 50
+    assert timings["write"]["items"] == len(expected_pages)
+
+
+@pytest.mark.asyncio
+async def test_in_flight_window_bounds_extraction():
+    extracted = []
+    classified = []
+
+    def candidates():
+        for candidate in _candidates(40):
+            extracted.append(candidate["page"])
+            yield candidate
+
+    async def classify(images):
+        await asyncio.sleep(0.001)
+        # Never more than max_in_flight candidates extracted ahead of the sequencer
+        assert len(extracted) - len(classified) <= 5 + len(images)
+        classified.extend(images)
+        return [False] * len(images)
+
+    figures, _ = await run_figure_pipeline(
+        candidates, classify, lambda number, candidate: "", batch_size=2, max_in_flight=5,
+    )
+    assert figures == []
+    assert len(classified) == 40
+
+
+@pytest.mark.asyncio
+async def test_classifier_error_propagates():
+    async def classify(images):
+        raise RuntimeError("vision quota exhausted")
+
+    with pytest.raises(RuntimeError, match="vision quota exhausted"):
+        await asyncio.wait_for(
+            run_figure_pipeline(lambda: iter(_candidates(100)), classify, lambda n, c: "", max_in_flight=4),
+            timeout=10,
+        )
+
+
+@pytest.mark.asyncio
+async def test_extractor_and_writer_errors_propagate():
+    def broken_candidates():
+        yield from _candidates(3)
+        raise ValueError("corrupt xref")
+
+    async def classify(images):
+        return [True] * len(images)
+
+    with pytest.raises(ValueError, match="corrupt xref"):
+        await asyncio.wait_for(run_figure_pipeline(broken_candidates, classify, lambda n, c: ""), timeout=10)
+
+    def write(number, candidate):
+        raise OSError("disk full")
+
+    with pytest.raises(OSError, match="disk full"):
+        await asyncio.wait_for(
+            run_figure_pipeline(lambda: iter(_candidates(30)), classify, write, max_in_flight=4),
+            timeout=10,
+        )
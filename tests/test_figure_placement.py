@@ -0,0 +1,112 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import re
+import time
+
+from rag.shared_libraries.figure_placement import (
+    caption_anchors,
+    image_tag,
+    number_images,
+    place_figures,
+)
+
+
+def _legacy_inject(content: str, image_names: list) -> str:
+    """The previous regex loop, the reference for output and speed."""
+    for i, img in enumerate(sorted(image_names), start=1):
+        tag = f"[[INSERT_IMAGE: {img}]]"
+        pattern = rf"(Figure {i}:[^\n]+(?:\n(?!Figure \d:).+)*)"
+        match = re.search(pattern, content, re.IGNORECASE)
+        if match:
+            block = match.group(1)
+            if tag not in block:
+                content = content.replace(block, f"{block}\n\n{tag}", 1)
+        else:
+            content += f"\n\n{tag}\n"
+    return content
+
+
+def _synthetic_document(figures: int, paragraphs_per_figure: int = 6) -> str:
+    paragraph = (
+        "Mean arterial pressure was recorded every five minutes and compared between groups "
+        "using a mixed-effects model with patient as a random effect.\n"
+    )
+    sections = []
+    for number in range(1, figures + 1):
+        sections.append(paragraph * paragraphs_per_figure)
+        sections.append(
+            f"Figure {number}: Kaplan-Meier estimate of the primary endpoint in cohort {number}.\n"
+            "Shaded areas show 95% confidence intervals; numbers at risk are shown below.\n\n"
+        )
+    return "".join(sections)
+
+
+def test_number_images_uses_file_numbers_numerically():
+    assert number_images(["figure10.png", "figure2.jpg", "figure1.png"]) == [
+        (1, "figure1.png"), (2, "figure2.jpg"), (10, "figure10.png"),
+    ]
+
+
+def test_tags_follow_the_whole_caption_block():
+    content = (
+        "Intro.\n"
+        "Figure 1: Study flow.\nContinued caption line.\n\n"
+        "Body text.\n"
+        "Figure 2: Outcomes.\n"
+        "Figure 1: repeated reference is ignored.\n"
+    )
+    placed = place_figures(content, ["figure2.png", "figure1.png"])
+    assert placed == (
+        "Intro.\n"
+        "Figure 1: Study flow.\nContinued caption line.\n\n[[INSERT_IMAGE: figure1.png]]\n\n"
+        "Body text.\n"
+        "Figure 2: Outcomes.\n\n[[INSERT_IMAGE: figure2.png]]\n"
+        "Figure 1: repeated reference is ignored.\n"
+    )
+
+
+def test_uncaptioned_images_are_appended_and_existing_tags_kept():
+    content = "Figure 1: Flow.\n\n[[INSERT_IMAGE: figure1.png]]\n\nText."
+    placed = place_figures(content, ["figure1.png", "figure3.png"])
+    assert placed == content + "\n\n[[INSERT_IMAGE: figure3.png]]\n"
+    assert place_figures(placed, ["figure1.png", "figure3.png"]) == placed
+
+
+def test_matches_legacy_placement_on_simple_documents():
+    document = _synthetic_document(9)
+    names = [f"figure{n}.png" for n in range(1, 10)]
+    assert len(caption_anchors(document)) == 9
+    assert place_figures(document, names) == _legacy_inject(document, names)
+
+
+if __name__ == "__main__":
+    # Benchmark with hundreds of figures: python -m tests.test_figure_placement
+    for figures in (50, 200, 500):
+        document = _synthetic_document(figures)
+        names = [f"figure{n}.png" for n in range(1, figures + 1)]
+
+        started = time.perf_counter()
+        placed = place_figures(document, names)
+        engine_ms = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        _legacy_inject(document, names)
+        legacy_ms = (time.perf_counter() - started) * 1000
+
+        after_caption = sum(f"in cohort {n}.\n" in placed.split(image_tag(f"figure{n}.png"))[0][-300:]
+                            for n in range(1, figures + 1))
+        print(f"{figures} figures, {len(document):,} chars: legacy {legacy_ms:9.2f} ms, "
+              f"engine {engine_ms:7.2f} ms ({legacy_ms / engine_ms:.0f}x); "
+              f"{after_caption}/{figures} tags directly after their caption")
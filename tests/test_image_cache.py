@@ -0,0 +1,103 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import io
+
+import numpy as np
+from PIL import Image
+
+from rag.shared_libraries.image_cache import (
+    ImageVerdictCache,
+    image_cache_from_env,
+    perceptual_hash,
+    sha256_hex,
+)
+
+
+def _png(seed: int, size: int = 64) -> bytes:
+    pixels = np.random.default_rng(seed).integers(0, 256, (size, size), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels, "L").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def _jpeg(png: bytes) -> bytes:
+    buffer = io.BytesIO()
+    Image.open(io.BytesIO(png)).save(buffer, format="JPEG", quality=95)
+    return buffer.getvalue()
+
+
+def test_undecodable_bytes_fall_back_to_exact_matching(tmp_path):
+    assert perceptual_hash(b"%PDF-1.7 not an image") is None
+    cache = ImageVerdictCache(str(tmp_path / "verdicts.db"))
+    cache.set(b"%PDF-1.7 not an image", "v1", "PUBLISHER_ARTIFACT")
+    assert cache.get(b"%PDF-1.7 not an image", "v1") == "PUBLISHER_ARTIFACT"
+
+
+def test_exact_hit_per_classifier(tmp_path):
+    cache = ImageVerdictCache(str(tmp_path / "verdicts.db"), use_phash=False)
+    image = _png(1)
+    cache.set(image, "v1", "SCIENTIFIC_FIGURE")
+    assert cache.get(image, "v1") == "SCIENTIFIC_FIGURE"
+    assert cache.get(image, "v2") is None
+    assert cache.stats() == {"exact_hits": 1, "phash_hits": 0, "misses": 1}
+
+
+def test_get_many_mixes_exact_and_phash_hits(tmp_path):
+    cache = ImageVerdictCache(str(tmp_path / "verdicts.db"))
+    figure, logo, unknown = _png(1), _png(2), _png(3)
+    cache.set_many([(sha256_hex(figure), figure, "SCIENTIFIC_FIGURE"), (sha256_hex(logo), logo, "PUBLISHER_ARTIFACT")], "v1")
+
+    reencoded = _jpeg(logo)
+    hits = cache.get_many(
+        [(sha256_hex(figure), figure), (sha256_hex(reencoded), reencoded), (sha256_hex(unknown), unknown)],
+        "v1",
+    )
+    assert hits == {sha256_hex(figure): "SCIENTIFIC_FIGURE", sha256_hex(reencoded): "PUBLISHER_ARTIFACT"}
+    assert cache.stats() == {"exact_hits": 1, "phash_hits": 1, "misses": 1}
+
+
+def test_phash_index_follows_writes_and_restarts(tmp_path):
+    db_path = str(tmp_path / "verdicts.db")
+    cache = ImageVerdictCache(db_path)
+    first, second = _png(1), _png(2)
+    cache.set(first, "v1", "SCIENTIFIC_FIGURE")
+    assert cache.get(_jpeg(first), "v1") == "SCIENTIFIC_FIGURE"
+    # Added after the in-memory index was loaded
+    cache.set(second, "v1", "PUBLISHER_ARTIFACT")
+    assert cache.get(_jpeg(second), "v1") == "PUBLISHER_ARTIFACT"
+
+    assert ImageVerdictCache(db_path).get(_jpeg(second), "v1") == "PUBLISHER_ARTIFACT"
+
+
+def test_eviction_drops_least_recently_used(tmp_path):
+    cache = ImageVerdictCache(str(tmp_path / "verdicts.db"), max_entries=2)
+    images = [_png(seed) for seed in range(3)]
+    cache.set(images[0], "v1", "PUBLISHER_ARTIFACT")
+    cache.set(images[1], "v1", "PUBLISHER_ARTIFACT")
+    cache.get(images[0], "v1")
+    cache.set(images[2], "v1", "PUBLISHER_ARTIFACT")
+    assert cache.get(images[1], "v1") is None
+    assert cache.get(images[0], "v1") == "PUBLISHER_ARTIFACT"
+
+
+def test_in_memory_cache_writes_nothing_to_disk(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("IMAGE_CACHE_PATH", str(tmp_path / "verdicts.db"))
+    cache = image_cache_from_env(str(tmp_path / "default.db"), in_memory=True)
+    image = _png(1)
+    cache.set(image, "v1", "SCIENTIFIC_FIGURE")
+    assert cache.get(_jpeg(image), "v1") == "SCIENTIFIC_FIGURE"
+    assert ImageVerdictCache().get(image, "v1") is None  # each instance has its own database
+    assert list(tmp_path.iterdir()) == []
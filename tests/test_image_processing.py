@@ -0,0 +1,74 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import io
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from rag.shared_libraries.image_processing import ImageNormalizer, image_extension
+
+
+def _png(width: int, height: int) -> bytes:
+    pixels = np.random.default_rng(0).integers(0, 256, (height, width, 3), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels, "RGB").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def test_renditions_are_capped_and_extension_matches_encoding():
+    normalizer = ImageNormalizer(thumbnail_px=64, embed_max_px=128)
+    result = normalizer.normalize(_png(300, 200))
+    assert max(Image.open(io.BytesIO(result["thumbnail"])).size) == 64
+    assert max(Image.open(io.BytesIO(result["embed"])).size) == 128
+    assert result["ext"] == image_extension(result["embed"]) == "jpg"
+
+
+def test_small_png_passes_through_unchanged():
+    data = _png(32, 32)
+    result = ImageNormalizer(thumbnail_px=64, embed_max_px=128).normalize(data)
+    assert result["thumbnail"] == result["embed"] == data
+    assert result["ext"] == "png"
+
+
+def test_collect_garbage_removes_only_unused_renditions(tmp_path):
+    normalizer = ImageNormalizer(cache_dir=str(tmp_path), thumbnail_px=64, embed_max_px=128, max_age_seconds=60)
+    old, recent = _png(300, 200), _png(200, 300)
+    normalizer.normalize(old)
+    normalizer.normalize(recent)
+    stale = time.time() - 120
+    for name in os.listdir(tmp_path):
+        os.utime(tmp_path / name, (stale, stale))
+    normalizer.normalize(recent)  # cache hit refreshes last use
+
+    assert normalizer.collect_garbage() == 2
+    assert len(os.listdir(tmp_path)) == 2
+    assert normalizer.normalize(recent)["ext"] == "jpg"
+
+
+def test_undecodable_bytes_pass_through():
+    data = b"\x89PNG\r\n\x1a\ntruncated"
+    assert ImageNormalizer().normalize(data) == {"thumbnail": data, "embed": data, "ext": "png"}
+
+
+def test_concurrent_writers_share_the_cache_safely(tmp_path):
+    normalizer = ImageNormalizer(cache_dir=str(tmp_path), thumbnail_px=64, embed_max_px=128)
+    data = _png(300, 200)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(lambda _: normalizer.normalize(data), range(16)))
+    assert all(result == results[0] for result in results)
+    assert sorted(name.rsplit("-", 1)[1] for name in os.listdir(tmp_path)) == ["embed", "thumb"]
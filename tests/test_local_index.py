@@ -0,0 +1,121 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+
+import fitz
+import numpy as np
+import pytest
+
+from rag.shared_libraries.bm25 import BM25_FILE
+from rag.shared_libraries.local_index import LocalVectorIndex, build_index, chunk_pdf
+
+PAGES = [
+    "Authorship credit should be based on substantial contributions to conception and design.",
+    "Authors must disclose all conflicts of interest and financial relationships with industry.",
+    "Clinical trials must be registered in a public trials registry before the first patient enrollment.",
+    "A data sharing statement is required for reports of clinical trials submitted to the journal.",
+    "Reviewers must keep manuscripts confidential and must not use their content before publication.",
+    "Journals should publish corrections and retractions when errors are found after publication.",
+]
+
+
+@pytest.fixture
+def pdf_path(tmp_path):
+    doc = fitz.open()
+    for text in PAGES:
+        doc.new_page().insert_textbox(fitz.Rect(50, 50, 550, 800), text, fontsize=11)
+    path = tmp_path / "icmje.pdf"
+    doc.save(str(path))
+    doc.close()
+    return str(path)
+
+
+@pytest.fixture(autouse=True)
+def hashing_backend(monkeypatch):
+    monkeypatch.setenv("RAG_EMBEDDING_BACKEND", "hashing")
+
+
+def test_chunk_pdf_overlaps_windows_within_a_page(tmp_path):
+    doc = fitz.open()
+    doc.new_page().insert_textbox(fitz.Rect(20, 20, 590, 830), " ".join(f"w{i}" for i in range(300)), fontsize=6)
+    path = str(tmp_path / "long.pdf")
+    doc.save(path)
+    doc.close()
+    chunks = chunk_pdf(path, chunk_words=200, overlap_words=40, source_uri="gs://icmje.pdf")
+    assert [c["text"].split()[0] for c in chunks] == ["w0", "w160"]
+    assert [len(c["text"].split()) for c in chunks] == [200, 140]
+    assert all(c["page"] == 1 and c["source_uri"] == "gs://icmje.pdf" for c in chunks)
+
+
+def test_flat_index_finds_the_matching_page(pdf_path, tmp_path):
+    index_dir = str(tmp_path / "flat")
+    meta = build_index(pdf_path, index_dir)
+    assert meta["embedding_backend"] == "hashing"
+    assert meta["count"] == len(PAGES)
+    assert os.path.exists(os.path.join(index_dir, BM25_FILE))
+
+    index = LocalVectorIndex(index_dir)
+    results = index.search("clinical trial registry registration", top_k=3, threshold=1.0)
+    assert results[0]["page"] == 3
+    assert [r["distance"] for r in results] == sorted(r["distance"] for r in results)
+
+
+def test_threshold_drops_distant_chunks(pdf_path, tmp_path):
+    index_dir = str(tmp_path / "flat")
+    build_index(pdf_path, index_dir)
+    index = LocalVectorIndex(index_dir)
+    everything = index.search("conflicts of interest disclosure", top_k=len(PAGES), threshold=2.0)
+    assert len(everything) == len(PAGES)
+
+    cutoff = everything[1]["distance"]
+    kept = index.search("conflicts of interest disclosure", top_k=len(PAGES), threshold=cutoff)
+    assert [r["page"] for r in kept] == [r["page"] for r in everything if r["distance"] <= cutoff]
+    assert kept[0]["page"] == 2
+    assert index.search("conflicts of interest disclosure", top_k=len(PAGES), threshold=-1.0) == []
+
+
+def test_ivf_probing_every_list_matches_flat(pdf_path, tmp_path):
+    build_index(pdf_path, str(tmp_path / "flat"))
+    meta = build_index(pdf_path, str(tmp_path / "ivf"), index_type="ivf", n_lists=3)
+    assert meta["n_lists"] == 3
+
+    flat = LocalVectorIndex(str(tmp_path / "flat"))
+    ivf = LocalVectorIndex(str(tmp_path / "ivf"), nprobe=3)
+    for query in ("authorship contributions", "peer reviewers confidentiality", "data sharing statement"):
+        expected = flat.search(query, top_k=4, threshold=1.0)
+        actual = ivf.search(query, top_k=4, threshold=1.0)
+        assert [r["page"] for r in actual] == [r["page"] for r in expected]
+        assert [r["distance"] for r in actual] == pytest.approx([r["distance"] for r in expected])
+
+
+def test_ivf_nprobe_limits_search_to_the_nearest_lists(pdf_path, tmp_path):
+    index_dir = str(tmp_path / "ivf")
+    build_index(pdf_path, index_dir, index_type="ivf", n_lists=3)
+    index = LocalVectorIndex(index_dir, nprobe=1)
+    vector = index.embed_fn(["data sharing statement for clinical trials"])[0]
+
+    nearest = int(np.argmax(index.centroids @ vector))
+    members = set(index.order[index.offsets[nearest]:index.offsets[nearest + 1]].tolist())
+    assert 0 < len(members) < len(PAGES)
+    assert set(index._candidates(vector).tolist()) == members
+
+    results = index.search_vector(vector, top_k=len(PAGES), threshold=2.0)
+    assert len(results) == len(members)
+    assert {r["page"] - 1 for r in results} == members
+
+
+def test_unknown_index_type_is_rejected(pdf_path, tmp_path):
+    with pytest.raises(ValueError):
+        build_index(pdf_path, str(tmp_path / "bad"), index_type="hnsw")
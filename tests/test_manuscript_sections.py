@@ -0,0 +1,91 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import time
+
+from rag.shared_libraries.manuscript_sections import (
+    SectionStore,
+    match_heading,
+    segment_lines,
+)
+
+
+def test_section_store_expires_unused_files(tmp_path):
+    store = SectionStore(cache_dir=str(tmp_path), max_age_seconds=60)
+    store.set("old", {"sections": []})
+    store.set("used", {"sections": [{"name": "methods"}]})
+    stale = time.time() - 120
+    for name in os.listdir(tmp_path):
+        os.utime(tmp_path / name, (stale, stale))
+    assert SectionStore(cache_dir=str(tmp_path)).get("used") == {"sections": [{"name": "methods"}]}
+
+    assert store.collect_garbage() == 1
+    assert SectionStore(cache_dir=str(tmp_path)).get("old") is None
+    assert SectionStore(cache_dir=str(tmp_path)).get("used") is not None
+
+
+def _line(text: str, page: int = 1, size: float = 10.0, bold: bool = False) -> dict:
+    return {"page": page, "text": text, "size": size, "bold": bold}
+
+
+def test_match_heading_whole_line_and_run_in():
+    assert match_heading("2. Methods") == ("methods", "2. Methods", "")
+    assert match_heading("CONFLICTS OF INTEREST:") == ("conflicts_of_interest", "CONFLICTS OF INTEREST", "")
+    assert match_heading("Funding: This work was supported by grant 42.") == (
+        "funding", "Funding", "This work was supported by grant 42.",
+    )
+    assert match_heading("The methods used here were standard ones.") is None
+
+
+def test_dropped_aliases_no_longer_match():
+    assert match_heading("Summary") is None
+    assert match_heading("Findings") is None
+    assert match_heading("Table") is None
+    assert match_heading("Tables") is None
+
+
+def test_only_strong_whole_line_headings_start_sections():
+    lines = [
+        _line("A trial of something", size=16),
+        _line("Methods", bold=True),
+        _line("We enrolled patients."),
+        _line("Results"),  # plain body line that happens to be an alias
+        _line("were analysed blind."),
+        _line("3. Results", page=2),
+        _line("Mortality fell.", page=2),
+        _line("DISCUSSION", page=2),
+        _line("This matters.", page=2),
+    ]
+    sections = segment_lines(lines)
+    assert [(s["name"], s["heading"]) for s in sections] == [
+        ("title_page", ""), ("methods", "Methods"), ("results", "3. Results"), ("discussion", "DISCUSSION"),
+    ]
+    assert sections[1]["text"] == "We enrolled patients.\nResults\nwere analysed blind."
+    assert (sections[2]["page_start"], sections[2]["page_end"]) == (2, 2)
+
+
+def test_structured_abstract_keeps_run_in_labels():
+    lines = [
+        _line("Abstract", bold=True),
+        _line("Background: Little is known."),
+        _line("Methods: We did a trial."),
+        _line("Introduction", bold=True),
+        _line("Text."),
+        _line("Funding: None."),
+    ]
+    sections = segment_lines(lines)
+    assert [s["name"] for s in sections] == ["abstract", "introduction", "funding"]
+    assert sections[0]["text"] == "Background: Little is known.\nMethods: We did a trial."
+    assert sections[2]["text"] == "None."
@@ -0,0 +1,97 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+
+import pytest
+
+from rag.shared_libraries.model_calls import LoopSemaphore, call_with_retry
+
+
+class StatusError(Exception):
+    def __init__(self, code: int):
+        super().__init__(f"status {code}")
+        self.code = code
+
+
+def is_retryable(error: Exception) -> bool:
+    return isinstance(error, StatusError) and error.code in (429, 503)
+
+
+@pytest.mark.asyncio
+async def test_limiter_bounds_requests_in_flight():
+    limiter = LoopSemaphore(3)
+    in_flight, peak = 0, 0
+
+    async def request(n):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.005)
+        in_flight -= 1
+        return n
+
+    results = await asyncio.gather(*(
+        call_with_retry(lambda n=n: request(n), limiter, 0, is_retryable) for n in range(10)
+    ))
+    assert results == list(range(10))
+    assert peak == 3
+
+
+@pytest.mark.asyncio
+async def test_transient_errors_are_retried():
+    attempts = []
+
+    async def request():
+        attempts.append(len(attempts))
+        if len(attempts) < 3:
+            raise StatusError(429)
+        return "ok"
+
+    assert await call_with_retry(request, LoopSemaphore(1), 5, is_retryable, base_delay=0.001) == "ok"
+    assert len(attempts) == 3
+
+
+@pytest.mark.asyncio
+async def test_permanent_errors_and_exhausted_retries_are_raised():
+    attempts = 0
+
+    async def bad_request():
+        nonlocal attempts
+        attempts += 1
+        raise StatusError(400)
+
+    with pytest.raises(StatusError):
+        await call_with_retry(bad_request, LoopSemaphore(1), 5, is_retryable, base_delay=0.001)
+    assert attempts == 1
+
+    async def unavailable():
+        nonlocal attempts
+        attempts += 1
+        raise StatusError(503)
+
+    attempts = 0
+    with pytest.raises(StatusError):
+        await call_with_retry(unavailable, LoopSemaphore(1), 2, is_retryable, base_delay=0.001)
+    assert attempts == 3
+
+
+def test_each_event_loop_gets_its_own_semaphore():
+    limiter = LoopSemaphore(2)
+
+    async def grab():
+        return limiter()
+
+    first, second = asyncio.run(grab()), asyncio.run(grab())
+    assert first is not second
@@ -0,0 +1,157 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+
+import pytest
+
+from rag.parallel_review import (
+    chunk_sections,
+    map_sections,
+    map_sections_incremental,
+    reduce_findings,
+)
+
+SEGMENTATION = {
+    "sections": [
+        {"name": "title_page", "heading": "", "page_start": 1, "text": "A trial"},
+        {"name": "methods", "heading": "Methods", "page_start": 2, "text": "First paragraph.\n\nSecond paragraph."},
+        {"name": "results", "heading": "Results", "page_start": 3, "text": ""},
+    ]
+}
+
+
+def test_chunk_sections_splits_on_paragraphs_and_skips_empty_sections():
+    chunks = chunk_sections(SEGMENTATION, max_chars=20)
+    assert [(c["id"], c["key"], c["text"]) for c in chunks] == [
+        ("title_page#1.1", "title_page:1:1", "A trial"),
+        ("methods#2.1", "methods:1:1", "First paragraph."),
+        ("methods#2.2", "methods:1:2", "Second paragraph."),
+    ]
+    assert all(len(c["text"]) <= 20 for c in chunk_sections(
+        {"sections": [{"name": "results", "heading": "", "page_start": 1, "text": "x" * 65}]}, max_chars=20,
+    ))
+
+
+@pytest.mark.asyncio
+async def test_map_sections_bounds_concurrency_and_isolates_failures():
+    chunks = chunk_sections(SEGMENTATION, max_chars=20)
+    in_flight, peak = 0, 0
+
+    async def review(chunk):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        if chunk["part"] == 2:
+            raise RuntimeError("model timeout")
+        return {"issues": [{"title": chunk["id"]}], "clarificationQuestions": []}
+
+    results, timings = await map_sections(chunks, review, concurrency=2)
+    assert peak == 2
+    assert [r["chunk"] for r in results] == [c["id"] for c in chunks]
+    assert results[2]["error"] == "model timeout"
+    assert results[2]["issues"] == []
+    assert timings["chunks"] == 3
+
+
+def test_reduce_findings_dedups_numbers_and_sets_status():
+    precheck = [{"title": "Funding statement", "icmjeSection": "II.B", "severity": "HIGH"}]
+    chunk_results = [
+        {"chunk": "methods#2.1", "issues": [
+            {"title": "Funding Statement", "icmjeSection": "II.B", "severity": "high"},  # same as pre-check
+            {"title": "No IRB name", "icmjeSection": "IV.A", "severity": "medium"},
+        ], "clarificationQuestions": [{"question": "Was consent written?"}]},
+        {"chunk": "methods#2.2", "issues": [{"title": "No IRB name", "icmjeSection": "IV.A"}],
+         "clarificationQuestions": [{"question": "Was consent written?"}]},
+    ]
+    report = reduce_findings(chunk_results, precheck)
+    assert [(i["id"], i["title"], i["severity"], i["source"]) for i in report["complianceIssues"]] == [
+        ("CI-1", "Missing: Funding statement", "HIGH", "precheck"),
+        ("CI-2", "No IRB name", "MEDIUM", "methods#2.1"),
+    ]
+    assert [(q["id"], q["required"]) for q in report["clarificationQuestions"]] == [("Q-1", True)]
+    assert report["complianceStatus"] == "NOT_COMPLIANT"
+
+
+def test_reduce_findings_status_without_high_issues():
+    assert reduce_findings([])["complianceStatus"] == "COMPLIANT"
+    questions_only = [{"chunk": "c", "issues": [], "clarificationQuestions": [{"question": "Which registry?"}]}]
+    assert reduce_findings(questions_only)["complianceStatus"] == "CONDITIONALLY_COMPLIANT"
+
+
+def test_reduce_findings_never_compliant_when_all_chunks_failed():
+    failed = [
+        {"chunk": "methods#2.1", "issues": [], "clarificationQuestions": [], "error": "quota exhausted"},
+        {"chunk": "results#3.1", "issues": [], "clarificationQuestions": [], "error": "model timeout"},
+    ]
+    report = reduce_findings(failed)
+    assert report["complianceStatus"] == "CONDITIONALLY_COMPLIANT"
+    [question] = report["clarificationQuestions"]
+    assert question["id"] == "Q-1" and question["required"]
+    assert "methods#2.1, results#3.1" in question["question"]
+
+
+def test_reduce_findings_names_only_the_failed_chunks():
+    results = [
+        {"chunk": "methods#2.1", "issues": [], "clarificationQuestions": [{"question": "Which registry?"}]},
+        {"chunk": "results#3.1", "issues": [], "clarificationQuestions": [], "error": "model timeout"},
+        {"chunk": "ethics#4.1", "issues": [{"title": "No IRB name", "severity": "HIGH"}], "clarificationQuestions": []},
+    ]
+    report = reduce_findings(results)
+    assert report["complianceStatus"] == "NOT_COMPLIANT"
+    assert [(q["id"], q["source"]) for q in report["clarificationQuestions"]] == [
+        ("Q-1", "methods#2.1"), ("Q-2", "review"),
+    ]
+    assert "results#3.1" in report["clarificationQuestions"][1]["question"]
+    assert "methods#2.1" not in report["clarificationQuestions"][1]["question"]
+
+    # The other chunks are clean: still not COMPLIANT while one was never reviewed
+    clean = [dict(results[0], clarificationQuestions=[]), results[1]]
+    assert reduce_findings(clean)["complianceStatus"] == "CONDITIONALLY_COMPLIANT"
+
+
+@pytest.mark.asyncio
+async def test_incremental_review_only_rechecks_changed_chunks():
+    reviewed = []
+
+    async def review(chunk):
+        reviewed.append(chunk["key"])
+        if chunk["text"] == "Broken.":
+            raise RuntimeError("model timeout")
+        return {"issues": [{"title": f"issue in {chunk['text']}"}], "clarificationQuestions": []}
+
+    first = chunk_sections(SEGMENTATION, max_chars=20)
+    _, _, state = await map_sections_incremental(first, review, {}, settings=("prompt-v1",))
+    assert reviewed == ["title_page:1:1", "methods:1:1", "methods:1:2"]
+
+    # The methods section moves to page 4 and its second paragraph changes
+    revised = {"sections": [
+        dict(SEGMENTATION["sections"][0]),
+        dict(SEGMENTATION["sections"][1], page_start=4, text="First paragraph.\n\nBroken."),
+    ]}
+    reviewed.clear()
+    results, timings, state = await map_sections_incremental(
+        chunk_sections(revised, max_chars=20), review, state, settings=("prompt-v1",),
+    )
+    assert reviewed == ["methods:1:2"]
+    assert (timings["reviewed"], timings["carried_forward"]) == (1, 2)
+    assert results[1]["carried_forward"] and results[1]["chunk"] == "methods#4.1"
+    assert results[1]["issues"] == [{"title": "issue in First paragraph."}]
+    assert "methods:1:2" not in state  # failed chunks are retried on the next pass
+
+    reviewed.clear()
+    await map_sections_incremental(chunk_sections(revised, max_chars=20), review, state, settings=("prompt-v2",))
+    assert len(reviewed) == 3  # a settings change re-reviews everything
@@ -0,0 +1,125 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import io
+import multiprocessing
+import pathlib
+import subprocess
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import fitz
+import numpy as np
+import pytest
+from PIL import Image
+
+from rag.shared_libraries.pdf_images import (
+    collect_candidate_images,
+    iter_candidate_images,
+    new_filter_report,
+    open_pdf,
+    page_shards,
+    pdf_pool_context,
+)
+from rag_workers import pdf_shards
+
+CONFIG = {
+    "min_pixel_area": 10000,
+    "max_aspect_ratio": 8,
+    "min_bytes": 2048,
+    "header_page_fraction": 0.5,
+    "header_min_pages": 3,
+}
+
+
+def _png(width: int, height: int, seed: int | None = 0) -> bytes:
+    if seed is None:
+        pixels = np.full((height, width), 200, dtype=np.uint8)
+    else:
+        pixels = np.random.default_rng(seed).integers(0, 256, (height, width), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels, "L").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+@pytest.fixture(scope="module")
+def pdf_bytes():
+    """Six pages: a logo on every page, figures on 2 and 5, one of each rejectable image."""
+    logo = _png(150, 150, seed=1)
+    doc = fitz.open()
+    for page_number in range(1, 7):
+        page = doc.new_page()
+        page.insert_image(fitz.Rect(20, 20, 80, 80), stream=logo)
+        if page_number == 1:
+            page.insert_image(fitz.Rect(100, 100, 300, 300), stream=_png(200, 200, seed=None))  # compresses to a few bytes
+        if page_number == 2:
+            page.insert_image(fitz.Rect(100, 100, 300, 300), stream=_png(200, 200, seed=2))
+        if page_number == 3:
+            page.insert_image(fitz.Rect(100, 100, 500, 120), stream=_png(1000, 50, seed=3))
+        if page_number == 4:
+            page.insert_image(fitz.Rect(100, 100, 140, 140), stream=_png(40, 40, seed=4))
+        if page_number == 5:
+            page.insert_image(fitz.Rect(100, 100, 300, 300), stream=_png(240, 180, seed=5))
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def test_filters_leave_only_figures(pdf_bytes):
+    with open_pdf(pdf_bytes) as doc:
+        candidates, report = collect_candidate_images(doc, CONFIG)
+    assert [(c["page"], c["width"], c["height"]) for c in candidates] == [(2, 200, 200), (5, 240, 180)]
+    assert report["references"] == 11
+    assert report["duplicate_xref"] == 5
+    assert report["running_header"] == 1
+    assert report["bad_aspect_ratio"] == 1
+    assert report["too_small"] == 1
+    assert report["too_few_bytes"] == 1
+    assert report["candidates"] == 2
+
+
+def test_page_shards_cover_every_page_once():
+    assert page_shards(10, 3) == [(0, 4), (4, 8), (8, 10)]
+    assert page_shards(2, 4) == [(0, 1), (1, 2)]
+
+
+def test_sharded_extraction_matches_serial(pdf_bytes, tmp_path):
+    path = tmp_path / "manuscript.pdf"
+    path.write_bytes(pdf_bytes)
+    serial_report = new_filter_report()
+    serial = list(iter_candidate_images(str(path), CONFIG, serial_report))
+
+    with ProcessPoolExecutor(max_workers=3, mp_context=pdf_pool_context()) as executor:
+        for source in (str(path), pdf_bytes):
+            sharded_report = new_filter_report()
+            sharded = list(iter_candidate_images(source, CONFIG, sharded_report, executor=executor, shard_count=3))
+            assert sharded == serial
+            assert sharded_report == serial_report
+
+
+def test_pool_never_forks():
+    expected = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    assert pdf_pool_context().get_start_method() == expected
+
+
+def test_worker_entry_points_do_not_import_the_agent():
+    # A spawned worker imports the module of the function it runs, and any
+    # module under rag runs rag/__init__.py (credentials, agent construction)
+    assert pdf_shards.scan_shard.__module__ == "rag_workers.pdf_shards"
+    assert pdf_shards.extract_shard.__module__ == "rag_workers.pdf_shards"
+    subprocess.run(
+        [sys.executable, "-c", "import sys, rag_workers.pdf_shards; assert 'rag' not in sys.modules"],
+        check=True,
+        cwd=pathlib.Path(__file__).resolve().parents[1],
+    )
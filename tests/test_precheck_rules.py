@@ -0,0 +1,74 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from rag.precheck_rules import run_precheck
+
+
+def _segmentation(*sections) -> dict:
+    return {"sections": [{"name": name, "heading": heading, "text": text} for name, heading, text in sections]}
+
+
+def _status(result: dict, rule_id: str) -> str:
+    for group in ("findings", "passed", "not_applicable"):
+        for rule in result[group]:
+            if rule["id"] == rule_id:
+                return rule.get("status", "NOT_APPLICABLE")
+    raise KeyError(rule_id)
+
+
+def test_heading_only_sections_do_not_count():
+    result = run_precheck(_segmentation(("title_page", "", "A study"), ("abstract", "Abstract", ""),
+                                        ("references", "References", "")))
+    assert _status(result, "PC-ABSTRACT") == "MISSING"
+    assert _status(result, "PC-REFERENCES") == "MISSING"
+
+
+def test_sections_with_text_pass():
+    result = run_precheck(_segmentation(("abstract", "Abstract", "We studied X."),
+                                        ("references", "References", "1. Smith J. Title. 2020.")))
+    assert _status(result, "PC-ABSTRACT") == "PRESENT"
+    assert _status(result, "PC-REFERENCES") == "PRESENT"
+
+
+def test_ambiguous_coi_heading_needs_a_statement():
+    result = run_precheck(_segmentation(("conflicts_of_interest", "Declarations", "None.")))
+    assert _status(result, "PC-COI") == "MISSING"
+
+    result = run_precheck(_segmentation(("conflicts_of_interest", "Declarations",
+                                         "The authors declare no competing interests.")))
+    assert _status(result, "PC-COI") == "PRESENT"
+
+    result = run_precheck(_segmentation(("conflicts_of_interest", "Conflicts of Interest", "None.")))
+    assert _status(result, "PC-COI") == "PRESENT"
+
+
+def test_funding_section_needs_funding_text():
+    result = run_precheck(_segmentation(("funding", "Financial support", "")))
+    assert _status(result, "PC-FUNDING") == "MISSING"
+
+    result = run_precheck(_segmentation(("funding", "Funding", "None.")))
+    assert _status(result, "PC-FUNDING") == "PRESENT"
+
+
+def test_evidence_outside_sections_and_when_conditions():
+    result = run_precheck(_segmentation(
+        ("title_page", "", "Corresponding author: A. Author. Word count: 3012 words."),
+        ("methods", "Methods", "In this randomised controlled trial (NCT01234567) patients gave informed consent."),
+    ))
+    assert _status(result, "PC-CORRESPONDING") == "PRESENT"
+    assert _status(result, "PC-WORD-COUNT") == "PRESENT"
+    assert _status(result, "PC-TRIAL-REG") == "PRESENT"
+    assert _status(result, "PC-ETHICS") == "PRESENT"
+    assert _status(result, "PC-DATA-SHARING") == "MISSING"
+    assert _status(result, "PC-AI-DISCLOSURE") == "NOT_APPLICABLE"
@@ -0,0 +1,55 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+import pytest
+
+from rag.shared_libraries.rerank import Reranker, lexical_overlap_scores
+
+CANDIDATES = [
+    {"source_uri": "icmje.pdf", "text": "Editors should publish corrections promptly.", "distance": 0.10},
+    {"source_uri": "icmje.pdf", "text": "Trial registration in a public registry before enrollment.", "distance": 0.35},
+    {"source_uri": "icmje.pdf", "text": "Authors disclose conflicts of interest on the ICMJE form.", "distance": 0.30},
+]
+
+
+def test_lexical_scores_are_normalized_and_prefer_query_terms():
+    scores = lexical_overlap_scores("trial registration registry", [c["text"] for c in CANDIDATES])
+    assert scores.shape == (3,)
+    assert 0.0 <= scores.min() and scores.max() <= 1.0
+    assert int(np.argmax(scores)) == 1
+    assert lexical_overlap_scores("", ["text"]).tolist() == [0.0]
+
+
+def test_rerank_reorders_and_keeps_top_n():
+    reranker = Reranker("lexical", vector_weight=0.3)
+    reranked = reranker.rerank("conflicts of interest disclosure", CANDIDATES, top_n=2)
+    assert len(reranked) == 2
+    assert reranked[0]["text"] == CANDIDATES[2]["text"]
+    assert reranked[0]["rerank_score"] >= reranked[1]["rerank_score"]
+    stats = reranker.stats()
+    assert stats["calls"] == 1 and stats["candidates"] == 3
+
+
+def test_vector_similarity_breaks_lexical_ties():
+    chunks = [dict(c, text="same text") for c in CANDIDATES]
+    reranked = Reranker("lexical", vector_weight=0.3).rerank("unrelated", chunks, top_n=3)
+    assert [c["distance"] for c in reranked] == [0.10, 0.30, 0.35]
+
+
+def test_custom_scorer_by_import_path():
+    reranker = Reranker("rag.shared_libraries.rerank:lexical_overlap_scores")
+    assert reranker.rerank("registry", CANDIDATES, top_n=1)[0]["text"] == CANDIDATES[1]["text"]
+    with pytest.raises(ValueError):
+        Reranker("cross-encoder")
@@ -0,0 +1,71 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+
+from rag.shared_libraries.retrieval_cache import RetrievalCache, make_cache_key
+
+CHUNKS = [{"source_uri": "gs://icmje.pdf", "text": "Authorship criteria ...", "distance": 0.2}]
+
+
+def test_cache_key_ignores_case_and_whitespace():
+    assert make_cache_key("  Authorship   Criteria ", "c", 5, 0.6) == make_cache_key("authorship criteria", "c", 5, 0.6)
+    assert make_cache_key("authorship criteria", "c", 5, 0.6) != make_cache_key("authorship criteria", "c", 3, 0.6)
+
+
+def test_memory_hit_and_miss():
+    cache = RetrievalCache(max_entries=4)
+    assert cache.get("k") is None
+    cache.set("k", "corpus", CHUNKS)
+    assert cache.get("k") == CHUNKS
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+
+
+def test_lru_evicts_least_recently_used():
+    cache = RetrievalCache(max_entries=2)
+    cache.set("a", "corpus", CHUNKS)
+    cache.set("b", "corpus", CHUNKS)
+    cache.get("a")
+    cache.set("c", "corpus", CHUNKS)
+    assert cache.get("b") is None
+    assert cache.get("a") == CHUNKS
+    assert cache.get("c") == CHUNKS
+
+
+def test_ttl_expiry(monkeypatch):
+    cache = RetrievalCache(ttl_seconds=10)
+    cache.set("k", "corpus", CHUNKS)
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 11)
+    assert cache.get("k") is None
+
+
+def test_sqlite_tier_survives_restart(tmp_path):
+    db_path = str(tmp_path / "cache.db")
+    RetrievalCache(db_path=db_path).set("k", "corpus", CHUNKS)
+    cache = RetrievalCache(db_path=db_path)
+    assert cache.get("k") == CHUNKS
+    assert cache.stats()["disk_hits"] == 1
+
+
+def test_invalidate_corpus_drops_both_tiers(tmp_path):
+    db_path = str(tmp_path / "cache.db")
+    cache = RetrievalCache(db_path=db_path)
+    cache.set("a", "corpus-1", CHUNKS)
+    cache.set("b", "corpus-2", CHUNKS)
+    cache.invalidate_corpus("corpus-1")
+    assert cache.get("a") is None
+    assert RetrievalCache(db_path=db_path).get("a") is None
+    assert cache.get("b") == CHUNKS
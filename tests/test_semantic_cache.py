@@ -0,0 +1,91 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+
+from rag.shared_libraries.embeddings import hashing_embedding
+from rag.shared_libraries.retrieval_cache import RetrievalCache
+from rag.shared_libraries.semantic_cache import SemanticCache
+
+CHUNKS = [{"source_uri": "gs://icmje.pdf", "text": "Authors must meet all four criteria.", "distance": 0.2}]
+QUERY = "ICMJE authorship criteria for manuscript authors"
+PARAPHRASE = "icmje authorship criteria for manuscripts authors"
+
+
+def new_cache(**kwargs):
+    return SemanticCache(hashing_embedding, threshold=0.8, **kwargs)
+
+
+def test_paraphrase_hits_within_scope_only():
+    cache = new_cache()
+    cache.add(QUERY, "corpus|5|0.6", CHUNKS, corpus="corpus")
+    value, similarity, matched_query, created = cache.lookup(PARAPHRASE, "corpus|5|0.6")
+    assert value == CHUNKS and matched_query == QUERY and similarity >= 0.8
+    assert created <= time.time()
+    assert cache.lookup(PARAPHRASE, "corpus|3|0.6") is None
+    assert cache.lookup("data sharing statement for clinical trials", "corpus|5|0.6") is None
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    cache = new_cache(ttl_seconds=10)
+    cache.add(QUERY, "scope", CHUNKS)
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 11)
+    assert cache.lookup(QUERY, "scope") is None
+
+
+def test_lru_eviction_when_full():
+    cache = new_cache(max_entries=2)
+    cache.add("conflicts of interest disclosure", "scope", ["coi"])
+    cache.add("clinical trial registration", "scope", ["trial"])
+    cache.lookup("conflicts of interest disclosure", "scope")
+    cache.add("data sharing statement", "scope", ["data"])
+    assert cache.lookup("clinical trial registration", "scope") is None
+    assert cache.lookup("conflicts of interest disclosure", "scope")[0] == ["coi"]
+
+
+def test_invalidate_corpus_and_scope():
+    cache = new_cache()
+    cache.add(QUERY, "a|5", CHUNKS, corpus="corpus-a")
+    cache.add(QUERY, "b|5", CHUNKS, corpus="corpus-b")
+    cache.invalidate_corpus("corpus-a")
+    assert cache.lookup(QUERY, "a|5") is None
+    assert cache.lookup(QUERY, "b|5") is not None
+    cache.invalidate_scope("b|5")
+    assert cache.lookup(QUERY, "b|5") is None
+
+
+def test_retrieval_cache_invalidation_reaches_semantic_cache_across_processes(tmp_path):
+    db_path = str(tmp_path / "cache.db")
+    retrieval_cache = RetrievalCache(db_path=db_path, invalidation_poll_seconds=0)
+    semantic_cache = new_cache()
+    retrieval_cache.add_invalidation_listener(semantic_cache.invalidate_corpus)
+    retrieval_cache.set("key", "corpus", CHUNKS)
+    semantic_cache.add(QUERY, "scope", CHUNKS, corpus="corpus")
+
+    # Another process (the corpus preparation script) imports new files
+    RetrievalCache(db_path=db_path).invalidate_corpus("corpus")
+
+    assert retrieval_cache.get("key") is None
+    assert semantic_cache.lookup(QUERY, "scope") is None
+    assert retrieval_cache.invalidated_at("corpus") > 0
+
+
+def test_copied_semantic_hit_keeps_its_age():
+    cache = RetrievalCache(ttl_seconds=10)
+    cache.set("old", "corpus", CHUNKS, created=time.time() - 11)
+    assert cache.get("old") is None
+    cache.invalidate_corpus("corpus")
+    cache.set("stale", "corpus", CHUNKS, created=time.time() - 1)
+    assert cache.get("stale") is None
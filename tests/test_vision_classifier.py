@@ -0,0 +1,186 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import json
+
+import pytest
+
+from rag.shared_libraries.image_cache import ImageVerdictCache, sha256_hex
+from rag.shared_libraries.vision_classifier import VisionClassifier, pack_batches
+
+
+def verdict_for(image_bytes: bytes) -> str:
+    return "SCIENTIFIC_FIGURE" if image_bytes.startswith(b"figure") else "PUBLISHER_ARTIFACT"
+
+
+class StubModel:
+    """Answers like Gemini would, recording every request."""
+
+    def __init__(self, delay: float = 0):
+        self.delay = delay
+        self.single_calls = []
+        self.batch_calls = []
+
+    async def classify_single(self, image_bytes: bytes) -> str:
+        self.single_calls.append(image_bytes)
+        await asyncio.sleep(self.delay)
+        return verdict_for(image_bytes).lower() + "\n"
+
+    async def classify_batch(self, images: list) -> str:
+        self.batch_calls.append(list(images))
+        await asyncio.sleep(self.delay)
+        return json.dumps([{"index": i, "verdict": verdict_for(image)} for i, image in enumerate(images)])
+
+    def classifier(self, **kwargs) -> VisionClassifier:
+        return VisionClassifier(self.classify_single, self.classify_batch, "test-v1", **kwargs)
+
+
+def test_pack_batches_respects_count_and_bytes():
+    images = [b"a" * 10, b"b" * 10, b"c" * 10, b"d" * 25, b"e" * 5]
+    assert [len(b) for b in pack_batches(images, max_count=2, max_bytes=100)] == [2, 2, 1]
+    assert [len(b) for b in pack_batches(images, max_count=8, max_bytes=30)] == [3, 2]
+
+
+@pytest.mark.asyncio
+async def test_classify_many_keeps_order_and_sends_duplicates_once():
+    model = StubModel()
+    images = [b"figure-1", b"logo", b"figure-2", b"logo", b"figure-1", b"banner"]
+    results = await model.classifier(batch_size=2).classify_many(images)
+
+    assert results == [True, False, True, False, True, False]
+    sent = [image for batch in model.batch_calls for image in batch]
+    assert sorted(sent) == sorted({b"figure-1", b"logo", b"figure-2", b"banner"})
+    assert [len(batch) for batch in model.batch_calls] == [2, 2]
+    assert model.single_calls == []
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_images_in_flight():
+    model = StubModel(delay=0.02)
+    classifier = model.classifier(batch_size=8)
+    first, second = await asyncio.gather(
+        classifier.classify_many([b"figure-1", b"logo"]),
+        classifier.classify_many([b"logo", b"figure-2", b"figure-1"]),
+    )
+    assert first == [True, False]
+    assert second == [False, True, True]
+    assert model.batch_calls == [[b"figure-1", b"logo"]]
+    assert model.single_calls == [b"figure-2"]
+
+
+@pytest.mark.asyncio
+async def test_cached_verdicts_skip_the_model():
+    model = StubModel()
+    classifier = model.classifier(cache=ImageVerdictCache(use_phash=False))
+    assert await classifier.classify_many([b"figure-1", b"logo"]) == [True, False]
+    assert await classifier.classify_many([b"logo", b"figure-1"]) == [False, True]
+    assert len(model.batch_calls) == 1
+    assert classifier.cache.stats()["exact_hits"] == 2
+
+
+@pytest.mark.asyncio
+async def test_failure_reaches_every_caller_and_is_not_cached():
+    calls = 0
+
+    async def failing_batch(images):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        raise RuntimeError("quota exhausted")
+
+    classifier = VisionClassifier(StubModel().classify_single, failing_batch, "test-v1")
+    results = await asyncio.gather(
+        classifier.classify_many([b"figure-1", b"logo"]),
+        classifier.classify_many([b"logo", b"figure-1"]),
+        return_exceptions=True,
+    )
+    assert [type(r) for r in results] == [RuntimeError, RuntimeError]
+    assert calls == 1
+    with pytest.raises(RuntimeError):
+        await classifier.classify_many([b"figure-1", b"logo"])
+    assert calls == 2
+
+
+class PayloadTooLarge(Exception):
+    code = 413
+
+
+@pytest.mark.asyncio
+async def test_batches_rejected_as_too_large_are_split_in_half():
+    model = StubModel()
+
+    async def limited_batch(images):
+        if len(images) > 2:
+            model.batch_calls.append(list(images))
+            raise PayloadTooLarge("request payload size exceeds the limit")
+        return await model.classify_batch(images)
+
+    classifier = VisionClassifier(
+        model.classify_single, limited_batch, "test-v1",
+        batch_size=8, is_payload_too_large=lambda e: isinstance(e, PayloadTooLarge),
+    )
+    images = [b"figure-1", b"logo", b"figure-2", b"banner", b"figure-3"]
+    assert await classifier.classify_many(images) == [True, False, True, False, True]
+    assert [len(batch) for batch in model.batch_calls] == [5, 2, 3, 2]
+    assert model.single_calls == [b"figure-2"]
+
+
+@pytest.mark.asyncio
+async def test_other_batch_errors_are_not_split():
+    async def bad_request(images):
+        raise ValueError("response schema rejected")
+
+    classifier = VisionClassifier(
+        StubModel().classify_single, bad_request, "test-v1",
+        is_payload_too_large=lambda e: isinstance(e, PayloadTooLarge),
+    )
+    with pytest.raises(ValueError):
+        await classifier.classify_batch_request([b"figure-1", b"logo"])
+
+
+@pytest.mark.asyncio
+async def test_images_missing_from_the_batch_answer_fall_back_to_single_calls():
+    model = StubModel()
+
+    async def partial_batch(images):
+        # Index 1 missing, index 2 with an unknown verdict, index 9 out of range
+        return json.dumps([
+            {"index": 0, "verdict": verdict_for(images[0])},
+            {"index": 2, "verdict": "CHART"},
+            {"index": 9, "verdict": "SCIENTIFIC_FIGURE"},
+        ])
+
+    cache = ImageVerdictCache(use_phash=False)
+    classifier = VisionClassifier(model.classify_single, partial_batch, "test-v1", cache=cache)
+    images = [b"figure-1", b"logo", b"figure-2"]
+    assert await classifier.classify_batch_request(images) == [True, False, True]
+    assert model.single_calls == [b"logo", b"figure-2"]
+    assert cache.get_many([(sha256_hex(i), i) for i in images], "test-v1") == {
+        sha256_hex(b"figure-1"): "SCIENTIFIC_FIGURE",
+        sha256_hex(b"logo"): "PUBLISHER_ARTIFACT",
+        sha256_hex(b"figure-2"): "SCIENTIFIC_FIGURE",
+    }
+
+
+@pytest.mark.asyncio
+async def test_malformed_batch_answer_falls_back_to_single_calls():
+    model = StubModel()
+
+    async def malformed_batch(images):
+        return "SCIENTIFIC_FIGURE, PUBLISHER_ARTIFACT"
+
+    classifier = VisionClassifier(model.classify_single, malformed_batch, "test-v1")
+    assert await classifier.classify_batch_request([b"figure-1", b"logo"]) == [True, False]
+    assert model.single_calls == [b"figure-1", b"logo"]
@@ -0,0 +1,75 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import time
+
+from rag.shared_libraries.workspace import WorkspaceManager, safe_name
+
+
+def _age(workspace, seconds: float) -> None:
+    stale = time.time() - seconds
+    os.utime(os.path.join(workspace.path, ".last_used"), (stale, stale))
+
+
+def test_safe_name_strips_directories():
+    assert safe_name("../../etc/passwd") == "passwd"
+    assert safe_name("my figure (1).png") == "my_figure__1_.png"
+
+
+def test_workspaces_are_isolated(tmp_path):
+    manager = WorkspaceManager(str(tmp_path))
+    manager.get("a").write_input("paper.pdf", b"a")
+    assert manager.get("b").input_source("paper.pdf") is None
+    assert manager.get("a").list_inputs(".pdf") == ["paper.pdf"]
+
+
+def test_collect_garbage_removes_only_expired(tmp_path):
+    manager = WorkspaceManager(str(tmp_path), ttl_seconds=60)
+    old, fresh = manager.get("old"), manager.get("fresh")
+    _age(old, 120)
+    assert manager.collect_garbage() == 1
+    assert not os.path.exists(old.path)
+    assert os.path.exists(fresh.path)
+
+
+def test_collect_garbage_rechecks_last_use_under_lock(tmp_path, monkeypatch):
+    manager = WorkspaceManager(str(tmp_path), ttl_seconds=60)
+    workspace = manager.get("session")
+    _age(workspace, 120)
+
+    # The session is used between the unlocked check and the deletion
+    expired = manager._expired
+    calls = []
+
+    def expired_then_touched(path):
+        result = expired(path)
+        if not calls:
+            workspace.touch()
+        calls.append(result)
+        return result
+
+    monkeypatch.setattr(manager, "_expired", expired_then_touched)
+    assert manager.collect_garbage() == 0
+    assert calls == [True, False]
+    assert os.path.exists(workspace.path)
+
+
+def test_memory_workspaces_expire(monkeypatch):
+    manager = WorkspaceManager("unused", ttl_seconds=60, in_memory=True)
+    manager.get("session").write_figure("figure1.png", b"png")
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 120)
+    assert manager.collect_garbage() == 1
+    assert manager.get("session").list_figures() == []